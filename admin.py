@@ -0,0 +1,70 @@
+import hmac
+
+from flask import Blueprint, current_app, jsonify, request, url_for
+
+from database import pool_stats
+
+
+admin = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin.before_request
+def require_admin_token():
+  token = current_app.config.get('ADMIN_TOKEN')
+  if not token:
+    if current_app.debug and current_app.config.get('ADMIN_OPEN_IN_DEBUG'):
+      return None
+    return jsonify(error='admin endpoints are disabled: ADMIN_TOKEN is not set'), 403
+  if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+    return jsonify(error='admin token required'), 403
+
+
+@admin.route('/pool-stats')
+def pool_stats_view():
+  """Connection pool usage for this worker, per database."""
+  return jsonify(pool_stats(current_app))
+
+
+# Ids one bulk delete may name, venues and artists together.
+MAX_BULK_DELETE_IDS = 10000
+
+
+def _id_list(payload, name):
+  ids = payload.get(name) or []
+  if not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+    raise ValueError(f'{name} must be a list of integer ids')
+  return list(dict.fromkeys(ids))
+
+
+@admin.route('/bulk-delete', methods=['POST'])
+def bulk_delete():
+  """Delete many venues and artists, with their shows, in the background.
+
+  Takes {"venue_ids": [...], "artist_ids": [...]}; answers 202 with the
+  job, whose progress is at its status_url.
+  """
+  payload = request.get_json(silent=True)
+  if not isinstance(payload, dict):
+    return jsonify(error='expected a JSON object'), 400
+  try:
+    venue_ids = _id_list(payload, 'venue_ids')
+    artist_ids = _id_list(payload, 'artist_ids')
+  except ValueError as error:
+    return jsonify(error=str(error)), 400
+  if not venue_ids and not artist_ids:
+    return jsonify(error='no venue_ids or artist_ids given'), 400
+  if len(venue_ids) + len(artist_ids) > MAX_BULK_DELETE_IDS:
+    return jsonify(error=f'at most {MAX_BULK_DELETE_IDS} ids per request'), 400
+
+  job = current_app.extensions['delete_jobs'].submit(venue_ids=venue_ids, artist_ids=artist_ids)
+  status_url = url_for('admin.delete_job', job_id=job.id)
+  return jsonify(job=job.as_dict(), status_url=status_url), 202, {'Location': status_url}
+
+
+@admin.route('/delete-jobs/<job_id>')
+def delete_job(job_id):
+  """A bulk delete's progress, as known to this worker."""
+  job = current_app.extensions['delete_jobs'].get(job_id)
+  if job is None:
+    return jsonify(error='no such delete job on this worker'), 404
+  return jsonify(job=job.as_dict())
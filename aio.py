@@ -0,0 +1,316 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, Rule
+
+from config import engine_options
+from database import apply_transaction_timeouts, enforce_foreign_keys, watch_pool
+from instrumentation import watch_queries
+from replicas import ReplicaSet
+
+
+# asyncio serving mode (see asgi.py). Read-heavy routes registered on an
+# AsyncRoutes table run as coroutines on the event loop and do their
+# database round trips through SQLAlchemy's asyncio engine, so a worker
+# waiting on the database keeps serving other requests; streamed exports
+# return an AsyncStreamResponse, whose rows are sent as they are fetched.
+# Every other route (all the write routes) runs unchanged as plain WSGI on
+# a thread pool.
+#
+# Async views run inside the Flask app's own request context, with its
+# before/after request hooks, so templates, url_for, sessions, flashing,
+# logging, query stats and the replica routing all behave as they do in
+# the WSGI views.
+
+ASYNC_DRIVERS = {
+  'postgresql': 'postgresql+psycopg',
+  'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+  """`url` with the asyncio driver for its database."""
+  url = make_url(url)
+  backend = url.get_backend_name()
+  if backend not in ASYNC_DRIVERS:
+    raise ValueError(f'No asyncio driver configured for {backend}')
+  return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+#----------------------------------------------------------------------------#
+# Database.
+#----------------------------------------------------------------------------#
+
+class AsyncDatabase(object):
+  """Asyncio engines for the primary and the read replicas.
+
+  run() executes ordinary synchronous SQLAlchemy code (anything taking a
+  Session) on an asyncio connection: AsyncSession.run_sync drives it in a
+  greenlet, yielding to the event loop on every round trip.
+  """
+
+  def __init__(self, app):
+    config = app.config
+    self.app = app
+    self.engine = self._create_engine(config['SQLALCHEMY_DATABASE_URI'], 'async')
+    replicas = [self._create_engine(url, f'async_replica_{index}')
+                for index, url in enumerate(config.get('DATABASE_REPLICA_URLS', []))]
+    self.replicas = ReplicaSet(replicas, cooldown=config.get('REPLICA_COOLDOWN_SECONDS', 30))
+    app.extensions['async_db'] = self
+
+    for engine in replicas:
+      @event.listens_for(engine.sync_engine, 'handle_error')
+      def replica_failed(context, engine=engine):
+        if context.is_disconnect or context.connection is None:
+          self.replicas.mark_down(engine)
+          app.logger.warning('async replica %s marked down for %ss: %s', engine.url,
+                             self.replicas.cooldown, context.original_exception)
+
+  def _create_engine(self, url, name):
+    engine = create_async_engine(async_url(url), **engine_options(url))
+    counters = self.app.extensions.setdefault('pool_counters', {})
+    counters[name] = (engine.sync_engine, watch_pool(engine.sync_engine))
+    if self.app.config.get('DB_PGBOUNCER') and engine.dialect.name == 'postgresql':
+      apply_transaction_timeouts(engine.sync_engine, self.app.config.get('DB_STATEMENT_TIMEOUT_MS'),
+                                 self.app.config.get('DB_LOCK_TIMEOUT_MS'))
+    if engine.dialect.name == 'sqlite':
+      enforce_foreign_keys(engine.sync_engine)
+    if self.app.config.get('SQL_INSTRUMENTATION', True):
+      watch_queries(engine.sync_engine)
+    return engine
+
+  def read_engine(self):
+    # Same rule as RoutingSession: replicas for requests marked use_replica.
+    if self.replicas.engines and has_request_context() and g.get('use_replica'):
+      return self.replicas.choose() or self.engine
+    return self.engine
+
+  async def run(self, fn, *args, **kwargs):
+    """fn(session, *args, **kwargs) on a replica when the request allows it, else the primary."""
+    engine = self.read_engine()
+    try:
+      return await self._run(engine, fn, *args, **kwargs)
+    except DBAPIError:
+      # A replica that just went away (handle_error marked it down) is
+      # retried on the primary; reads are safe to repeat.
+      if engine is self.engine or not self.replicas.is_down(engine):
+        raise
+      return await self._run(self.engine, fn, *args, **kwargs)
+
+  async def _run(self, engine, fn, *args, **kwargs):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+      return await session.run_sync(fn, *args, **kwargs)
+
+  async def stream(self, stmt, batch_size):
+    """Rows of `stmt` from a server-side cursor, fetched `batch_size` at a time."""
+    async with self.read_engine().connect() as connection:
+      result = await connection.stream(stmt.execution_options(yield_per=batch_size))
+      async for row in result:
+        yield row
+
+  async def dispose(self):
+    for engine in [self.engine] + self.replicas.engines:
+      await engine.dispose()
+
+
+class AsyncStreamResponse(Response):
+  """A response whose body is an async iterator of str chunks.
+
+  AsyncApp.run_view sends the chunks as the iterator produces them, so an
+  export holds one batch of rows at a time, like api.stream_rows.
+  """
+
+  def __init__(self, chunks, **kwargs):
+    super().__init__(**kwargs)
+    self.chunks = chunks
+
+
+#----------------------------------------------------------------------------#
+# Routing.
+#----------------------------------------------------------------------------#
+
+class AsyncRoutes(object):
+  """URL rules served by coroutine views; everything else goes to WSGI."""
+
+  def __init__(self):
+    self.url_map = Map()
+    self.views = {}
+
+  def route(self, rule, methods=('GET',)):
+    def decorator(view):
+      endpoint = view.__module__ + '.' + view.__name__
+      self.url_map.add(Rule(rule, endpoint=endpoint, methods=list(methods)))
+      self.views[endpoint] = view
+      return view
+    return decorator
+
+  def match(self, scope):
+    """(view, arguments) for the request, or None."""
+    adapter = self.url_map.bind('localhost', path_info=scope['path'])
+    try:
+      endpoint, arguments = adapter.match(method=scope['method'])
+    except HTTPException:
+      return None
+    return self.views[endpoint], arguments
+
+
+#----------------------------------------------------------------------------#
+# ASGI.
+#----------------------------------------------------------------------------#
+
+def build_environ(scope, body):
+  """A WSGI environ for an ASGI HTTP request (PEP 3333 field by field)."""
+  server = scope.get('server') or ('localhost', 80)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+    'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+    'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+    'SERVER_NAME': server[0],
+    'SERVER_PORT': str(server[1] or 80),
+    'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+  }
+  if scope.get('client'):
+    environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+  for name, value in scope.get('headers', []):
+    name = name.decode('latin-1').upper().replace('-', '_')
+    if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+      name = 'HTTP_' + name
+    value = value.decode('latin-1')
+    environ[name] = environ[name] + ',' + value if name in environ else value
+  return environ
+
+
+async def read_body(receive):
+  body = bytearray()
+  while True:
+    message = await receive()
+    if message['type'] == 'http.disconnect':
+      break
+    body.extend(message.get('body', b''))
+    if not message.get('more_body'):
+      break
+  return bytes(body)
+
+
+def start_message(status, headers):
+  return {
+    "type": 'http.response.start',
+    "status": status,
+    "headers": [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+  }
+
+
+class AsyncApp(object):
+  """ASGI application: `routes` as coroutines, the rest of `flask_app` as WSGI."""
+
+  def __init__(self, flask_app, routes, database=None):
+    self.flask_app = flask_app
+    self.routes = routes
+    self.enabled = flask_app.config.get('ASYNC_VIEWS', True)
+    self.database = database
+    self.executor = ThreadPoolExecutor(max_workers=flask_app.config.get('ASGI_WSGI_THREADS', 8),
+                                       thread_name_prefix='wsgi')
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    if scope['type'] != 'http':
+      raise RuntimeError(f"Unsupported ASGI scope {scope['type']!r}")
+    match = self.routes.match(scope) if self.enabled else None
+    if match is None:
+      return await self.run_wsgi(scope, receive, send)
+    return await self.run_view(*match, scope, receive, send)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({"type": 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        if self.database is not None:
+          await self.database.dispose()
+        self.executor.shutdown(wait=False)
+        await send({"type": 'lifespan.shutdown.complete'})
+        return
+
+  async def run_view(self, view, arguments, scope, receive, send):
+    # What Flask.wsgi_app / full_dispatch_request do, with the view awaited.
+    app = self.flask_app
+    environ = build_environ(scope, await read_body(receive))
+    ctx = app.request_context(environ)
+    error = None
+    ctx.push()
+    try:
+      try:
+        try:
+          rv = app.preprocess_request()
+          if rv is None:
+            rv = await view(**arguments)
+        except Exception as e:
+          rv = app.handle_user_exception(e)
+        response = app.finalize_request(rv)
+      except Exception as e:
+        error = e
+        response = app.handle_exception(e)
+      await send(start_message(response.status_code, response.headers.items()))
+      if isinstance(response, AsyncStreamResponse):
+        async for chunk in response.chunks:
+          await send({"type": 'http.response.body', "body": chunk.encode('utf-8'), "more_body": True})
+      else:
+        for chunk in response.iter_encoded():
+          await send({"type": 'http.response.body', "body": chunk, "more_body": True})
+      await send({"type": 'http.response.body', "body": b''})
+    finally:
+      ctx.pop(error)
+
+  async def run_wsgi(self, scope, receive, send):
+    # The WSGI app runs on the thread pool; its output is handed back to the
+    # event loop chunk by chunk, so streamed responses stay streamed.
+    environ = build_environ(scope, await read_body(receive))
+    loop = asyncio.get_running_loop()
+
+    def send_from_thread(message):
+      asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    def call():
+      head = {"sent": False}
+
+      def start_response(status, headers, exc_info=None):
+        if exc_info and head['sent']:
+          raise exc_info[1].with_traceback(exc_info[2])
+        head['status'], head['headers'] = int(status.split(' ', 1)[0]), headers
+
+      def send_head():
+        if not head['sent']:
+          send_from_thread(start_message(head['status'], head['headers']))
+          head['sent'] = True
+
+      result = self.flask_app(environ, start_response)
+      try:
+        for chunk in result:
+          if chunk:
+            send_head()
+            send_from_thread({"type": 'http.response.body', "body": chunk, "more_body": True})
+        send_head()
+        send_from_thread({"type": 'http.response.body', "body": b''})
+      finally:
+        if hasattr(result, 'close'):
+          result.close()
+
+    await loop.run_in_executor(self.executor, call)
@@ -0,0 +1,415 @@
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from sqlalchemy import select
+
+from models import db, Venue, Artist, Show
+from availability import availability_keys, available_venues_query
+from genres import genre_filter, genre_names_column
+from instrumentation import query_budget
+from pagination import keyset_paginate
+from recommendations import recommendation_index
+from suggest import suggest_index
+from replicas import read_engine
+
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+# Rows per fetch from the server-side cursor; only this many are held in
+# memory at a time, however large the export.
+STREAM_BATCH_SIZE = 1000
+MAX_RECOMMENDATIONS = 50
+SUGGEST_TYPES = {"venue": Venue, "artist": Artist}
+
+
+class BadRequest(ValueError):
+  pass
+
+
+@api.errorhandler(BadRequest)
+def bad_request(error):
+  return jsonify(error=str(error)), 400
+
+
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+def _json_default(value):
+  if isinstance(value, (date, datetime)):
+    return value.isoformat()
+  raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def split_genres(row):
+  row['genres'] = row['genres'].split(',') if row['genres'] else []
+  return row
+
+
+def stream_format():
+  """(as a JSON array?, mimetype) for the streamed response ?format= asks for."""
+  if request.args.get('format') == 'json':
+    return True, 'application/json'
+  return False, 'application/x-ndjson'
+
+
+def encode_row(row, first, as_array, transform=None):
+  """`row` as the next chunk of an NDJSON stream or JSON array."""
+  item = row._asdict()
+  if transform:
+    item = transform(item)
+  line = json.dumps(item, default=_json_default, separators=(',', ':'))
+  if as_array:
+    return line if first else ',' + line
+  return line + '\n'
+
+
+def stream_rows(stmt, transform=None):
+  """Stream `stmt` as NDJSON (default) or, with ?format=json, a JSON array.
+
+  The generator owns its connection: rows are read through a server-side
+  cursor in STREAM_BATCH_SIZE batches while the response is being written,
+  after the view function (and its session) has returned.
+  """
+  as_array, mimetype = stream_format()
+  engine = read_engine(db)
+
+  def generate():
+    with engine.connect() as connection:
+      result = connection.execution_options(
+        stream_results=True, yield_per=STREAM_BATCH_SIZE).execute(stmt)
+      if as_array:
+        yield '['
+      first = True
+      for row in result:
+        yield encode_row(row, first, as_array, transform)
+        first = False
+      if as_array:
+        yield ']'
+
+  return Response(generate(), mimetype=mimetype)
+
+
+#----------------------------------------------------------------------------#
+# Filters.
+#----------------------------------------------------------------------------#
+
+def datetime_arg(name):
+  value = request.args.get(name)
+  if not value:
+    return None
+  try:
+    return datetime.fromisoformat(value)
+  except ValueError:
+    raise BadRequest(f'{name} must be an ISO 8601 date or datetime')
+
+
+def int_list_arg(name):
+  # Accepts ?id=1&id=2 as well as ?id=1,2
+  values = []
+  for raw in request.args.getlist(name):
+    for part in raw.split(','):
+      if part.strip():
+        try:
+          values.append(int(part))
+        except ValueError:
+          raise BadRequest(f'{name} must be a list of integers')
+  return values
+
+
+def int_arg(name):
+  value = request.args.get(name)
+  if value is None:
+    return None
+  try:
+    return int(value)
+  except ValueError:
+    raise BadRequest(f'{name} must be an integer')
+
+
+def filter_range(stmt, column, start, end):
+  if start is not None:
+    stmt = stmt.where(column >= start)
+  if end is not None:
+    stmt = stmt.where(column < end)
+  return stmt
+
+
+def filter_ids(stmt, column, name='id'):
+  ids = int_list_arg(name)
+  if ids:
+    stmt = stmt.where(column.in_(ids))
+  after_id = int_arg('after_id')
+  if after_id is not None:
+    stmt = stmt.where(column > after_id)
+  return stmt
+
+
+#----------------------------------------------------------------------------#
+# Endpoints.
+#----------------------------------------------------------------------------#
+
+# Each export is split into its query, built from the request's filters,
+# and the streaming, so async_views.py can stream the same query.
+
+@api.route('/shows')
+def shows():
+  """Shows in start_time order.
+
+  Filters: from/to (start_time range, to exclusive), id, venue_id,
+  artist_id (each repeatable or comma separated) and after_id.
+  """
+  return stream_rows(shows_export())
+
+
+def shows_export():
+  stmt = (
+    select(
+      Show.id,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+    )
+    .join(Venue, Venue.id == Show.venue_id)
+    .join(Artist, Artist.id == Show.artist_id)
+    .order_by(Show.start_time, Show.id)
+  )
+  stmt = filter_range(stmt, Show.start_time, datetime_arg('from'), datetime_arg('to'))
+  stmt = filter_ids(stmt, Show.id)
+  for name, column in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+    ids = int_list_arg(name)
+    if ids:
+      stmt = stmt.where(column.in_(ids))
+  return stmt
+
+
+@api.route('/venues')
+def venues():
+  """Venues in id order.
+
+  Filters: from/to (updated_at range, to exclusive), id, after_id, city,
+  state and genre (repeatable, matches any).
+  """
+  return stream_rows(venues_export(), transform=split_genres)
+
+
+def venues_export():
+  stmt = select(
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+    genre_names_column(Venue).label('genres'), Venue.website, Venue.facebook_link, Venue.image_link,
+    Venue.seeking_talent, Venue.seeking_description,
+    Venue.upcoming_shows_count, Venue.past_shows_count, Venue.updated_at,
+  ).order_by(Venue.id)
+  stmt = filter_range(stmt, Venue.updated_at, datetime_arg('from'), datetime_arg('to'))
+  stmt = filter_ids(stmt, Venue.id)
+  for name in ('city', 'state'):
+    if request.args.get(name):
+      stmt = stmt.where(getattr(Venue, name) == request.args[name])
+  genres = [genre for genre in request.args.getlist('genre') if genre]
+  if genres:
+    stmt = stmt.where(genre_filter(Venue, genres))
+  return stmt
+
+
+@api.route('/artists')
+def artists():
+  """Artists in id order.
+
+  Filters: from/to (updated_at range, to exclusive), id, after_id, city,
+  state and genre (repeatable, matches any).
+  """
+  return stream_rows(artists_export(), transform=split_genres)
+
+
+def artists_export():
+  stmt = select(
+    Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+    genre_names_column(Artist).label('genres'), Artist.website, Artist.facebook_link, Artist.image_link,
+    Artist.seeking_venue, Artist.seeking_description,
+    Artist.upcoming_shows_count, Artist.past_shows_count, Artist.updated_at,
+  ).order_by(Artist.id)
+  stmt = filter_range(stmt, Artist.updated_at, datetime_arg('from'), datetime_arg('to'))
+  stmt = filter_ids(stmt, Artist.id)
+  for name in ('city', 'state'):
+    if request.args.get(name):
+      stmt = stmt.where(getattr(Artist, name) == request.args[name])
+  genres = [genre for genre in request.args.getlist('genre') if genre]
+  if genres:
+    stmt = stmt.where(genre_filter(Artist, genres))
+  return stmt
+
+
+#----------------------------------------------------------------------------#
+# Availability.
+#----------------------------------------------------------------------------#
+
+# Each JSON endpoint below is split into request parsing, database work
+# taking the session as an argument, and rendering, so async_views.py can
+# run the same database work on the asyncio engine.
+
+def availability_search():
+  """(statement, keyset keys, paging arguments) for the availability request."""
+  start_time, end_time = datetime_arg('from'), datetime_arg('to')
+  if start_time is None or end_time is None:
+    raise BadRequest('from and to are required')
+  if end_time <= start_time:
+    raise BadRequest('to must be after from')
+  genres = [genre for genre in request.args.getlist('genre') if genre]
+  keys = availability_keys(genres)
+  stmt = available_venues_query(
+    start_time, end_time, genres=genres,
+    city=request.args.get('city'), state=request.args.get('state'), keys=keys,
+    max_duration=timedelta(minutes=current_app.config.get('SHOW_MAX_DURATION_MINUTES', 720)),
+  )
+  paging = {"after": request.args.get('after'), "before": request.args.get('before'),
+            "limit": int_arg('limit')}
+  return stmt, keys, paging
+
+
+def render_available_venues(page):
+  venues = [{
+    "id": row.id,
+    "name": row.name,
+    "city": row.city,
+    "state": row.state,
+    "address": row.address,
+    "image_link": row.image_link,
+    "seeking_talent": row.seeking_talent,
+    "num_upcoming_shows": row.num_upcoming_shows,
+    "genres_matched": -row.genre_rank,
+  } for row in page.items]
+  return jsonify(venues=venues, **page.links('api.available_venues'))
+
+
+@api.route('/venues/available')
+@query_budget(1)
+def available_venues():
+  """Venues with nothing booked between from and to, best match first.
+
+  Required: from, to. Filters: genre (repeatable, matches any), city,
+  state. Ranked by genres matched, seeking talent, then upcoming shows;
+  paged with after/before cursors and limit.
+  """
+  stmt, keys, paging = availability_search()
+  try:
+    page = keyset_paginate(db.session, stmt, keys, **paging)
+  except ValueError as error:
+    raise BadRequest(str(error))
+  return render_available_venues(page)
+
+
+#----------------------------------------------------------------------------#
+# Recommendations.
+#----------------------------------------------------------------------------#
+
+def recommendation_limit():
+  return max(1, min(int_arg('limit') or 10, MAX_RECOMMENDATIONS))
+
+
+def find_recommendations(session, index, subject_model, subject_id, limit):
+  """Recommendation rows (name, links, score...) for the subject, or None if unknown.
+
+  Scores and ranking come from the in-memory index; names and links are
+  read fresh, which also drops candidates deleted since the index saw them.
+  """
+  if subject_model is Artist:
+    target, lookup = Venue, index.venues_for_artist
+  else:
+    target, lookup = Artist, index.artists_for_venue
+  index.refresh(session)
+  recommendations = lookup(subject_id, limit)
+  if recommendations is None:
+    # Possibly created since the last refresh.
+    index.refresh(session, force=True)
+    recommendations = lookup(subject_id, limit)
+  if recommendations is None:
+    return None
+
+  rows = {row.id: row for row in session.execute(
+    select(target.id, target.name, target.city, target.state, target.image_link)
+    .where(target.id.in_([rec.id for rec in recommendations]))
+  )}
+  gone = [rec.id for rec in recommendations if rec.id not in rows]
+  if gone:
+    index.forget(**{f'{target.__name__.lower()}_ids': gone})
+  return [{
+    "id": rec.id,
+    "name": rows[rec.id].name,
+    "city": rows[rec.id].city,
+    "state": rows[rec.id].state,
+    "image_link": rows[rec.id].image_link,
+    "score": rec.score,
+    "shared_genres": index.genre_names(rec.shared_genres),
+    "same_city": rec.same_city,
+    "same_state": rec.same_state,
+    "shows_together": rec.shows_together,
+  } for rec in recommendations if rec.id in rows]
+
+
+def render_recommendations(subject_model, subject_id, items):
+  if items is None:
+    return jsonify(error=f'{subject_model.__name__} {subject_id} not found'), 404
+  return jsonify({'venues' if subject_model is Artist else 'artists': items})
+
+
+def recommend(subject_model, subject_id):
+  """Seeking venues for an artist, or seeking artists for a venue."""
+  items = find_recommendations(db.session, recommendation_index(current_app), subject_model,
+                               subject_id, recommendation_limit())
+  return render_recommendations(subject_model, subject_id, items)
+
+
+@api.route('/artists/<int:artist_id>/recommended-venues')
+@query_budget(4)
+def recommended_venues(artist_id):
+  """Venues seeking talent that suit the artist, best first (limit, max 50)."""
+  return recommend(Artist, artist_id)
+
+
+@api.route('/venues/<int:venue_id>/recommended-artists')
+@query_budget(4)
+def recommended_artists(venue_id):
+  """Artists seeking venues that suit the venue, best first (limit, max 50)."""
+  return recommend(Venue, venue_id)
+
+
+#----------------------------------------------------------------------------#
+# Typeahead.
+#----------------------------------------------------------------------------#
+
+def suggest_models():
+  kinds = request.args.getlist('type') or list(SUGGEST_TYPES)
+  if any(kind not in SUGGEST_TYPES for kind in kinds):
+    raise BadRequest(f"type must be one of: {', '.join(SUGGEST_TYPES)}")
+  return tuple(SUGGEST_TYPES[kind] for kind in kinds)
+
+
+def find_suggestions(session, index, term, models, limit):
+  index.refresh(session)
+  return index.suggest(term, limit, models)
+
+
+def render_suggestions(suggestions):
+  return jsonify(suggestions=[{
+    "type": suggestion.model.__name__.lower(),
+    "id": suggestion.id,
+    "name": suggestion.name,
+    "num_upcoming_shows": suggestion.upcoming,
+  } for suggestion in suggestions])
+
+
+@api.route('/suggest')
+@query_budget(5)
+def suggest():
+  """Venue and artist names for what has been typed so far (q), most upcoming shows first.
+
+  Matches the start of the name or of any of its first few words. Filters:
+  type (venue or artist, repeatable). limit defaults to 10, max 20.
+  """
+  items = find_suggestions(db.session, suggest_index(current_app), request.args.get('q', ''),
+                           suggest_models(), int_arg('limit') or 10)
+  return render_suggestions(items)
@@ -2,32 +2,75 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-import json
+import os
+import functools
+import threading
 import dateutil.parser
 import babel
-import datetime
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from datetime import date, datetime, timedelta
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, session, g
+from flask.json.provider import DefaultJSONProvider
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate ##added for database migrations
-import logging
-from logging import Formatter, FileHandler
-from flask_wtf import FlaskForm
+import click
 from forms import *
 
 from models import db, Venue, Artist, Show
+from queries import (VENUE_AREA_KEYS, SHOW_KEYS, venue_areas_query, group_venue_areas, detail_page,
+                     detail_validators, show_window, shows_query)
+from pagination import keyset_paginate, decode_cursor
+from query_plans import check_query_plans
+from search import get_search_backend
+from counters import record_show_created, reconcile_show_counters
+from cache import (create_page_cache, venue_page_key, artist_page_key,
+                   venue_page_keys, artist_page_keys)
+from conditional import template_digest, make_etag, listing_validators
+from assets import configure_assets
+from api import api
+from admin import admin
+from database import configure_engines
+from replicas import configure_replicas
+from genres import get_genres, genre_filter
+from booking import BookingConflict, InvalidBooking, book_show
+from suggest import suggest_index
+from deletes import DeleteJobs, count_shows, delete_entities
+from loader import DEFAULT_BATCH_SIZE, CatalogLoader, read_records
+from instrumentation import instrument_queries, query_budget
+from logging_setup import configure_logging
+import time
+from sqlalchemy import select
 
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
 
+class JSONProvider(DefaultJSONProvider):
+  # Serialize datetimes as ISO 8601 rather than Flask's default HTTP date.
+  @staticmethod
+  def default(o):
+    if isinstance(o, date):
+      return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = JSONProvider(app)
 app.config['SECRET_KEY'] = 'brens-big-secret-key'  # Set a secret key for CSRF protection
 moment = Moment(app)
 #app.config.from_object('config')
 app.config.from_object('config.Config')
 db.init_app(app) # Initialize SQLAlchemy with the Flask app
 migrate = Migrate(app, db)  ##added for database migrations
+page_cache = create_page_cache(app.config)
+configure_logging(app)
+app.register_blueprint(api)
+app.register_blueprint(admin)
+configure_engines(app, db)
+configure_replicas(app, db)
+instrument_queries(app, db)
+assets = configure_assets(app)
+# Pages link the asset bundles by content hash, so a rebuild changes ETags too.
+TEMPLATE_DIGEST = template_digest(os.path.join(app.root_path, app.template_folder), assets.version)
 
 # TODO: connect to a local postgresql database 
 # >>>>That action has now BEEN DONE. See config.py for database connection details.
@@ -92,16 +135,254 @@ migrate = Migrate(app, db)  ##added for database migrations
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@functools.lru_cache(maxsize=64)
+def datetime_formatter(format, locale):
+  # Compiled Babel pattern and parsed locale, built once per (format, locale).
+  locale = babel.Locale.parse(locale)
+  if format in DATETIME_FORMATS:
+    format = DATETIME_FORMATS[format]
+  elif format in ('short', 'medium', 'long', 'full'):
+    # Babel's named widths, composed the way babel.dates.format_datetime does.
+    format = (babel.dates.get_datetime_format(format, locale=locale)
+              .replace('{0}', locale.time_formats[format].pattern)
+              .replace('{1}', locale.date_formats[format].pattern))
+  return babel.dates.parse_pattern(format), locale
+
+def parse_datetime(value):
+  # Fast path for the ISO 8601 strings the app produces ("...T21:30:00.000Z");
+  # anything else goes through the forgiving dateutil parser.
+  try:
+    return datetime.fromisoformat(value)
+  except ValueError:
+    return dateutil.parser.parse(value)
+
+@functools.lru_cache(maxsize=8192)
+def format_datetime(value, format='medium', locale='en'):
+  # Accepts datetime objects directly; strings are parsed for compatibility.
+  date = parse_datetime(value) if isinstance(value, str) else value
+  if date.tzinfo is None:
+    date = date.replace(tzinfo=babel.dates.UTC)
+  pattern, locale = datetime_formatter(format, locale)
+  return pattern.apply(date, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def wants_json():
+  # Listing routes render JSON for ?format=json or an Accept: application/json request.
+  if request.args.get('format') == 'json':
+    return True
+  return request.accept_mimetypes.best == 'application/json'
+
+def search_backend():
+  # One backend per app, chosen from config and the database dialect.
+  if 'search_backend' not in app.extensions:
+    app.extensions['search_backend'] = get_search_backend(
+      db.engine, app.config.get('SEARCH_BACKEND'), app.config.get('SEARCH_RESULT_LIMIT'))
+  return app.extensions['search_backend']
+
+def cached_page(key, version):
+  # Pages are cached whole, flash area included, so bypass the cache while
+  # flashed messages are waiting to be shown. Decide before rendering:
+  # rendering consumes the flashes.
+  g.page_cacheable = not session.get('_flashes')
+  g.page_version = version
+  if not g.page_cacheable:
+    return None
+  entry = page_cache.get(key)
+  if entry is None:
+    return None
+  # Entries carry the row version they were rendered from. A page rendered
+  # from a lagging replica just after a write is stored under the old
+  # version and is ignored once the replica (and so `version`) catches up.
+  cached_version, _, html = entry.partition('\n')
+  return html if cached_version == str(version) else None
+
+def cache_page(key, html):
+  if g.get('page_cacheable'):
+    page_cache.set(key, f"{g.get('page_version')}\n{html}")
+  return html
+
+def forget_deleted(model, ids):
+  # Drop this worker's copies of deleted venues or artists. Pages listing
+  # their shows carry the other side's version, bumped as they were uncounted.
+  page_key = venue_page_key if model is Venue else artist_page_key
+  page_cache.delete_many([page_key(entity_id) for entity_id in ids])
+  for entity_id in ids:
+    suggest_index(app).forget(model, entity_id)
+
+delete_jobs = DeleteJobs(app, batch_size=app.config['DELETE_BATCH_SIZE'], on_deleted=forget_deleted)
+
+def warm_suggest_index():
+  # Build the typeahead index on a background thread, once per worker, so
+  # no /api/suggest caller waits for the whole build.
+  if not app.config.get('SUGGEST_WARMUP', True) or app.extensions.get('suggest_warmup'):
+    return
+  app.extensions['suggest_warmup'] = True
+
+  def build():
+    with app.app_context():
+      try:
+        suggest_index(app).refresh(db.session)
+      except Exception:
+        app.logger.exception('Error building the suggest index')
+      finally:
+        db.session.remove()
+
+  threading.Thread(target=build, name='suggest-warmup', daemon=True).start()
+
+@app.before_request
+def start_suggest_warmup():
+  # WSGI servers have no startup hook; asgi.py warms up on import instead.
+  warm_suggest_index()
+
+def not_modified(etag, last_modified=None):
+  # Record the page validators and report whether the client's copy is
+  # current. Called before the expensive queries; pages with pending flashes
+  # are never validated, since the client's copy lacks the message.
+  if session.get('_flashes'):
+    return False
+  g.etag, g.last_modified = etag, last_modified
+  if request.if_none_match:
+    return request.if_none_match.contains(etag)
+  if last_modified and request.if_modified_since:
+    return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+  return False
+
+def not_modified_response():
+  return Response(status=304)
+
+@app.after_request
+def add_validators(response):
+  if 'etag' in g and response.status_code in (200, 304):
+    response.set_etag(g.etag)
+    if g.last_modified:
+      response.last_modified = g.last_modified
+    # Let clients and proxies keep the page but revalidate on every use.
+    response.cache_control.no_cache = True
+    response.vary.add('Accept')
+    response.vary.add('Cookie')
+  return response
+
+def listing_filters(model, args):
+  # Optional ?genre= (repeatable, matches any), ?state= and ?city= filters
+  # for the listing and search routes.
+  filters = []
+  genres = [genre for genre in args.getlist('genre') if genre]
+  if genres:
+    filters.append(genre_filter(model, genres))
+  for name in ('state', 'city'):
+    if args.get(name):
+      filters.append(getattr(model, name) == args[name])
+  return filters
+
+def pagination_args():
+  # Reject malformed cursors up front, before a route opens its try block.
+  args = {
+    "after": request.args.get('after'),
+    "before": request.args.get('before'),
+    "limit": request.args.get('limit', type=int),
+  }
+  for cursor in (args["after"], args["before"]):
+    if cursor:
+      try:
+        decode_cursor(cursor)
+      except ValueError:
+        abort(400)
+  return args
+
+def shows_window_args():
+  # ?from= and ?to= (ISO 8601) bound the /shows window; either defaults
+  # relative to the other, and `from` to now (to the minute, so the page
+  # stays cacheable for that long).
+  try:
+    start, end = (datetime.fromisoformat(request.args[name]) if request.args.get(name) else None
+                  for name in ('from', 'to'))
+  except ValueError:
+    abort(400)
+  # Start times are stored as naive local times.
+  start, end = (value.astimezone().replace(tzinfo=None) if value and value.tzinfo else value
+                for value in (start, end))
+  length = timedelta(days=app.config.get('SHOWS_WINDOW_DAYS', 30))
+  if start is None:
+    start = end - length if end else datetime.now().replace(second=0, microsecond=0)
+  if end is None:
+    end = start + length
+  if end <= start:
+    abort(400)
+  return start, end
+
+# Rendering for the listing and search routes, shared with their async
+# versions in async_views.py.
+
+def render_venue_areas(page):
+  app.logger.debug('Found %d venues', len(page.items))
+  data = group_venue_areas(page.items)
+  links = page.links('venues')
+  app.logger.debug('Returning %d areas', len(data))
+  if wants_json():
+    return jsonify(areas=data, **links)
+  return render_template('pages/venues.html', areas=data, links=links)
+
+def render_artist_list(page):
+  data = []
+  for artist in page.items:
+    data.append({
+      "id": artist.id,
+      "name": artist.name,
+    })
+  links = page.links('artists')
+  if wants_json():
+    return jsonify(artists=data, **links)
+  return render_template('pages/artists.html', artists=data, links=links)
+
+def render_search_results(template, rows, search_term):
+  data = []
+  for row in rows:
+    data.append({
+      "id": row.id,
+      "name": row.name,
+      "num_upcoming_shows": row.num_upcoming_shows,
+    })
+  response = {
+    "count": len(data),
+    "data": data
+  }
+  return render_template(template, results=response, search_term=search_term)
+
+def render_shows(page, start, end):
+  data = [{
+    "venue_id": row.venue_id,
+    "venue_name": row.venue_name,
+    "artist_id": row.artist_id,
+    "artist_name": row.artist_name,
+    "artist_image_link": row.artist_image_link,
+    "start_time": row.start_time,
+  } for row in page.items]
+  links = page.links('shows')
+  # The windows either side of this one, the same length.
+  length = end - start
+  params = {name: values for name, values in request.args.lists()
+            if name not in ('from', 'to', 'after', 'before')}
+  window = {
+    "from": start,
+    "to": end,
+    "earlier": url_for('shows', **params, **{"from": (start - length).isoformat(), "to": start.isoformat()}),
+    "later": url_for('shows', **params, **{"from": end.isoformat(), "to": (end + length).isoformat()}),
+  }
+
+  if wants_json():
+    return jsonify(shows=data, window=window, **links)
+  return render_template('pages/shows.html', shows=data, links=links, window=window)
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -145,45 +426,22 @@ def index():
 
 
 @app.route('/venues')
+@query_budget(2)
 def venues():
+    page_args = pagination_args()
+    validators = listing_validators(db.session, Venue)
+    if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), *validators),
+                    validators[1]):
+        return not_modified_response()
     try:
-        venues = Venue.query.all()
-        print(f"Found {len(venues)} venues in database")  # Debug info
-        
-        # If no venues, return empty data structure
-        if not venues:
-            data = []
-            return render_template('pages/venues.html', areas=data)
-        
-        # Organize venues by city and state
-        data = []
-        locations = set()
-        for venue in venues:
-            locations.add((venue.city, venue.state))
-        
-        for city, state in locations:
-            city_venues = []
-            for venue in venues:
-                if venue.city == city and venue.state == state:
-                    # Count upcoming shows
-                    num_upcoming_shows = len([show for show in venue.shows if show.start_time > datetime.now()])
-                    city_venues.append({
-                        "id": venue.id,
-                        "name": venue.name,
-                        "num_upcoming_shows": num_upcoming_shows
-                    })
-            data.append({
-                "city": city,
-                "state": state,
-                "venues": city_venues
-            })
-        
-        print(f"Returning data: {data}")  # Debug info
-        return render_template('pages/venues.html', areas=data)
-    except Exception as e:
-        print(f"Error in venues route: {e}")  # Add debugging
-        import traceback
-        traceback.print_exc()  # Print full stack trace
+        # A single grouped query: venues come back sorted by area with their
+        # upcoming show counts, so no per-venue `shows` lazy loads are needed.
+        # Pages are cut on the (state, city, id) index rather than OFFSET.
+        page = keyset_paginate(db.session, venue_areas_query(listing_filters(Venue, request.args)),
+                               VENUE_AREA_KEYS, **page_args)
+        return render_venue_areas(page)
+    except Exception:
+        app.logger.exception('Error in venues route')
         db.session.rollback()
         return render_template('errors/500.html'), 500
     finally:
@@ -211,34 +469,18 @@ def venues():
 
 
 @app.route('/venues/search', methods=['POST'])
+@query_budget(1)
 def search_venues():
   try:
     search_term = request.form.get('search_term', '')
     
-    # Case-insensitive partial string search using ilike
-    venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-    
-    # Count upcoming shows for each venue
-    data = []
-    for venue in venues:
-      # Count upcoming shows for this venue
-      now = datetime.now()
-      upcoming_shows_count = len([show for show in venue.shows if show.start_time > now])
-      
-      data.append({
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": upcoming_shows_count,
-      })
-    
-    response = {
-      "count": len(data),
-      "data": data
-    }
-    
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
-  except Exception as e:
-    print(f"Error in search_venues: {e}")
+    # Case-insensitive partial string search through the indexed backend;
+    # ranked matches come back with their upcoming show counts in one query
+    venues = search_backend().search(db.session, Venue, search_term,
+                                     filters=listing_filters(Venue, request.values))
+    return render_search_results('pages/search_venues.html', venues, search_term)
+  except Exception:
+    app.logger.exception('Error in search_venues')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
@@ -247,62 +489,25 @@ def search_venues():
 
 
 @app.route('/venues/<int:venue_id>')
+@query_budget(3)
 def show_venue(venue_id):
+  validators = detail_validators(db.session, Venue, venue_id)
+  if validators and not_modified(make_etag(TEMPLATE_DIGEST, 'venue', venue_id, validators.version),
+                                 validators.updated_at):
+    return not_modified_response()
+  html = cached_page(venue_page_key(venue_id), validators.version if validators else None)
+  if html is not None:
+    return html
   try:
-    # Get venue from database
-    venue = Venue.query.get(venue_id)
-    
-    if not venue:
+    # The venue with its show counts, then its shows: two queries.
+    data = detail_page(db.session, Venue, venue_id, datetime.now())
+    if data is None:
       return render_template('errors/404.html'), 404
+
+    return cache_page(venue_page_key(venue_id), render_template('pages/show_venue.html', venue=data))
     
-    # Get shows for this venue
-    shows = Show.query.filter_by(venue_id=venue_id).join(Artist).all()
-    
-    # Separate past and upcoming shows
-    now = datetime.now()
-    past_shows = []
-    upcoming_shows = []
-    
-    for show in shows:
-      show_data = {
-        "artist_id": show.artist.id,
-        "artist_name": show.artist.name,
-        "artist_image_link": show.artist.image_link,
-        "start_time": show.start_time.isoformat() + "Z"
-      }
-      
-      if show.start_time < now:
-        past_shows.append(show_data)
-      else:
-        upcoming_shows.append(show_data)
-    
-    # Convert genres string to list if it exists
-    genres_list = venue.genres.split(',') if venue.genres else []
-    
-    # Prepare data for template
-    data = {
-      "id": venue.id,
-      "name": venue.name,
-      "genres": genres_list,
-      "address": venue.address,
-      "city": venue.city,
-      "state": venue.state,
-      "phone": venue.phone,
-      "website": venue.website,
-      "facebook_link": venue.facebook_link,
-      "seeking_talent": venue.seeking_talent,
-      "seeking_description": venue.seeking_description,
-      "image_link": venue.image_link,
-      "past_shows": past_shows,
-      "upcoming_shows": upcoming_shows,
-      "past_shows_count": len(past_shows),
-      "upcoming_shows_count": len(upcoming_shows),
-    }
-    
-    return render_template('pages/show_venue.html', venue=data)
-    
-  except Exception as e:
-    print(f"Error in show_venue: {e}")
+  except Exception:
+    app.logger.exception('Error in show_venue')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
@@ -335,7 +540,6 @@ def create_venue_form():
 @app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
   form = VenueForm(request.form)
-  error = False
   try:
     venue = Venue(
       name=form.name.data,
@@ -345,18 +549,18 @@ def create_venue_submission():
       phone=form.phone.data,
       image_link=form.image_link.data,
       facebook_link=form.facebook_link.data,
-      genres=','.join(form.genres.data) if isinstance(form.genres.data, list) else form.genres.data,
+      genres=get_genres(db.session, form.genres.data),
       website=form.website_link.data,
       seeking_talent=form.seeking_talent.data,
       seeking_description=form.seeking_description.data
     )
     db.session.add(venue)
     db.session.commit()
+    suggest_index(app).put(Venue, venue.id, venue.name, venue.upcoming_shows_count)
     flash('Venue ' + form.name.data + ' was successfully listed!')
-  except Exception as e:
-    error = True
+  except Exception:
     db.session.rollback()
-    print(f"Error creating venue: {e}")  # Debug line
+    app.logger.exception('Error creating venue')
     flash('An error occurred. Venue ' + form.name.data + ' could not be listed.')
   finally:
     db.session.close()
@@ -367,27 +571,28 @@ def create_venue_submission():
 def delete_venue(venue_id):
   try:
     # Find the venue by ID
-    venue = Venue.query.get(venue_id)
+    venue_name = db.session.execute(select(Venue.name).where(Venue.id == venue_id)).scalar()
     
-    if not venue:
+    if venue_name is None:
       flash(f'Venue with ID {venue_id} not found.')
       return redirect(url_for('index'))
     
-    venue_name = venue.name  # Store name for flash message
-    
-    # Delete associated shows first (cascade delete)
-    Show.query.filter_by(venue_id=venue_id).delete()
+    # Its shows go first, a batch per transaction (deletes.py); a venue
+    # with more than one batch of them is deleted in the background.
+    if count_shows(db.session, Venue, int(venue_id)) > app.config['DELETE_BATCH_SIZE']:
+      delete_jobs.submit(venue_ids=[int(venue_id)])
+      flash(f'Venue "{venue_name}" is being deleted.')
+      return redirect(url_for('index'))
     
-    # Delete the venue
-    db.session.delete(venue)
-    db.session.commit()
+    delete_entities(db.session, Venue, [int(venue_id)], app.config['DELETE_BATCH_SIZE'])
+    forget_deleted(Venue, [int(venue_id)])
     
     flash(f'Venue "{venue_name}" was successfully deleted!')
     return redirect(url_for('index'))
     
-  except Exception as e:
+  except Exception:
     db.session.rollback()
-    print(f"Error deleting venue: {e}")
+    app.logger.exception('Error deleting venue')
     flash(f'An error occurred. Venue could not be deleted.')
     return redirect(url_for('index'))
   finally:
@@ -403,117 +608,63 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@query_budget(2)
 def artists():
+  page_args = pagination_args()
+  validators = listing_validators(db.session, Artist)
+  if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), *validators),
+                  validators[1]):
+    return not_modified_response()
   try:
-    # Query all artists from database
-    artists = Artist.query.all()
-    
-    # Format data for template
-    data = []
-    for artist in artists:
-      data.append({
-        "id": artist.id,
-        "name": artist.name,
-      })
-    
-    return render_template('pages/artists.html', artists=data)
-  except Exception as e:
-    print(f"Error in artists route: {e}")
+    # Query one page of artists, keyed on the primary key
+    stmt = select(Artist.id, Artist.name).where(*listing_filters(Artist, request.args))
+    page = keyset_paginate(db.session, stmt, [Artist.id], **page_args)
+    return render_artist_list(page)
+  except Exception:
+    app.logger.exception('Error in artists route')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
     db.session.close()
 
 @app.route('/artists/search', methods=['POST'])
+@query_budget(1)
 def search_artists():
   try:
     search_term = request.form.get('search_term', '')
     
-    # Case-insensitive partial string search using ilike
-    artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
-    
-    # Count upcoming shows for each artist
-    data = []
-    for artist in artists:
-      # Count upcoming shows for this artist
-      now = datetime.now()
-      upcoming_shows_count = len([show for show in artist.shows if show.start_time > now])
-      
-      data.append({
-        "id": artist.id,
-        "name": artist.name,
-        "num_upcoming_shows": upcoming_shows_count,
-      })
-    
-    response = {
-      "count": len(data),
-      "data": data
-    }
-    
-    return render_template('pages/search_artists.html', results=response, search_term=search_term)
-  except Exception as e:
-    print(f"Error in search_artists: {e}")
+    # Case-insensitive partial string search through the indexed backend;
+    # ranked matches come back with their upcoming show counts in one query
+    artists = search_backend().search(db.session, Artist, search_term,
+                                      filters=listing_filters(Artist, request.values))
+    return render_search_results('pages/search_artists.html', artists, search_term)
+  except Exception:
+    app.logger.exception('Error in search_artists')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
     db.session.close()
 
 @app.route('/artists/<int:artist_id>')
+@query_budget(3)
 def show_artist(artist_id):
+  validators = detail_validators(db.session, Artist, artist_id)
+  if validators and not_modified(make_etag(TEMPLATE_DIGEST, 'artist', artist_id, validators.version),
+                                 validators.updated_at):
+    return not_modified_response()
+  html = cached_page(artist_page_key(artist_id), validators.version if validators else None)
+  if html is not None:
+    return html
   try:
-    # Get artist from database
-    artist = Artist.query.get(artist_id)
-    
-    if not artist:
+    # The artist with its show counts, then its shows: two queries.
+    data = detail_page(db.session, Artist, artist_id, datetime.now())
+    if data is None:
       return render_template('errors/404.html'), 404
+
+    return cache_page(artist_page_key(artist_id), render_template('pages/show_artist.html', artist=data))
     
-    # Get shows for this artist
-    shows = Show.query.filter_by(artist_id=artist_id).join(Venue).all()
-    
-    # Separate past and upcoming shows
-    now = datetime.now()
-    past_shows = []
-    upcoming_shows = []
-    
-    for show in shows:
-      show_data = {
-        "venue_id": show.venue.id,
-        "venue_name": show.venue.name,
-        "venue_image_link": show.venue.image_link,
-        "start_time": show.start_time.isoformat() + "Z"
-      }
-      
-      if show.start_time < now:
-        past_shows.append(show_data)
-      else:
-        upcoming_shows.append(show_data)
-    
-    # Convert genres string to list if it exists
-    genres_list = artist.genres.split(',') if artist.genres else []
-    
-    # Prepare data for template
-    data = {
-      "id": artist.id,
-      "name": artist.name,
-      "genres": genres_list,
-      "city": artist.city,
-      "state": artist.state,
-      "phone": artist.phone,
-      "website": artist.website,
-      "facebook_link": artist.facebook_link,
-      "seeking_venue": artist.seeking_venue,
-      "seeking_description": artist.seeking_description,
-      "image_link": artist.image_link,
-      "past_shows": past_shows,
-      "upcoming_shows": upcoming_shows,
-      "past_shows_count": len(past_shows),
-      "upcoming_shows_count": len(upcoming_shows),
-    }
-    
-    return render_template('pages/show_artist.html', artist=data)
-    
-  except Exception as e:
-    print(f"Error in show_artist: {e}")
+  except Exception:
+    app.logger.exception('Error in show_artist')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
@@ -536,7 +687,7 @@ def edit_artist(artist_id):
     form.city.data = artist.city
     form.state.data = artist.state
     form.phone.data = artist.phone
-    form.genres.data = artist.genres.split(',') if artist.genres else []
+    form.genres.data = artist.genre_names
     form.facebook_link.data = artist.facebook_link
     form.image_link.data = artist.image_link
     form.website_link.data = artist.website
@@ -547,7 +698,7 @@ def edit_artist(artist_id):
     artist_data = {
       "id": artist.id,
       "name": artist.name,
-      "genres": artist.genres.split(',') if artist.genres else [],
+      "genres": artist.genre_names,
       "city": artist.city,
       "state": artist.state,
       "phone": artist.phone,
@@ -559,8 +710,8 @@ def edit_artist(artist_id):
     }
     
     return render_template('forms/edit_artist.html', form=form, artist=artist_data)
-  except Exception as e:
-    print(f"Error in edit_artist: {e}")
+  except Exception:
+    app.logger.exception('Error in edit_artist')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
@@ -584,22 +735,27 @@ def edit_artist_submission(artist_id):
     artist.city = form.city.data
     artist.state = form.state.data
     artist.phone = form.phone.data
-    artist.genres = ','.join(form.genres.data) if isinstance(form.genres.data, list) else form.genres.data
+    artist.genres = get_genres(db.session, form.genres.data)
     artist.facebook_link = form.facebook_link.data
     artist.image_link = form.image_link.data
     artist.website = form.website_link.data
     artist.seeking_venue = form.seeking_venue.data
     artist.seeking_description = form.seeking_description.data
+    # Genre changes only touch artist_genres; bump the row so its version
+    # (and so the page ETag) moves too
+    artist.updated_at = datetime.utcnow()
     
-    # Commit changes
+    # Commit changes, then drop every cached page that shows this artist
     db.session.commit()
+    page_cache.delete_many(artist_page_keys(db.session, artist_id))
+    suggest_index(app).put(Artist, artist_id, artist.name, artist.upcoming_shows_count)
     flash(f'Artist {artist.name} was successfully updated!')
     
     return redirect(url_for('show_artist', artist_id=artist_id))
     
-  except Exception as e:
+  except Exception:
     db.session.rollback()
-    print(f"Error updating artist: {e}")
+    app.logger.exception('Error updating artist')
     flash(f'An error occurred. Artist could not be updated.')
     return redirect(url_for('show_artist', artist_id=artist_id))
   finally:
@@ -621,7 +777,7 @@ def edit_venue(venue_id):
     form.state.data = venue.state
     form.address.data = venue.address
     form.phone.data = venue.phone
-    form.genres.data = venue.genres.split(',') if venue.genres else []
+    form.genres.data = venue.genre_names
     form.facebook_link.data = venue.facebook_link
     form.image_link.data = venue.image_link
     form.website_link.data = venue.website
@@ -632,7 +788,7 @@ def edit_venue(venue_id):
     venue_data = {
       "id": venue.id,
       "name": venue.name,
-      "genres": venue.genres.split(',') if venue.genres else [],
+      "genres": venue.genre_names,
       "address": venue.address,
       "city": venue.city,
       "state": venue.state,
@@ -645,8 +801,8 @@ def edit_venue(venue_id):
     }
     
     return render_template('forms/edit_venue.html', form=form, venue=venue_data)
-  except Exception as e:
-    print(f"Error in edit_venue: {e}")
+  except Exception:
+    app.logger.exception('Error in edit_venue')
     db.session.rollback()
     return render_template('errors/500.html'), 500
   finally:
@@ -671,22 +827,27 @@ def edit_venue_submission(venue_id):
     venue.state = form.state.data
     venue.address = form.address.data
     venue.phone = form.phone.data
-    venue.genres = ','.join(form.genres.data) if isinstance(form.genres.data, list) else form.genres.data
+    venue.genres = get_genres(db.session, form.genres.data)
     venue.facebook_link = form.facebook_link.data
     venue.image_link = form.image_link.data
     venue.website = form.website_link.data
     venue.seeking_talent = form.seeking_talent.data
     venue.seeking_description = form.seeking_description.data
+    # Genre changes only touch venue_genres; bump the row so its version
+    # (and so the page ETag) moves too
+    venue.updated_at = datetime.utcnow()
     
-    # Commit changes
+    # Commit changes, then drop every cached page that shows this venue
     db.session.commit()
+    page_cache.delete_many(venue_page_keys(db.session, venue_id))
+    suggest_index(app).put(Venue, venue_id, venue.name, venue.upcoming_shows_count)
     flash(f'Venue {venue.name} was successfully updated!')
     
     return redirect(url_for('show_venue', venue_id=venue_id))
     
-  except Exception as e:
+  except Exception:
     db.session.rollback()
-    print(f"Error updating venue: {e}")
+    app.logger.exception('Error updating venue')
     flash(f'An error occurred. Venue could not be updated.')
     return redirect(url_for('show_venue', venue_id=venue_id))
   finally:
@@ -712,7 +873,7 @@ def create_artist_submission():
       city=form.city.data,
       state=form.state.data,
       phone=form.phone.data,
-      genres=','.join(form.genres.data) if isinstance(form.genres.data, list) else form.genres.data,
+      genres=get_genres(db.session, form.genres.data),
       facebook_link=form.facebook_link.data,
       image_link=form.image_link.data,
       website=form.website_link.data,
@@ -723,13 +884,14 @@ def create_artist_submission():
     # Add to database
     db.session.add(artist)
     db.session.commit()
+    suggest_index(app).put(Artist, artist.id, artist.name, artist.upcoming_shows_count)
     
     # Flash success message
     flash('Artist ' + form.name.data + ' was successfully listed!')
     
-  except Exception as e:
+  except Exception:
     db.session.rollback()
-    print(f"Error creating artist: {e}")
+    app.logger.exception('Error creating artist')
     # Flash error message
     flash('An error occurred. Artist ' + request.form.get('name', '') + ' could not be listed.')
   finally:
@@ -742,6 +904,7 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@query_budget(2)
 def shows():
   # displays list of shows at /shows
   # TODO: replace with real venues data.
@@ -784,20 +947,20 @@ def shows():
   # }]
   
   # Replace with real venue data from database
-  data = []
-  shows = Show.query.join(Artist).join(Venue).all()
-  
-  for show in shows:
-    data.append({
-      "venue_id": show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%dT%H:%M:%S.000Z')
-    })
-  
-  return render_template('pages/shows.html', shows=data)
+  # Shows starting in a window (by default the next SHOWS_WINDOW_DAYS), one
+  # page at a time in start_time order (ties broken by id).
+  page_args = pagination_args()
+  start, end = shows_window_args()
+  # Tiles show artist and venue names too, so any of the three tables
+  # changing invalidates the page; only shows in the window are counted.
+  validators = listing_validators(db.session, Show, Artist, Venue,
+                                  count_where={Show: show_window(start, end)})
+  if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), start, end, *validators),
+                  max(filter(None, validators[1::2]), default=None)):
+    return not_modified_response()
+  page = keyset_paginate(db.session, shows_query(start, end), SHOW_KEYS, **page_args)
+  return render_shows(page, start, end)
+
 
 @app.route('/shows/create')
 def create_shows():
@@ -812,17 +975,38 @@ def create_show_submission():
   # >>>> Done - see create_show_submission function below.
   
   error = False
+  # Fields only: like the other forms, the template carries no CSRF token.
+  form = ShowForm(request.form, meta={'csrf': False})
+  if not form.validate():
+    for field, messages in form.errors.items():
+      flash(f'Show could not be listed: {field}: {", ".join(messages)}')
+    return render_template('forms/new_show.html', form=form), 400
   try:
-    form = ShowForm(request.form)
-    show = Show(
-      artist_id=form.artist_id.data,
+    # Rejects bookings that overlap another show at the venue or by the
+    # artist (see booking.py).
+    show = book_show(
+      db.session,
       venue_id=form.venue_id.data,
-      start_time=form.start_time.data
+      artist_id=form.artist_id.data,
+      start_time=form.start_time.data,
+      duration=timedelta(minutes=form.duration.data),
+      max_duration=timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES']),
     )
-    db.session.add(show)
+    record_show_created(db.session, show)
     db.session.commit()
+    page_cache.delete_many([venue_page_key(show.venue_id), artist_page_key(show.artist_id)])
+    if show.start_time > datetime.now():
+      suggest_index(app).adjust(Venue, show.venue_id, 1)
+      suggest_index(app).adjust(Artist, show.artist_id, 1)
+  except (BookingConflict, InvalidBooking) as e:
+    db.session.rollback()
+    # Back to the form, with what clashed, so the time can be changed.
+    flash(f'Show could not be listed: {e}')
+    status = 409 if isinstance(e, BookingConflict) else 400
+    return render_template('forms/new_show.html', form=form), status
   except:
     error = True
+    app.logger.exception('Error creating show')
     db.session.rollback()
   finally:
     db.session.close()
@@ -847,15 +1031,79 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# Logging is set up by configure_logging() in App Config: records go through
+# a queue to a rotating LOG_FILE, written off the request thread.
+
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+  """EXPLAIN the hot queries; exit non-zero if any sequentially scans Show."""
+  failed = False
+  for name, (lines, offending) in check_query_plans().items():
+    click.echo(f"[{'FAIL' if offending else 'ok'}] {name}")
+    for line in lines:
+      click.echo(f'    {line}')
+    if offending:
+      click.echo(f"    sequential scan on {', '.join(offending)}")
+      failed = True
+  if failed:
+    raise SystemExit(1)
+
+@app.cli.command('reconcile-show-counters')
+@click.option('--every', type=int, default=None,
+              help='Keep running, reconciling every N seconds.')
+def reconcile_show_counters_command(every):
+  """Roll shows from upcoming to past and repair the show counters."""
+  while True:
+    changed = reconcile_show_counters(db.session)
+    db.session.commit()
+    click.echo(f'Reconciled show counters: {changed} rows updated')
+    if not every:
+      break
+    time.sleep(every)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+  """Bundle, minify, fingerprint and precompress the CSS and JS."""
+  started = time.perf_counter()
+  manifest = assets.build()
+  for name, filename in sorted(manifest['bundles'].items()):
+    sizes = ', '.join(f'{encoding} {size:,}' for encoding, size in manifest['sizes'][name].items())
+    click.echo(f'  {name} -> {filename} ({sizes} bytes)')
+  click.echo(f'Built assets into {assets.output_folder} in {time.perf_counter() - started:.1f}s')
+
+@app.cli.command('load-catalog')
+@click.option('--venues', 'venues_path', type=click.Path(exists=True, dir_okay=False),
+              help='CSV/NDJSON of venues (genres comma separated).')
+@click.option('--artists', 'artists_path', type=click.Path(exists=True, dir_okay=False),
+              help='CSV/NDJSON of artists (genres comma separated).')
+@click.option('--shows', 'shows_path', type=click.Path(exists=True, dir_okay=False),
+              help='CSV/NDJSON of shows: start_time plus venue_id or venue (name) '
+                   'and artist_id or artist (name).')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True)
+@click.option('--no-copy', is_flag=True, help='Use multi-row INSERTs even on Postgres.')
+def load_catalog_command(venues_path, artists_path, shows_path, batch_size, no_copy):
+  """Bulk load venues, artists and shows from CSV or NDJSON files."""
+  def progress(stats):
+    click.echo(f'\r  {stats}', nl=False)
+
+  loader = CatalogLoader(db.engine, batch_size=batch_size, use_copy=not no_copy, progress=progress,
+                         max_duration=timedelta(minutes=app.config['SHOW_MAX_DURATION_MINUTES']))
+  click.echo(f"Loading with {'COPY' if loader.use_copy else 'multi-row INSERT'}, batches of {batch_size}")
+  for path, load in ((venues_path, loader.load_venues),
+                     (artists_path, loader.load_artists),
+                     (shows_path, loader.load_shows)):
+    if path:
+      load(read_records(path))
+      click.echo()
+  if shows_path:
+    started = time.perf_counter()
+    changed = reconcile_show_counters(db.session)
+    db.session.commit()
+    click.echo(f'  show counters: {changed} rows updated in {time.perf_counter() - started:.1f}s')
 
 #----------------------------------------------------------------------------#
 # Launch.
@@ -875,19 +1123,25 @@ if __name__ == '__main__':
 @app.route('/artists/<int:artist_id>/delete', methods=['POST'])
 def delete_artist(artist_id):
     try:
-        artist = Artist.query.get_or_404(artist_id)
+        artist_name = db.session.execute(select(Artist.name).where(Artist.id == artist_id)).scalar()
+        if artist_name is None:
+            abort(404)
         
-        # Delete associated shows first
-        Show.query.filter_by(artist_id=artist_id).delete()
+        # Shows first, a batch per transaction; more than one batch of them
+        # and the artist is deleted in the background
+        if count_shows(db.session, Artist, artist_id) > app.config['DELETE_BATCH_SIZE']:
+            delete_jobs.submit(artist_ids=[artist_id])
+            flash(f'Artist {artist_name} is being deleted.')
+            return redirect(url_for('artists'))
         
-        # Delete the artist
-        db.session.delete(artist)
-        db.session.commit()
+        delete_entities(db.session, Artist, [artist_id], app.config['DELETE_BATCH_SIZE'])
+        forget_deleted(Artist, [artist_id])
         
-        flash(f'Artist {artist.name} was successfully deleted!')
+        flash(f'Artist {artist_name} was successfully deleted!')
         return redirect(url_for('artists'))
         
     except Exception as e:
         db.session.rollback()
+        app.logger.exception('Error deleting artist')
         flash(f'An error occurred deleting the artist: {str(e)}')
         return redirect(url_for('show_artist', artist_id=artist_id))
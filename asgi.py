@@ -0,0 +1,16 @@
+"""ASGI entry point: the search, listing and JSON read routes as coroutines
+on SQLAlchemy's asyncio engine, everything else as the WSGI app.
+
+    uvicorn asgi:application --workers 4
+
+Set ASYNC_VIEWS=0 to serve every route through WSGI (same as app:app
+under a threaded server).
+"""
+from aio import AsyncApp, AsyncDatabase
+from app import app, warm_suggest_index
+from async_views import routes
+
+warm_suggest_index()
+
+database = AsyncDatabase(app)
+application = AsyncApp(app, routes, database)
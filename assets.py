@@ -0,0 +1,331 @@
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+  import brotli
+except ImportError:  # Brotli variants are skipped without it.
+  brotli = None
+
+
+# Static CSS/JS pipeline. The stylesheets and scripts main.html used to link
+# one by one are concatenated and minified into a few bundles, named after
+# a hash of their content and precompressed with gzip and brotli:
+#
+#   static/dist/main.3f9a0c1d2e4b.css   (.gz, .br)
+#   static/dist/manifest.json           bundle name -> file name
+#
+# `flask build-assets` writes them as a deploy step. An app that finds the
+# manifest missing or built from other sources builds it itself on first
+# use, so a forgotten step costs a slow first page rather than a broken one.
+# Older bundles are left in place: pages rendered before a rebuild (cached
+# by browsers or the page cache) keep pointing at files that exist.
+#
+# /assets/<file> serves them with a year's max-age and `immutable`, picking
+# the .br or .gz variant the client accepts. A front-end server can serve
+# ASSETS_FOLDER directly instead (nginx: gzip_static / brotli_static).
+#
+# Templates link bundles through asset_urls(name): the bundle's hashed URL,
+# or with ASSETS_BUNDLE=0 the source files, for debugging them.
+
+BUNDLES = {
+  'main.css': [
+    'css/bootstrap.min.css',
+    'css/layout.main.css',
+    'css/main.css',
+    'css/main.responsive.css',
+    'css/main.quickfix.css',
+  ],
+  # Loaded in <head>, before the page renders.
+  'head.js': [
+    'js/libs/modernizr-2.8.2.min.js',
+    'js/libs/moment.min.js',
+  ],
+  # Deferred: runs once the document is parsed, in this order.
+  'main.js': [
+    'js/libs/jquery-1.11.1.min.js',
+    'js/libs/bootstrap-3.1.1.min.js',
+    'js/plugins.js',
+    'js/script.js',
+  ],
+}
+# Bumped when the build itself changes, so existing builds are redone.
+PIPELINE_VERSION = '1'
+ASSET_MAX_AGE = 365 * 24 * 3600
+MANIFEST = 'manifest.json'
+# Content-Encoding -> file suffix, in order of preference.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+logger = logging.getLogger(__name__)
+
+
+#----------------------------------------------------------------------------#
+# Minification.
+#----------------------------------------------------------------------------#
+
+# Strings, comments and (for JS) regex literals are copied through as they
+# are; only the code between them is squeezed. Whitespace is collapsed but
+# newlines are kept in JS, so automatic semicolon insertion still sees
+# them. Files already minified (*.min.*) are left alone.
+
+_CSS_TOKENS = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/''', re.S)
+_JS_TOKENS = re.compile(r'''"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`|/\*.*?\*/|//[^\n]*|/''', re.S)
+_JS_REGEX = re.compile(r'/(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/[a-z]*')
+# A '/' after one of these starts a regex literal, not a division.
+_JS_BEFORE_REGEX = set('(,=:[!&|?{};+-*%<>~^') | {''}
+_JS_KEYWORDS_BEFORE_REGEX = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|in|of|delete|void|throw|new)$')
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*|:\s+')
+_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def minify_css(text):
+  out = []
+  position = 0
+  for match in _CSS_TOKENS.finditer(text):
+    out.append(_squeeze_css(text[position:match.start()]))
+    token = match.group()
+    if not token.startswith('/*') or token.startswith('/*!'):
+      out.append(token)
+    position = match.end()
+  out.append(_squeeze_css(text[position:]))
+  return ''.join(out).strip()
+
+
+def _squeeze_css(code):
+  code = re.sub(r'\s+', ' ', code)
+  return _CSS_PUNCTUATION.sub(lambda match: match.group(1) or ':', code).replace(';}', '}')
+
+
+def minify_js(text):
+  out = []
+  code = []
+  # The last few significant characters before the current position.
+  before = ''
+  position = 0
+  while True:
+    match = _JS_TOKENS.search(text, position)
+    if match is None:
+      break
+    code.append(text[position:match.start()])
+    before = (before + text[position:match.start()]).rstrip()[-32:]
+    token = match.group()
+    position = match.end()
+    if token == '/':
+      # Division, or the start of a regex literal.
+      regex = _JS_REGEX.match(text, match.start())
+      if regex and (before[-1:] in _JS_BEFORE_REGEX or _JS_KEYWORDS_BEFORE_REGEX.search(before)):
+        token = regex.group()
+        position = regex.end()
+      else:
+        code.append(token)
+        before += token
+        continue
+    elif token.startswith('//') or (token.startswith('/*') and not token.startswith('/*!')):
+      # A comment still separates what is either side of it.
+      code.append('\n' if token.startswith('//') or '\n' in token else ' ')
+      continue
+    out.append(_squeeze_js(''.join(code)))
+    out.append(token)
+    before = (before + token)[-32:]
+    code = []
+  code.append(text[position:])
+  out.append(_squeeze_js(''.join(code)))
+  return ''.join(out).strip()
+
+
+def _squeeze_js(code):
+  code = re.sub(r'[ \t\r\f\v]+', ' ', code)
+  return re.sub(r' ?\n[\s]*', '\n', code)
+
+
+#----------------------------------------------------------------------------#
+# Building.
+#----------------------------------------------------------------------------#
+
+def sources_digest(static_folder, bundles=BUNDLES):
+  """Digest of the bundle definitions and every source file's content."""
+  digest = hashlib.sha1(PIPELINE_VERSION.encode())
+  for name, sources in sorted(bundles.items()):
+    digest.update(name.encode())
+    for source in sources:
+      digest.update(source.encode())
+      with open(os.path.join(static_folder, source), 'rb') as handle:
+        digest.update(handle.read())
+  return digest.hexdigest()[:12]
+
+
+def bundle(static_folder, static_url_path, name, sources):
+  """The minified, concatenated content of one bundle."""
+  parts = []
+  for source in sources:
+    with open(os.path.join(static_folder, source), encoding='utf-8') as handle:
+      text = handle.read()
+    minified = '.min.' in posixpath.basename(source)
+    if name.endswith('.css'):
+      text = _rebase_urls(text, source, static_url_path)
+      parts.append(text.strip() if minified else minify_css(text))
+    else:
+      parts.append(text.strip() if minified else minify_js(text))
+  # A script that ends without a semicolon must not run into the next one.
+  return ('\n' if name.endswith('.css') else ';\n').join(parts) + '\n'
+
+
+def _rebase_urls(text, source, static_url_path):
+  # Relative url()s point next to the source file; the bundle is served
+  # from elsewhere, so make them absolute /static/ paths.
+  def rebase(match):
+    url = match.group(2).strip()
+    if url.startswith(('/', '#', 'data:')) or '://' in url:
+      return match.group()
+    path, _, suffix = url.partition('?')
+    path, hash_mark, fragment = path.partition('#')
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+    rebased = f'{static_url_path}/{resolved}'
+    if suffix:
+      rebased += '?' + suffix
+    if hash_mark:
+      rebased += '#' + fragment
+    return f'url("{rebased}")'
+  return _URL.sub(rebase, text)
+
+
+def build_assets(static_folder, output_folder, static_url_path='/static', bundles=BUNDLES):
+  """Write every bundle, its compressed variants and the manifest; return the manifest."""
+  os.makedirs(output_folder, exist_ok=True)
+  manifest = {"version": sources_digest(static_folder, bundles), "bundles": {}, "sizes": {}}
+  for name, sources in bundles.items():
+    data = bundle(static_folder, static_url_path, name, sources).encode('utf-8')
+    stem, extension = posixpath.splitext(name)
+    filename = f'{stem}.{hashlib.sha1(data).hexdigest()[:12]}{extension}'
+    path = os.path.join(output_folder, filename)
+    sizes = {"identity": len(data)}
+    _write(path, data)
+    for encoding, compressed in _compress(data):
+      # Only worth serving when it is smaller.
+      if len(compressed) < len(data):
+        _write(path + dict(ENCODINGS)[encoding], compressed)
+        sizes[encoding] = len(compressed)
+    manifest['bundles'][name] = filename
+    manifest['sizes'][name] = sizes
+  _write(os.path.join(output_folder, MANIFEST), json.dumps(manifest, indent=2).encode())
+  return manifest
+
+
+def _compress(data):
+  yield 'gzip', gzip.compress(data, compresslevel=9, mtime=0)
+  if brotli is not None:
+    yield 'br', brotli.compress(data, quality=11)
+
+
+def _write(path, data):
+  # Atomic, so a worker building at the same time never serves half a file.
+  fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+  try:
+    with os.fdopen(fd, 'wb') as handle:
+      handle.write(data)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+  except BaseException:
+    if os.path.exists(temporary):
+      os.remove(temporary)
+    raise
+
+
+#----------------------------------------------------------------------------#
+# Serving.
+#----------------------------------------------------------------------------#
+
+class Assets(object):
+  """The app's bundles: built on demand and linked from the templates."""
+
+  def __init__(self, static_folder, static_url_path, output_folder, bundles=BUNDLES, enabled=True):
+    self.static_folder = static_folder
+    self.static_url_path = static_url_path
+    self.output_folder = output_folder
+    self.bundles = bundles
+    self.enabled = enabled
+    # Known without building, so page ETags can include it up front.
+    self.version = sources_digest(static_folder, bundles) if enabled else 'unbundled'
+    self.manifest = None
+    self._lock = threading.Lock()
+
+  def build(self):
+    manifest = build_assets(self.static_folder, self.output_folder, self.static_url_path, self.bundles)
+    with self._lock:
+      self.manifest = manifest
+    return manifest
+
+  def urls(self, name):
+    """URLs to link for bundle `name`: its hashed file, or its sources."""
+    manifest = self._current_manifest() if self.enabled else None
+    if manifest is None:
+      return [url_for('static', filename=source) for source in self.bundles[name]]
+    return [url_for('asset', filename=manifest['bundles'][name])]
+
+  def _current_manifest(self):
+    if self.manifest is not None:
+      return self.manifest
+    with self._lock:
+      if self.manifest is None:
+        self.manifest = self._load_or_build()
+      return self.manifest or None
+
+  def _load_or_build(self):
+    try:
+      with open(os.path.join(self.output_folder, MANIFEST)) as handle:
+        manifest = json.load(handle)
+      if manifest.get('version') == self.version:
+        return manifest
+    except (OSError, ValueError):
+      pass
+    logger.warning('asset bundles missing or out of date in %s; building them (run `flask build-assets` '
+                   'when deploying)', self.output_folder)
+    try:
+      return build_assets(self.static_folder, self.output_folder, self.static_url_path, self.bundles)
+    except OSError:
+      # A read-only deploy: link the source files rather than fail pages.
+      logger.exception('could not build asset bundles; linking the source files')
+      return {}
+
+  def send(self, filename):
+    path = safe_join(self.output_folder, filename)
+    if path is None or filename == MANIFEST or not os.path.isfile(path):
+      abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in ENCODINGS:
+      if request.accept_encodings[name] and os.path.isfile(path + suffix):
+        encoding, path = name, path + suffix
+        break
+    response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+      response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    # The name changes with the content, so a copy never needs revalidating.
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def configure_assets(app):
+  """Register /assets/ and the asset_urls() template helper; return the Assets."""
+  assets = Assets(
+    app.static_folder,
+    app.static_url_path,
+    app.config.get('ASSETS_FOLDER') or os.path.join(app.static_folder, 'dist'),
+    enabled=app.config.get('ASSETS_BUNDLE', True),
+  )
+  app.extensions['assets'] = assets
+  app.add_url_rule('/assets/<path:filename>', 'asset', assets.send)
+  app.jinja_env.globals['asset_urls'] = assets.urls
+  return assets
@@ -0,0 +1,173 @@
+from flask import current_app, render_template, request
+from sqlalchemy import select
+
+from aio import AsyncRoutes, AsyncStreamResponse
+from api import (STREAM_BATCH_SIZE, BadRequest, artists_export, availability_search, encode_row,
+                 find_recommendations, find_suggestions, int_arg, recommendation_limit,
+                 render_available_venues, render_recommendations, render_suggestions, shows_export,
+                 split_genres, stream_format, suggest_models, venues_export)
+from app import (app, TEMPLATE_DIGEST, listing_filters, not_modified, not_modified_response,
+                 pagination_args, render_artist_list, render_search_results, render_shows,
+                 render_venue_areas, search_backend, shows_window_args, wants_json)
+from conditional import listing_validators, make_etag
+from models import Venue, Artist, Show
+from pagination import keyset_paginate
+from queries import VENUE_AREA_KEYS, SHOW_KEYS, venue_areas_query, show_window, shows_query
+from recommendations import recommendation_index
+from suggest import suggest_index
+
+
+# Coroutine versions of the read-heavy routes, served by asgi.py. Each one
+# mirrors its WSGI view in app.py / api.py: same request parsing, same
+# queries (run on the asyncio engine through AsyncDatabase.run) and the same
+# rendering helpers. Keep the two in step when changing either.
+
+routes = AsyncRoutes()
+
+
+def database():
+  return current_app.extensions['async_db']
+
+
+#----------------------------------------------------------------------------#
+# Listings and search.
+#----------------------------------------------------------------------------#
+
+@routes.route('/venues')
+async def venues():
+  page_args = pagination_args()
+  validators = await database().run(listing_validators, Venue)
+  if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), *validators),
+                  validators[1]):
+    return not_modified_response()
+  try:
+    page = await database().run(keyset_paginate, venue_areas_query(listing_filters(Venue, request.args)),
+                                VENUE_AREA_KEYS, **page_args)
+    return render_venue_areas(page)
+  except Exception:
+    app.logger.exception('Error in venues route')
+    return render_template('errors/500.html'), 500
+
+
+@routes.route('/venues/search', methods=['POST'])
+async def search_venues():
+  try:
+    search_term = request.form.get('search_term', '')
+    venues = await database().run(search_backend().search, Venue, search_term,
+                                  filters=listing_filters(Venue, request.values))
+    return render_search_results('pages/search_venues.html', venues, search_term)
+  except Exception:
+    app.logger.exception('Error in search_venues')
+    return render_template('errors/500.html'), 500
+
+
+@routes.route('/artists')
+async def artists():
+  page_args = pagination_args()
+  validators = await database().run(listing_validators, Artist)
+  if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), *validators),
+                  validators[1]):
+    return not_modified_response()
+  try:
+    stmt = select(Artist.id, Artist.name).where(*listing_filters(Artist, request.args))
+    page = await database().run(keyset_paginate, stmt, [Artist.id], **page_args)
+    return render_artist_list(page)
+  except Exception:
+    app.logger.exception('Error in artists route')
+    return render_template('errors/500.html'), 500
+
+
+@routes.route('/artists/search', methods=['POST'])
+async def search_artists():
+  try:
+    search_term = request.form.get('search_term', '')
+    artists = await database().run(search_backend().search, Artist, search_term,
+                                   filters=listing_filters(Artist, request.values))
+    return render_search_results('pages/search_artists.html', artists, search_term)
+  except Exception:
+    app.logger.exception('Error in search_artists')
+    return render_template('errors/500.html'), 500
+
+
+@routes.route('/shows')
+async def shows():
+  page_args = pagination_args()
+  start, end = shows_window_args()
+  validators = await database().run(listing_validators, Show, Artist, Venue,
+                                    count_where={Show: show_window(start, end)})
+  if not_modified(make_etag(TEMPLATE_DIGEST, request.full_path, wants_json(), start, end, *validators),
+                  max(filter(None, validators[1::2]), default=None)):
+    return not_modified_response()
+  page = await database().run(keyset_paginate, shows_query(start, end), SHOW_KEYS, **page_args)
+  return render_shows(page, start, end)
+
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+def stream_rows(stmt, transform=None):
+  # api.stream_rows on the asyncio engine.
+  as_array, mimetype = stream_format()
+
+  async def generate():
+    if as_array:
+      yield '['
+    first = True
+    async for row in database().stream(stmt, STREAM_BATCH_SIZE):
+      yield encode_row(row, first, as_array, transform)
+      first = False
+    if as_array:
+      yield ']'
+
+  return AsyncStreamResponse(generate(), mimetype=mimetype)
+
+
+@routes.route('/api/shows')
+async def export_shows():
+  return stream_rows(shows_export())
+
+
+@routes.route('/api/venues')
+async def export_venues():
+  return stream_rows(venues_export(), transform=split_genres)
+
+
+@routes.route('/api/artists')
+async def export_artists():
+  return stream_rows(artists_export(), transform=split_genres)
+
+
+@routes.route('/api/venues/available')
+async def available_venues():
+  stmt, keys, paging = availability_search()
+  try:
+    page = await database().run(keyset_paginate, stmt, keys, **paging)
+  except ValueError as error:
+    raise BadRequest(str(error))
+  return render_available_venues(page)
+
+
+async def recommend(subject_model, subject_id):
+  # Arguments are read here, in the request's context, not inside the
+  # session callback.
+  items = await database().run(find_recommendations, recommendation_index(current_app),
+                               subject_model, subject_id, recommendation_limit())
+  return render_recommendations(subject_model, subject_id, items)
+
+
+@routes.route('/api/artists/<int:artist_id>/recommended-venues')
+async def recommended_venues(artist_id):
+  return await recommend(Artist, artist_id)
+
+
+@routes.route('/api/venues/<int:venue_id>/recommended-artists')
+async def recommended_artists(venue_id):
+  return await recommend(Venue, venue_id)
+
+
+@routes.route('/api/suggest')
+async def suggest():
+  items = await database().run(find_suggestions, suggest_index(current_app), request.args.get('q', ''),
+                               suggest_models(), int_arg('limit') or 10)
+  return render_suggestions(items)
@@ -0,0 +1,75 @@
+from sqlalchemy import case, exists, func, literal, select
+
+from booking import DEFAULT_MAX_SHOW_DURATION, overlaps
+from genres import genre_filter
+from models import Genre, Venue, Show, venue_genres
+
+
+# "Which Jazz venues in San Francisco have nothing booked on Friday night?"
+#
+# Candidates come from the genre index (venue_genres by genre_id) and the
+# (state, city, id) index; each candidate is then kept only if it has no
+# show overlapping the window, an anti-join probing
+# ix_Show_venue_id_start_time for the slice of shows that could overlap
+# (see booking.overlaps). Nothing is loaded per venue, so the cost grows
+# with the number of candidates, not with the size of the Show table.
+
+
+def genre_matches_column(genres):
+  """Correlated subquery: how many of `genres` the venue is tagged with."""
+  if not genres:
+    return literal(0)
+  return (
+    select(func.count())
+    .select_from(venue_genres)
+    .join(Genre, Genre.id == venue_genres.c.genre_id)
+    .where(venue_genres.c.venue_id == Venue.id, Genre.name.in_(genres))
+    .scalar_subquery()
+  )
+
+
+def availability_keys(genres=()):
+  """Ranking, as ascending keys for keyset_paginate.
+
+  Venues matching more of the requested genres first, then venues looking
+  for talent, then the busiest venues (most upcoming shows), then by id.
+  """
+  return (
+    (-genre_matches_column(genres)).label('genre_rank'),
+    case((Venue.seeking_talent.is_(True), 0), else_=1).label('seeking_rank'),
+    (-Venue.upcoming_shows_count).label('popularity_rank'),
+    Venue.id,
+  )
+
+
+def available_venues_query(start_time, end_time, genres=(), city=None, state=None,
+                           keys=None, max_duration=DEFAULT_MAX_SHOW_DURATION):
+  """Venues with no show overlapping [start_time, end_time), best match first.
+
+  `genres` matches any of them; `keys` are the availability_keys(genres)
+  the caller paginates on.
+  """
+  keys = keys or availability_keys(genres)
+  booked = exists().where(*overlaps(Show.venue_id, Venue.id, start_time, end_time, max_duration))
+  stmt = (
+    select(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.address,
+      Venue.image_link,
+      Venue.seeking_talent,
+      Venue.upcoming_shows_count.label('num_upcoming_shows'),
+      *keys[:-1],
+    )
+    .where(~booked)
+    .order_by(*keys)
+  )
+  if genres:
+    stmt = stmt.where(genre_filter(Venue, genres))
+  if state:
+    stmt = stmt.where(Venue.state == state)
+  if city:
+    stmt = stmt.where(Venue.city == city)
+  return stmt
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare what a page costs in CSS/JS requests and bytes, with the asset
+bundles (assets.py) and with the source files linked one by one.
+
+Renders the home page through the test client twice, with ASSETS_BUNDLE=1
+and 0, and fetches every local stylesheet and script it links: once as a
+first visit, then as a repeat visit that revalidates anything the first
+response did not mark as cacheable. Reports requests and bytes transferred
+per encoding, plus the bundle build time.
+
+    python benchmarks/bench_assets.py
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LINKS = re.compile(r'''(?:href|src)="(/(?:static|assets)/[^"]+\.(?:css|js))"''')
+
+
+def measure(encoding):
+  from app import app
+  client = app.test_client()
+  html = client.get('/').get_data(as_text=True)
+  # The IE-only conditional comment is not fetched by other browsers.
+  html = re.sub(r'<!--\[if.*?<!\[endif\]-->', '', html, flags=re.S)
+  urls = LINKS.findall(html)
+  headers = {'Accept-Encoding': encoding} if encoding else {}
+  first = repeat = 0
+  repeat_requests = 0
+  for url in urls:
+    response = client.get(url, headers=headers)
+    first += len(response.data)
+    if 'immutable' in response.headers.get('Cache-Control', ''):
+      continue
+    # Not cacheable outright: the browser revalidates on the next visit.
+    response = client.get(url, headers=dict(headers, **{'If-None-Match': response.headers.get('ETag', '')}))
+    repeat += len(response.data)
+    repeat_requests += 1
+  return len(urls), first, repeat_requests, repeat
+
+
+def main():
+  if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+    for encoding in ('', 'gzip', 'br, gzip'):
+      print('\t'.join(map(str, (encoding or 'identity',) + measure(encoding))))
+    return
+
+  env = dict(os.environ, DATABASE_URL='sqlite://', PAGE_CACHE_BACKEND='null', LOG_LEVEL='WARNING',
+             LOG_FILE=os.path.join(tempfile.gettempdir(), 'fyyur-bench.log'))
+  with tempfile.TemporaryDirectory() as folder:
+    env['ASSETS_FOLDER'] = folder
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'flask', 'build-assets'], cwd=ROOT, env=dict(env, FLASK_APP='app.py'),
+                   check=True, stdout=subprocess.DEVNULL)
+    print(f'flask build-assets: {time.perf_counter() - started:.1f}s (including app import)')
+    print(f"{'':<10} {'encoding':<10} {'requests':>8} {'first visit':>12} {'revalidated':>11} {'repeat bytes':>12}")
+    for label, bundled in (('sources', '0'), ('bundles', '1')):
+      output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure'], cwd=ROOT,
+                              env=dict(env, ASSETS_BUNDLE=bundled), check=True, capture_output=True, text=True)
+      for line in output.stdout.splitlines():
+        encoding, requests, first, repeat_requests, repeat = line.split('\t')
+        print(f'{label:<10} {encoding:<10} {requests:>8} {int(first):>12,} {repeat_requests:>11} {int(repeat):>12,}')
+
+
+if __name__ == '__main__':
+  main()
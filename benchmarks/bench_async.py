@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Load test the asyncio serving mode (asgi.py) against the same app served as WSGI.
+
+Loads a synthetic catalog (see dataset.py), then starts one uvicorn worker
+twice, with ASYNC_VIEWS=0 (every route through WSGI on ASGI_WSGI_THREADS
+threads) and ASYNC_VIEWS=1 (search, listing and JSON read routes as
+coroutines on the asyncio engine), and drives each with --clients
+concurrent keep-alive clients for --duration seconds over a mix of search,
+listing and JSON requests. Reports throughput and latency per mode.
+
+A local SQLite file answers in microseconds, which hides what the async
+path is for: waiting on database round trips. --latency-ms adds a
+simulated round trip to every SQLite statement, slept in the thread that
+runs it (the WSGI thread, or aiosqlite's connection thread), as a network
+hop to a database server would. With --database-url pointing at a real
+server, leave it at 0.
+
+    python benchmarks/bench_async.py [--scale small] [--clients 64] [--latency-ms 20]
+    python benchmarks/bench_async.py --database-url postgresql:///fyyur_bench --latency-ms 0
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import GENRES, add_dataset_arguments, dataset_from_args
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  add_dataset_arguments(parser)
+  parser.add_argument('--database-url', help='Empty database to load into (default: temp SQLite file).')
+  parser.add_argument('--skip-load', action='store_true',
+                      help='Reuse an already loaded --database-url with the same dataset options.')
+  parser.add_argument('--clients', type=int, default=64, help='Concurrent client connections.')
+  parser.add_argument('--duration', type=float, default=10, help='Seconds of load per mode.')
+  parser.add_argument('--threads', type=int, default=8, help='ASGI_WSGI_THREADS for the worker.')
+  parser.add_argument('--latency-ms', type=float, default=20,
+                      help='Simulated round trip added to every SQLite statement.')
+  parser.add_argument('--port', type=int, default=8765)
+  parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+  return parser.parse_args()
+
+
+def percentile(values, fraction):
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+#----------------------------------------------------------------------------#
+# Server.
+#----------------------------------------------------------------------------#
+
+def add_round_trip_latency(engine, seconds):
+  """Sleep `seconds` before every statement on `engine`'s SQLite connections."""
+  from sqlalchemy import event
+
+  @event.listens_for(engine, 'connect')
+  def on_connect(dbapi_connection, record):
+    raw = getattr(dbapi_connection, 'driver_connection', dbapi_connection)
+    # aiosqlite wraps the sqlite3 connection it runs on its own thread.
+    raw = getattr(raw, '_conn', raw)
+    # Statements prefixed '--' are the ones FTS5 runs internally.
+    raw.set_trace_callback(lambda statement: statement.startswith('--') or time.sleep(seconds))
+
+  engine.dispose()
+
+
+def serve(args):
+  # Runs in the child process started by start_server().
+  import uvicorn
+  from asgi import application, database
+  from models import db
+
+  if args.latency_ms:
+    with application.flask_app.app_context():
+      engines = [db.engine, database.engine.sync_engine]
+      if any(engine.dialect.name != 'sqlite' for engine in engines):
+        raise SystemExit('--latency-ms is only supported with SQLite')
+      for engine in engines:
+        add_round_trip_latency(engine, args.latency_ms / 1000)
+  uvicorn.run(application, host='127.0.0.1', port=args.port, log_level='warning')
+
+
+def start_server(args, async_views):
+  # The recommendation index is built once, in the warmup: rows just bulk
+  # loaded sit inside its refresh overlap and would be re-read every second.
+  env = dict(os.environ, ASYNC_VIEWS='1' if async_views else '0', ASGI_WSGI_THREADS=str(args.threads),
+             RECOMMENDATION_REFRESH_SECONDS='3600')
+  process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve'] + sys.argv[1:],
+                             cwd=ROOT, env=env)
+  deadline = time.monotonic() + 30
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise SystemExit(f'server exited with status {process.returncode}')
+    try:
+      connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=5)
+      connection.request('GET', '/')
+      connection.getresponse().read()
+      return process
+    except OSError:
+      time.sleep(0.1)
+  process.terminate()
+  raise SystemExit('server did not start')
+
+
+#----------------------------------------------------------------------------#
+# Load.
+#----------------------------------------------------------------------------#
+
+def request_mix(dataset):
+  """make(rng) -> (method, path, form data or None) factories, by name."""
+  now = dataset.now
+
+  def available(rng):
+    start = (now + timedelta(days=rng.randint(1, dataset.future_days))).replace(hour=19, minute=0, second=0)
+    return 'GET', (f'/api/venues/available?from={start.isoformat()}'
+                   f'&to={(start + timedelta(hours=5)).isoformat()}'
+                   f'&genre={urllib.parse.quote(rng.choice(GENRES))}&city=City%20{rng.randrange(5)}'), None
+
+  return {
+    "venues/search": lambda rng: ('POST', '/venues/search', {"search_term": rng.choice(GENRES)[:4]}),
+    "artists/search": lambda rng: ('POST', '/artists/search', {"search_term": rng.choice(GENRES)[:4]}),
+    "venues": lambda rng: ('GET', f'/venues?genre={urllib.parse.quote(rng.choice(GENRES))}', None),
+    "artists": lambda rng: ('GET', f'/artists?genre={urllib.parse.quote(rng.choice(GENRES))}', None),
+    "api/venues/available": available,
+    "api/artists/<id>/rec-venues":
+      lambda rng: ('GET', f"/api/artists/{dataset.popular_ids(rng, 'artist')[0]}/recommended-venues", None),
+  }
+
+
+def run_load(args, mix, seed):
+  deadline = time.monotonic() + args.duration
+  results = {name: [] for name in mix}
+  errors = []
+  lock = threading.Lock()
+
+  def client(index):
+    rng = random.Random(seed * 1000 + index)
+    connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=60)
+    names = sorted(mix)
+    while time.monotonic() < deadline:
+      name = rng.choice(names)
+      method, path, form = mix[name](rng)
+      headers = {}
+      body = None
+      if form is not None:
+        body = urllib.parse.urlencode(form)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+      began = time.perf_counter()
+      try:
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        response.read()
+        ok = response.status < 500
+      except (OSError, http.client.HTTPException):
+        connection.close()
+        connection = http.client.HTTPConnection('127.0.0.1', args.port, timeout=60)
+        ok = False
+      elapsed = (time.perf_counter() - began) * 1000
+      with lock:
+        (results[name] if ok else errors).append(elapsed)
+    connection.close()
+
+  threads = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return results, len(errors), time.perf_counter() - started
+
+
+def report(label, results, errors, elapsed):
+  timings = [value for values in results.values() for value in values]
+  print(f"{label:<6} {len(timings) / elapsed:>9.1f} req/s   p50={percentile(timings, 0.5):8.1f}ms "
+        f"p99={percentile(timings, 0.99):8.1f}ms   errors={errors}")
+  for name, values in sorted(results.items()):
+    if values:
+      print(f"  {name:<28} n={len(values):<6} p50={percentile(values, 0.5):8.1f}ms "
+            f"p99={percentile(values, 0.99):8.1f}ms")
+  return len(timings) / elapsed
+
+
+def main():
+  args = parse_args()
+  if args.serve:
+    return serve(args)
+
+  path = None
+  if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+  else:
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    # The server subprocess must load the same file.
+    sys.argv += ['--database-url', os.environ['DATABASE_URL'], '--skip-load']
+  os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'fyyur-bench.log'))
+  os.environ.setdefault('LOG_LEVEL', 'WARNING')
+  os.environ['PAGE_CACHE_BACKEND'] = 'null'
+
+  dataset = dataset_from_args(args)
+  try:
+    if not args.skip_load:
+      from app import app
+      from models import db
+      with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        for stats in dataset.load(db.engine):
+          print(f'  {stats}')
+        print(f'Loaded {args.scale} dataset in {time.perf_counter() - started:.1f}s')
+        db.engine.dispose()
+
+    mix = request_mix(dataset)
+    print(f"{args.clients} clients, {args.duration:g}s per mode, 1 worker, {args.threads} WSGI threads, "
+          f"{args.latency_ms:g}ms simulated round trip")
+    throughput = {}
+    for label, async_views in (('wsgi', False), ('async', True)):
+      server = start_server(args, async_views)
+      try:
+        # Warm the recommendation index and connection pools.
+        run_load(argparse.Namespace(**dict(vars(args), duration=1, clients=4)), mix, seed=0)
+        throughput[label] = report(label, *run_load(args, mix, seed=args.seed))
+      finally:
+        server.terminate()
+        server.wait()
+    print(f"async/wsgi throughput: {throughput['async'] / throughput['wsgi']:.2f}x")
+  finally:
+    if path:
+      os.remove(path)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark venue availability search against loading venues and their shows.
+
+Loads a synthetic catalog (100k venues and 10M shows by default; see
+dataset.py) and answers "which <genre> venues in <city> are free on
+<Friday night>" for a set of windows, with the previous approach (load the
+matching venues and walk each one's `shows`) and with the anti-join in
+availability.py, checking both agree.
+
+    python benchmarks/bench_availability.py [--venues 100000] [--shows 10000000]
+    python benchmarks/bench_availability.py --database-url postgresql:///fyyur_bench --skip-load
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import GENRES, Dataset
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--venues', type=int, default=100000)
+  parser.add_argument('--artists', type=int, default=100000)
+  parser.add_argument('--shows', type=int, default=10000000)
+  parser.add_argument('--cities', type=int, default=2000)
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database-url', help='Empty database to load into (default: temp SQLite file).')
+  parser.add_argument('--skip-load', action='store_true',
+                      help='Reuse an already loaded --database-url with the same dataset options.')
+  parser.add_argument('--searches', type=int, default=20, help='Windows searched per approach.')
+  parser.add_argument('--legacy-limit', type=int, default=5,
+                      help='Searches run the slow way (it loads every candidate venue).')
+  return parser.parse_args()
+
+
+def friday_nights(dataset, rng, count):
+  """(start, end, genre, city) searches over upcoming Friday evenings."""
+  days_to_friday = (4 - dataset.now.weekday()) % 7 or 7
+  first = (dataset.now + timedelta(days=days_to_friday)).replace(hour=19, minute=0, second=0)
+  searches = []
+  for _ in range(count):
+    start = first + timedelta(weeks=rng.randrange(0, dataset.future_days // 7))
+    # Popular cities, where the candidate lists are longest.
+    city = f'City {rng.randrange(min(5, dataset.cities))}'
+    searches.append((start, start + timedelta(hours=5), rng.choice(GENRES), city))
+  return searches
+
+
+def legacy_available(Venue, start, end, genre, city):
+  # What the ORM makes easy: filter venues, then test every show in Python.
+  available = []
+  for venue in Venue.query.filter(Venue.city == city).all():
+    if genre not in venue.genre_names:
+      continue
+    if any(show.start_time < end and show.end_time > start for show in venue.shows):
+      continue
+    available.append(venue.id)
+  return available
+
+
+def main():
+  args = parse_args()
+  path = None
+  if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+  else:
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+  os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'fyyur-bench.log'))
+
+  from sqlalchemy import event
+  from app import app
+  from models import db, Venue
+  from availability import available_venues_query
+
+  dataset = Dataset(venues=args.venues, artists=args.artists, shows=args.shows,
+                    cities=args.cities, seed=args.seed)
+  searches = friday_nights(dataset, random.Random(args.seed), args.searches)
+  try:
+    with app.app_context():
+      if not args.skip_load:
+        db.create_all()
+        started = time.perf_counter()
+        for stats in dataset.load(db.engine):
+          print(f'  {stats}')
+        print(f'Loaded in {time.perf_counter() - started:.1f}s')
+
+      statements = []
+      event.listen(db.engine, 'before_cursor_execute', lambda *a, **k: statements.append(1))
+
+      def measure(label, fn, runs):
+        timings, results = [], []
+        statements.clear()
+        for start, end, genre, city in runs:
+          db.session.expunge_all()
+          began = time.perf_counter()
+          results.append(sorted(fn(start, end, genre, city)))
+          timings.append(time.perf_counter() - began)
+        timings.sort()
+        print(f"{label:<10} searches={len(runs):<4} queries/search={len(statements) / len(runs):<8.1f} "
+              f"p50={timings[len(timings) // 2] * 1000:9.1f}ms max={timings[-1] * 1000:9.1f}ms "
+              f"venues/search={sum(map(len, results)) / len(runs):.0f}")
+        return results
+
+      def anti_join(start, end, genre, city):
+        stmt = available_venues_query(start, end, genres=[genre], city=city)
+        return [row.id for row in db.session.execute(stmt)]
+
+      print(f"{args.venues} venues, {args.shows} shows, {args.cities} cities")
+      legacy = measure('legacy', lambda *search: legacy_available(Venue, *search),
+                       searches[:args.legacy_limit])
+      current = measure('anti-join', anti_join, searches)
+      assert current[:len(legacy)] == legacy, 'the two approaches disagree'
+  finally:
+    if path:
+      os.remove(path)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark the `datetime` Jinja filter over a /shows-sized page.
+
+Formats 50k show start times with the previous implementation (ISO string
+re-parsed by dateutil, pattern rebuilt by babel on every call) and with the
+current filter, for both datetime objects and ISO strings.
+
+    python benchmarks/bench_datetime_filter.py [--shows 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+
+def legacy_format_datetime(value, format='medium'):
+  # The filter as it was before datetime objects and caching were supported.
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--shows', type=int, default=50000)
+  args = parser.parse_args()
+
+  from app import format_datetime
+
+  # Shows cluster on a limited set of evening slots, as real listings do.
+  rng = random.Random(7)
+  start = datetime(2030, 1, 1, 18, 0)
+  values = [start + timedelta(days=rng.randint(0, 730), minutes=30 * rng.randint(0, 8))
+            for _ in range(args.shows)]
+  strings = [value.strftime('%Y-%m-%dT%H:%M:%S.000Z') for value in values]
+
+  def measure(label, fn, inputs, clear_cache=False):
+    if clear_cache:
+      format_datetime.cache_clear()
+    begin = time.perf_counter()
+    output = [fn(value, 'full') for value in inputs]
+    elapsed = time.perf_counter() - begin
+    print(f"{label:<28} {elapsed * 1000:9.1f}ms  {elapsed / len(inputs) * 1e6:7.2f}us/show")
+    return output
+
+  print(f"{args.shows} shows")
+  expected = measure('legacy (iso string)', legacy_format_datetime, strings)
+  assert measure('filter (iso string, cold)', format_datetime, strings, clear_cache=True) == expected
+  assert measure('filter (datetime, cold)', format_datetime, values, clear_cache=True) == expected
+  assert measure('filter (datetime, warm)', format_datetime, values) == expected
+
+
+if __name__ == '__main__':
+  main()
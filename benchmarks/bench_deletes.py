@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Compare deleting a busy venue in one transaction with deletes.py's batched
+delete, which commits every DELETE_BATCH_SIZE shows.
+
+Loads one venue with --shows shows spread over --artists artists into a
+throwaway SQLite file, deletes it both ways (reloading in between), and
+reports the total time and the longest transaction: how long the delete
+holds its write locks, and so how long other writers can be kept waiting.
+
+    python benchmarks/bench_deletes.py [--shows 200000] [--batch-size 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--shows', type=int, default=200000)
+  parser.add_argument('--artists', type=int, default=2000)
+  parser.add_argument('--batch-size', type=int, default=1000)
+  return parser.parse_args()
+
+
+def main():
+  args = parse_args()
+  from sqlalchemy import create_engine, delete, insert
+  from sqlalchemy.orm import Session
+  from counters import forget_shows, reconcile_show_counters
+  from database import enforce_foreign_keys
+  from deletes import delete_entities
+  from models import db, Venue, Artist, Show
+
+  folder = tempfile.mkdtemp()
+  engine = create_engine(f"sqlite:///{os.path.join(folder, 'deletes.db')}")
+  enforce_foreign_keys(engine)
+  db.metadata.create_all(engine)
+  with Session(engine) as session:
+    session.execute(insert(Artist), [{"id": i, "name": f'Artist {i}'} for i in range(1, args.artists + 1)])
+    session.commit()
+
+  def load():
+    # The busy venue and its shows; the artists stay between runs.
+    now = datetime.now()
+    with Session(engine) as session:
+      session.execute(insert(Venue), [{"id": 1, "name": 'Busy Venue'}])
+      session.execute(insert(Show), [
+        {"venue_id": 1, "artist_id": i % args.artists + 1,
+         "start_time": now + timedelta(hours=i - args.shows // 2), "end_time": now + timedelta(hours=i - args.shows // 2, minutes=90)}
+        for i in range(args.shows)
+      ])
+      reconcile_show_counters(session)
+      session.commit()
+
+  def one_transaction(session):
+    # The routes' delete before deletes.py.
+    forget_shows(session, Artist, Show.venue_id == 1)
+    session.execute(delete(Show).where(Show.venue_id == 1))
+    session.execute(delete(Venue).where(Venue.id == 1))
+    session.commit()
+
+  def batched(session, progress):
+    delete_entities(session, Venue, [1], args.batch_size, progress)
+
+  print(f'one venue with {args.shows} shows over {args.artists} artists, batches of {args.batch_size}')
+  print(f"{'':<16} {'total':>9} {'transactions':>12} {'longest':>9}")
+  for label, run in (('one transaction', one_transaction), ('batched', batched)):
+    load()
+    commits = []
+    with Session(engine) as session:
+      started = last = time.perf_counter()
+
+      def progress(*_):
+        nonlocal last
+        now = time.perf_counter()
+        commits.append(now - last)
+        last = now
+
+      if run is batched:
+        run(session, progress)
+      else:
+        run(session)
+        progress()
+      total = time.perf_counter() - started
+    print(f'{label:<16} {total * 1000:8.0f}ms {len(commits):>12} {max(commits) * 1000:8.1f}ms')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark artist/venue recommendations on a synthetic catalog.
+
+Builds the recommendation index straight from dataset.py records (no
+database), then times recommendations with the inverted-index pruning the
+app uses against scoring every seeking candidate, checks both agree, and
+times the incremental update applied when an entity is edited.
+
+    python benchmarks/bench_recommendations.py [--scale medium] [--requests 500]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from dataset import GENRES, add_dataset_arguments, dataset_from_args
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  add_dataset_arguments(parser)
+  parser.add_argument('--requests', type=int, default=500)
+  parser.add_argument('--limit', type=int, default=10)
+  return parser.parse_args()
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+  args = parse_args()
+  from recommendations import RecommendationIndex
+
+  dataset = dataset_from_args(args)
+  index = RecommendationIndex()
+  started = time.perf_counter()
+  for record in dataset.venue_records():
+    index.put_venue(record['id'], record['genres'], record['state'], record['city'],
+                    record['seeking_talent'])
+  for record in dataset.artist_records():
+    index.put_artist(record['id'], record['genres'], record['state'], record['city'],
+                     record['seeking_venue'])
+  pairs = {}
+  for show in dataset.show_records():
+    key = (show['venue_id'], show['artist_id'])
+    pairs[key] = pairs.get(key, 0) + 1
+  for (venue_id, artist_id), count in pairs.items():
+    index.set_shows_together(venue_id, artist_id, count)
+  print(f"{dataset.venues} venues, {dataset.artists} artists, {dataset.shows} shows: "
+        f"index built in {time.perf_counter() - started:.1f}s")
+
+  def brute_force(subject, side, history):
+    # Score every candidate, as a precomputed dense matrix row would.
+    scored = (index.score(subject, candidate_id, profile, history)
+              for candidate_id, profile in side.profiles.items())
+    return sorted((rec for rec in scored if rec and rec.score > 0),
+                  key=lambda rec: (rec.score, -rec.id), reverse=True)[:args.limit]
+
+  rng = random.Random(args.seed)
+  kinds = [rng.choice(('artist', 'venue')) for _ in range(args.requests)]
+  requests = [(kind, rng.randint(1, dataset.artists if kind == 'artist' else dataset.venues))
+              for kind in kinds]
+
+  def run(label, recommend):
+    timings, results = [], []
+    for kind, entity_id in requests:
+      began = time.perf_counter()
+      results.append(recommend(kind, entity_id))
+      timings.append((time.perf_counter() - began) * 1000)
+    print(f"{label:<12} p50={percentile(timings, 0.5):8.3f}ms p99={percentile(timings, 0.99):8.3f}ms")
+    return results
+
+  def pruned(kind, entity_id):
+    if kind == 'artist':
+      return index.venues_for_artist(entity_id, args.limit)
+    return index.artists_for_venue(entity_id, args.limit)
+
+  def dense(kind, entity_id):
+    if kind == 'artist':
+      return brute_force(index.artists.profiles[entity_id], index.venues,
+                         index.artist_history.get(entity_id, {}))
+    return brute_force(index.venues.profiles[entity_id], index.artists,
+                       index.venue_history.get(entity_id, {}))
+
+  fast = run('pruned', pruned)
+  slow = run('all seeking', dense)
+  assert fast == slow, 'pruned and exhaustive recommendations disagree'
+
+  timings = []
+  for venue_id in rng.sample(range(1, dataset.venues + 1), min(1000, dataset.venues)):
+    began = time.perf_counter()
+    index.put_venue(venue_id, rng.sample(GENRES, 2), 'CA', 'City 0', True)
+    timings.append((time.perf_counter() - began) * 1e6)
+  print(f"{'edit':<12} p50={percentile(timings, 0.5):8.1f}us p99={percentile(timings, 0.99):8.1f}us")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Drive every route in app.py through the Flask test client against a
+synthetic catalog and record latency, queries per request and peak memory.
+
+Generates a dataset (see dataset.py), loads it into a throwaway SQLite
+database (or an empty database given with --database-url), then runs each
+route scenario: reads first, then writes, then deletes. Results can be
+written as JSON and compared across runs with compare.py.
+
+    python benchmarks/bench_routes.py [--scale small] [--requests 50] [--output results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dataset import GENRES, add_dataset_arguments, dataset_from_args
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  add_dataset_arguments(parser)
+  parser.add_argument('--database-url', help='Empty database to load into (default: temp SQLite file).')
+  parser.add_argument('--skip-load', action='store_true',
+                      help='Reuse an already loaded --database-url with the same dataset options.')
+  parser.add_argument('--requests', type=int, default=50, help='Timed requests per route.')
+  parser.add_argument('--warmup', type=int, default=3)
+  parser.add_argument('--memory-samples', type=int, default=3,
+                      help='Requests per route traced with tracemalloc (not timed).')
+  parser.add_argument('--page-cache', choices=['null', 'memory'], default='null',
+                      help='Page cache backend; null measures the full render path.')
+  parser.add_argument('--only', action='append', default=[],
+                      help='Run only scenarios whose name contains this (repeatable).')
+  parser.add_argument('--output', help='Write results as JSON to this file.')
+  return parser.parse_args()
+
+
+#----------------------------------------------------------------------------#
+# Scenarios.
+#----------------------------------------------------------------------------#
+
+# Venues and artists named per /admin/bulk-delete request, each.
+BULK_DELETE_IDS = 5
+
+class Scenario(object):
+  """One route with a request factory: make(rng) -> (path, form data, JSON body or None)."""
+
+  def __init__(self, name, endpoint, method, make, phase='read', json=False):
+    self.name = name
+    self.endpoint = endpoint
+    self.method = method
+    self.make = make
+    self.phase = phase
+    self.json = json
+
+
+def venue_form(rng, name):
+  return {
+    "name": name, "city": f'City {rng.randrange(50)}', "state": 'CA',
+    "address": '1 Bench Street', "phone": '555-555-5555',
+    "genres": rng.sample(GENRES, 2), "facebook_link": 'https://www.facebook.com/bench',
+    "website_link": 'https://example.com', "seeking_talent": 'y',
+    "seeking_description": 'Benchmark venue',
+  }
+
+
+def artist_form(rng, name):
+  return {
+    "name": name, "city": f'City {rng.randrange(50)}', "state": 'NY',
+    "phone": '555-555-5555', "genres": rng.sample(GENRES, 2),
+    "facebook_link": 'https://www.facebook.com/bench', "website_link": 'https://example.com',
+    "seeking_venue": 'y', "seeking_description": 'Benchmark artist',
+  }
+
+
+def build_scenarios(dataset, delete_count, delete_jobs):
+  venue = lambda rng: dataset.popular_ids(rng, 'venue')[0]
+  artist = lambda rng: dataset.popular_ids(rng, 'artist')[0]
+  now = dataset.now
+  week = lambda rng: (now + timedelta(days=rng.randint(-30, 30))).date()
+
+  # Deletes take ids from the unpopular tail so the read scenarios, which
+  # run first anyway, and the counts in the results stay comparable.
+  tail = random.Random(dataset.seed)
+  venue_tail = tail.sample(range(dataset.venues // 2 + 1, dataset.venues + 1),
+                           min(delete_count, dataset.venues // 2))
+  artist_tail = tail.sample(range(dataset.artists // 2 + 1, dataset.artists + 1),
+                            min(delete_count, dataset.artists // 2))
+
+  def edit_venue(rng):
+    venue_id = venue(rng)
+    return f'/venues/{venue_id}/edit', venue_form(rng, f'Venue {venue_id} edited')
+
+  def edit_artist(rng):
+    artist_id = artist(rng)
+    return f'/artists/{artist_id}/edit', artist_form(rng, f'Artist {artist_id} edited')
+
+  # Past the generated calendar, one slot per request, so new bookings of
+  # popular venues never conflict and every POST measures a real insert.
+  bookings = itertools.count()
+
+  def create_show(rng):
+    start_time = now + timedelta(days=dataset.future_days + 1, hours=3 * next(bookings))
+    return '/shows/create', {
+      "venue_id": venue(rng), "artist_id": artist(rng),
+      "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S'), "duration": 120,
+    }
+
+  # What a user types into the search box: the start of a word the
+  # generated names are made of.
+  words = ['venue', 'artist'] + [genre.lower() for genre in GENRES]
+
+  def suggest(rng):
+    word = rng.choice(words)
+    return f'/api/suggest?q={word[:rng.randint(1, len(word))]}', None
+
+  # Bulk deletes name a few ids from the unpopular tails; some are gone
+  # already, which the jobs skip. The request only queues the job, so this
+  # measures the submission; the jobs run on the worker's delete thread.
+  def bulk_delete(rng):
+    return '/admin/bulk-delete', {
+      "venue_ids": rng.sample(range(dataset.venues // 2 + 1, dataset.venues + 1),
+                              min(BULK_DELETE_IDS, dataset.venues // 2)),
+      "artist_ids": rng.sample(range(dataset.artists // 2 + 1, dataset.artists + 1),
+                               min(BULK_DELETE_IDS, dataset.artists // 2)),
+    }
+
+  def delete_job(rng):
+    job_ids = list(delete_jobs.jobs)
+    return f"/admin/delete-jobs/{rng.choice(job_ids) if job_ids else 'none'}", None
+
+  def available(rng):
+    start = (now + timedelta(days=rng.randint(1, dataset.future_days))).replace(hour=19, minute=0, second=0)
+    return (f'/api/venues/available?from={start.isoformat()}&to={(start + timedelta(hours=5)).isoformat()}'
+            f'&genre={rng.choice(GENRES)}&city=City {rng.randrange(5)}', None)
+
+  return [
+    Scenario('index', 'index', 'GET', lambda rng: ('/', None)),
+    Scenario('venues', 'venues', 'GET', lambda rng: ('/venues', None)),
+    Scenario('venues?format=json', 'venues', 'GET', lambda rng: ('/venues?format=json', None)),
+    Scenario('venues?genre', 'venues', 'GET', lambda rng: (f'/venues?genre={rng.choice(GENRES)}', None)),
+    Scenario('venues/<id>', 'show_venue', 'GET', lambda rng: (f'/venues/{venue(rng)}', None)),
+    Scenario('venues/search', 'search_venues', 'POST',
+             lambda rng: ('/venues/search', {"search_term": rng.choice(GENRES)[:4]})),
+    Scenario('venues/create (form)', 'create_venue_form', 'GET', lambda rng: ('/venues/create', None)),
+    Scenario('venues/<id>/edit (form)', 'edit_venue', 'GET', lambda rng: (f'/venues/{venue(rng)}/edit', None)),
+    Scenario('artists', 'artists', 'GET', lambda rng: ('/artists', None)),
+    Scenario('artists?genre', 'artists', 'GET', lambda rng: (f'/artists?genre={rng.choice(GENRES)}', None)),
+    Scenario('artists/<id>', 'show_artist', 'GET', lambda rng: (f'/artists/{artist(rng)}', None)),
+    Scenario('artists/search', 'search_artists', 'POST',
+             lambda rng: ('/artists/search', {"search_term": rng.choice(GENRES)[:4]})),
+    Scenario('artists/create (form)', 'create_artist_form', 'GET', lambda rng: ('/artists/create', None)),
+    Scenario('artists/<id>/edit (form)', 'edit_artist', 'GET', lambda rng: (f'/artists/{artist(rng)}/edit', None)),
+    Scenario('shows', 'shows', 'GET', lambda rng: ('/shows', None)),
+    Scenario('shows?format=json', 'shows', 'GET', lambda rng: ('/shows?format=json', None)),
+    Scenario('shows/create (form)', 'create_shows', 'GET', lambda rng: ('/shows/create', None)),
+    Scenario('api/shows?venue_id', 'api.shows', 'GET', lambda rng: (f'/api/shows?venue_id={venue(rng)}', None)),
+    Scenario('api/shows?from&to', 'api.shows', 'GET',
+             lambda rng: (f'/api/shows?from={week(rng)}&to={week(rng) + timedelta(days=7)}', None)),
+    Scenario('api/venues?city', 'api.venues', 'GET', lambda rng: (f'/api/venues?city=City {rng.randrange(10)}', None)),
+    Scenario('api/venues/available', 'api.available_venues', 'GET', available),
+    Scenario('api/artists/<id>/rec-venues', 'api.recommended_venues', 'GET',
+             lambda rng: (f'/api/artists/{artist(rng)}/recommended-venues', None)),
+    Scenario('api/venues/<id>/rec-artists', 'api.recommended_artists', 'GET',
+             lambda rng: (f'/api/venues/{venue(rng)}/recommended-artists', None)),
+    Scenario('api/artists?genre', 'api.artists', 'GET', lambda rng: (f'/api/artists?genre={rng.choice(GENRES)}', None)),
+    Scenario('api/suggest', 'api.suggest', 'GET', suggest),
+    Scenario('admin/pool-stats', 'admin.pool_stats_view', 'GET', lambda rng: ('/admin/pool-stats', None)),
+
+    Scenario('venues/create', 'create_venue_submission', 'POST',
+             lambda rng: ('/venues/create', venue_form(rng, f'Bench Venue {rng.random()}')), phase='write'),
+    Scenario('venues/<id>/edit', 'edit_venue_submission', 'POST', edit_venue, phase='write'),
+    Scenario('artists/create', 'create_artist_submission', 'POST',
+             lambda rng: ('/artists/create', artist_form(rng, f'Bench Artist {rng.random()}')), phase='write'),
+    Scenario('artists/<id>/edit', 'edit_artist_submission', 'POST', edit_artist, phase='write'),
+    Scenario('shows/create', 'create_show_submission', 'POST', create_show, phase='write'),
+
+    Scenario('venues/<id> (DELETE)', 'delete_venue', 'DELETE',
+             lambda rng: (f'/venues/{venue_tail.pop()}', None), phase='delete'),
+    Scenario('artists/<id>/delete', 'delete_artist', 'POST',
+             lambda rng: (f'/artists/{artist_tail.pop()}/delete', None), phase='delete'),
+    Scenario('admin/bulk-delete', 'admin.bulk_delete', 'POST', bulk_delete, phase='delete', json=True),
+    Scenario('admin/delete-jobs/<id>', 'admin.delete_job', 'GET', delete_job, phase='delete'),
+  ]
+
+
+#----------------------------------------------------------------------------#
+# Measurement.
+#----------------------------------------------------------------------------#
+
+def percentile(values, fraction):
+  # Nearest rank, so p99 of 50 samples is the slowest one rather than an
+  # interpolation past it.
+  ordered = sorted(values)
+  rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+  return ordered[min(rank, len(ordered)) - 1]
+
+
+def git_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                   stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def run_scenario(client, scenario, rng, args, statements):
+  def request():
+    path, data = scenario.make(rng)
+    body = {"json": data} if scenario.json else {"data": data}
+    response = client.open(path, method=scenario.method, headers={'X-Admin-Token': os.environ['ADMIN_TOKEN']},
+                           **body)
+    response.get_data()  # drain streamed bodies inside the measurement
+    response.close()
+    return response.status_code
+
+  for _ in range(args.warmup):
+    request()
+
+  peaks = []
+  tracemalloc.start()
+  try:
+    for _ in range(args.memory_samples):
+      tracemalloc.reset_peak()
+      baseline = tracemalloc.get_traced_memory()[0]
+      request()
+      peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+  finally:
+    tracemalloc.stop()
+
+  timings, queries, errors = [], [], 0
+  for _ in range(args.requests):
+    statements.clear()
+    start = time.perf_counter()
+    status = request()
+    timings.append((time.perf_counter() - start) * 1000)
+    queries.append(len(statements))
+    if status >= 400:
+      errors += 1
+
+  return {
+    "endpoint": scenario.endpoint,
+    "method": scenario.method,
+    "requests": len(timings),
+    "errors": errors,
+    "p50_ms": round(percentile(timings, 0.50), 3),
+    "p99_ms": round(percentile(timings, 0.99), 3),
+    "mean_ms": round(sum(timings) / len(timings), 3),
+    "max_ms": round(max(timings), 3),
+    "queries_p50": percentile(queries, 0.50),
+    "queries_max": max(queries),
+    "peak_memory_kib": round(max(peaks) / 1024, 1) if peaks else None,
+  }
+
+
+def main():
+  args = parse_args()
+  path = None
+  if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+  else:
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+  os.environ['PAGE_CACHE_BACKEND'] = args.page_cache
+  os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'fyyur-bench.log'))
+  # The /admin scenarios need one; every request sends it.
+  os.environ.setdefault('ADMIN_TOKEN', 'bench')
+
+  from sqlalchemy import event
+  from app import app
+  from models import db
+
+  dataset = dataset_from_args(args)
+  delete_count = args.warmup + args.memory_samples + args.requests
+  scenarios = build_scenarios(dataset, delete_count, app.extensions['delete_jobs'])
+  endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint != 'static'}
+  uncovered = endpoints - {scenario.endpoint for scenario in scenarios}
+  if args.only:
+    scenarios = [s for s in scenarios if any(part in s.name for part in args.only)]
+  if uncovered:
+    print(f"warning: no scenario for {', '.join(sorted(uncovered))}", file=sys.stderr)
+
+  try:
+    with app.app_context():
+      if not args.skip_load:
+        db.create_all()
+        started = time.perf_counter()
+        for stats in dataset.load(db.engine):
+          print(f'  {stats}')
+        print(f'Loaded {args.scale} dataset in {time.perf_counter() - started:.1f}s')
+
+      statements = []
+      event.listen(db.engine, 'before_cursor_execute', lambda *a, **k: statements.append(1))
+
+    client = app.test_client()
+    rng = random.Random(args.seed)
+    results = {}
+    print(f"{'route':<28} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9} {'errors':>7}")
+    for phase in ('read', 'write', 'delete'):
+      for scenario in [s for s in scenarios if s.phase == phase]:
+        result = run_scenario(client, scenario, rng, args, statements)
+        results[scenario.name] = result
+        print(f"{scenario.name:<28} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+              f"{result['queries_p50']:>8} {result['peak_memory_kib']:>9} {result['errors']:>7}")
+    # Let queued bulk deletes finish before their database goes away.
+    while any(job.finished_at is None for job in list(app.extensions['delete_jobs'].jobs.values())):
+      time.sleep(0.05)
+  finally:
+    if path:
+      os.remove(path)
+
+  if args.output:
+    with app.app_context():
+      dialect = db.engine.dialect.name
+    document = {
+      "meta": {
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "database": dialect,
+        "scale": args.scale,
+        "dataset": dataset.describe(),
+        "requests_per_route": args.requests,
+        "page_cache": args.page_cache,
+      },
+      "routes": results,
+    }
+    with open(args.output, 'w') as handle:
+      json.dump(document, handle, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+  main()
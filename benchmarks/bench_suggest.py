@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/suggest's prefix index against a LIKE prefix query.
+
+Builds the suggest index straight from dataset.py records, with upcoming
+show counts taken from the generated shows, and loads the same names into
+an in-memory SQLite database. Then it times typeahead lookups for prefixes
+of 1-8 characters, as typed, both ways, checks that they agree, and times
+the incremental update applied when a name or count changes. It also
+reports the index's memory.
+
+    python benchmarks/bench_suggest.py [--scale medium] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from dataset import GENRES, add_dataset_arguments, dataset_from_args
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  add_dataset_arguments(parser)
+  parser.set_defaults(scale='medium')
+  parser.add_argument('--lookups', type=int, default=2000)
+  parser.add_argument('--limit', type=int, default=10)
+  parser.add_argument('--sql-lookups', type=int, default=200,
+                      help='Lookups timed against SQLite (each scans the table).')
+  return parser.parse_args()
+
+
+def percentile(values, fraction):
+  values = sorted(values)
+  return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+  args = parse_args()
+  from sqlalchemy import create_engine, insert, select
+  from models import db, Venue, Artist
+  from suggest import SuggestIndex, PrefixIndex, name_keys, normalize
+
+  dataset = dataset_from_args(args)
+  upcoming = {Venue: {}, Artist: {}}
+  for show in dataset.show_records():
+    if show['start_time'] > dataset.now:
+      for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        upcoming[model][show[key]] = upcoming[model].get(show[key], 0) + 1
+  rows = {
+    Venue: [(record['id'], record['name'], upcoming[Venue].get(record['id'], 0))
+            for record in dataset.venue_records()],
+    Artist: [(record['id'], record['name'], upcoming[Artist].get(record['id'], 0))
+             for record in dataset.artist_records()],
+  }
+
+  index = SuggestIndex()
+  started = time.perf_counter()
+  index.indexes = {model: PrefixIndex.build(model_rows) for model, model_rows in rows.items()}
+  built = time.perf_counter() - started
+  # Measured on a second build: tracing slows the first one down severalfold.
+  tracemalloc.start()
+  traced = {model: PrefixIndex.build(model_rows) for model, model_rows in rows.items()}
+  memory = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del traced
+  print(f"{dataset.venues} venues, {dataset.artists} artists: index built in {built * 1000:.0f}ms, "
+        f"{memory / 2**20:.1f} MiB")
+
+  # What a user types: the start of a name, or of one of its words.
+  rng = random.Random(args.seed)
+  names = [(model, name) for model, model_rows in rows.items() for _, name, _ in model_rows]
+  terms = []
+  for _ in range(args.lookups):
+    _, name = rng.choice(names)
+    key = rng.choice(name_keys(name))
+    terms.append(key[:rng.randint(1, 8)])
+
+  def timed(label, fn, terms, unit=1e6, suffix='us'):
+    timings, results = [], []
+    for term in terms:
+      began = time.perf_counter()
+      results.append(fn(term))
+      timings.append((time.perf_counter() - began) * unit)
+    print(f"{label:<14} p50={percentile(timings, 0.5):9.1f}{suffix} p99={percentile(timings, 0.99):9.1f}{suffix}")
+    return results
+
+  def lookup(term):
+    return [(suggestion.model, suggestion.id) for suggestion in index.suggest(term, args.limit)]
+
+  timed('index (cold)', lookup, terms)
+  fast = timed('index', lookup, terms)
+
+  # The same question asked of the database, as a search on each keystroke
+  # would: names starting with the term, most upcoming shows first.
+  engine = create_engine('sqlite://')
+  tables = [model.__table__ for model in (Venue, Artist)]
+  db.metadata.create_all(engine, tables=tables)
+  with engine.begin() as connection:
+    for model, model_rows in rows.items():
+      connection.execute(insert(model), [
+        {"id": entity_id, "name": name, "upcoming_shows_count": count}
+        for entity_id, name, count in model_rows
+      ])
+
+  def sql_lookup(term):
+    # Only the leading key; word starts would need one LIKE per word.
+    found = []
+    with engine.connect() as connection:
+      for model in (Venue, Artist):
+        found += connection.execute(
+          select(model.upcoming_shows_count, model.name, model.id)
+          .where(model.name.ilike(term + '%'))
+          .order_by(model.upcoming_shows_count.desc(), model.name)
+          .limit(args.limit)
+        ).all()
+    return found
+
+  sql_terms = [term for term in terms if ' ' not in term][:args.sql_lookups]
+  timed('LIKE prefix', sql_lookup, sql_terms, unit=1e3, suffix='ms')
+
+  # Spot check: every suggestion matches the term, best ranked first.
+  for term, result in zip(terms, fast):
+    ranks = []
+    for model, entity_id in result:
+      entry = index.indexes[model].entries[entity_id]
+      assert any(key.startswith(normalize(term)) for key in entry.keys), (term, entry.name)
+      ranks.append(entry.rank)
+    assert ranks == sorted(ranks), term
+
+  timings = []
+  for entity_id in rng.sample(range(1, dataset.venues + 1), min(2000, dataset.venues)):
+    entry = index.indexes[Venue].entries[entity_id]
+    began = time.perf_counter()
+    if rng.random() < 0.8:
+      index.adjust(Venue, entity_id, 1)
+    else:
+      index.put(Venue, entity_id, f'Renamed {entity_id} {rng.choice(GENRES)}', entry.upcoming)
+    timings.append((time.perf_counter() - began) * 1e6)
+  print(f"{'update':<14} p50={percentile(timings, 0.5):9.1f}us p99={percentile(timings, 0.99):9.1f}us")
+
+
+if __name__ == '__main__':
+  main()
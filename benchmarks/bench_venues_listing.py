@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /venues area aggregation against the previous per-venue loop.
+
+Loads 10k venues spread across 500 cities into a throwaway SQLite database,
+then reports query count and latency for both implementations.
+
+    python benchmarks/bench_venues_listing.py [--venues 10000] [--cities 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--venues', type=int, default=10000)
+  parser.add_argument('--cities', type=int, default=500)
+  parser.add_argument('--shows-per-venue', type=int, default=5)
+  parser.add_argument('--repeat', type=int, default=5)
+  return parser.parse_args()
+
+
+def legacy_venues(Venue):
+  # The implementation /venues used before the grouped query.
+  venues = Venue.query.all()
+  data = []
+  locations = set()
+  for venue in venues:
+    locations.add((venue.city, venue.state))
+  for city, state in locations:
+    city_venues = []
+    for venue in venues:
+      if venue.city == city and venue.state == state:
+        num_upcoming_shows = len([show for show in venue.shows if show.start_time > datetime.now()])
+        city_venues.append({
+          "id": venue.id,
+          "name": venue.name,
+          "num_upcoming_shows": num_upcoming_shows
+        })
+    data.append({"city": city, "state": state, "venues": city_venues})
+  return data
+
+
+def main():
+  args = parse_args()
+  fd, path = tempfile.mkstemp(suffix='.db')
+  os.close(fd)
+  os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+  from sqlalchemy import event, insert
+  from app import app
+  from models import db, Venue, Artist, Show
+  from queries import venue_areas_query, group_venue_areas
+  from counters import reconcile_show_counters
+
+  rng = random.Random(42)
+  now = datetime.now()
+  with app.app_context():
+    db.create_all()
+    db.session.execute(insert(Artist), [{"id": 1, "name": "Bench Artist"}])
+    db.session.execute(insert(Venue), [{
+      "id": i + 1,
+      "name": f"Venue {i}",
+      "city": f"City {i % args.cities}",
+      "state": "CA",
+    } for i in range(args.venues)])
+    db.session.execute(insert(Show), [{
+      "venue_id": v + 1,
+      "artist_id": 1,
+      "start_time": now + timedelta(days=rng.randint(-365, 365)),
+    } for v in range(args.venues) for _ in range(args.shows_per_venue)])
+    reconcile_show_counters(db.session, now)
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute',
+                 lambda *a, **k: statements.append(1))
+
+    def measure(label, fn):
+      timings = []
+      for _ in range(args.repeat):
+        db.session.expunge_all()
+        statements.clear()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+      timings.sort()
+      print(f"{label:<10} queries={len(statements):<6} "
+            f"best={timings[0] * 1000:8.1f}ms median={timings[len(timings) // 2] * 1000:8.1f}ms")
+
+    print(f"{args.venues} venues, {args.cities} cities, "
+          f"{args.venues * args.shows_per_venue} shows")
+    measure('legacy', lambda: legacy_venues(Venue))
+    measure('grouped', lambda: group_venue_areas(db.session.execute(venue_areas_query()).all()))
+
+  os.remove(path)
+
+
+if __name__ == '__main__':
+  main()
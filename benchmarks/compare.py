@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare two bench_routes.py result files route by route.
+
+Prints p50/p99 latency, queries per request and peak memory for both runs
+with the relative change. With --fail-over, exits non-zero when any route's
+p50 or p99 got slower by more than that percentage or issues more queries.
+
+    python benchmarks/compare.py baseline.json candidate.json [--fail-over 20]
+"""
+import argparse
+import json
+import sys
+
+METRICS = (
+  ('p50_ms', 'p50 ms'),
+  ('p99_ms', 'p99 ms'),
+  ('queries_p50', 'queries'),
+  ('peak_memory_kib', 'peak KiB'),
+)
+
+
+def parse_args():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('baseline')
+  parser.add_argument('candidate')
+  parser.add_argument('--fail-over', type=float, default=None, metavar='PERCENT',
+                      help='Fail on latency regressions above PERCENT or any added query.')
+  return parser.parse_args()
+
+
+def change(before, after):
+  if before is None or after is None:
+    return None
+  if before == 0:
+    return 0.0 if after == 0 else float('inf')
+  return (after - before) / before * 100
+
+
+def describe(meta):
+  dataset = meta.get('dataset', {})
+  return (f"{meta.get('git_commit') or '?'} {meta.get('created_at', '')} "
+          f"{meta.get('database', '?')}/{meta.get('scale', '?')} "
+          f"({dataset.get('venues')} venues, {dataset.get('shows')} shows)")
+
+
+def main():
+  args = parse_args()
+  with open(args.baseline) as handle:
+    baseline = json.load(handle)
+  with open(args.candidate) as handle:
+    candidate = json.load(handle)
+
+  print(f"baseline:  {describe(baseline['meta'])}")
+  print(f"candidate: {describe(candidate['meta'])}")
+  if baseline['meta'].get('dataset') != candidate['meta'].get('dataset'):
+    print('warning: the runs used different datasets', file=sys.stderr)
+
+  header = f"{'route':<28}" + ''.join(f' {label:>22}' for _, label in METRICS)
+  print(header)
+  regressions = []
+  for name in list(baseline['routes']) + [n for n in candidate['routes'] if n not in baseline['routes']]:
+    before = baseline['routes'].get(name)
+    after = candidate['routes'].get(name)
+    if before is None or after is None:
+      print(f"{name:<28} {'only in ' + ('candidate' if before is None else 'baseline')}")
+      continue
+    cells = []
+    for key, label in METRICS:
+      delta = change(before[key], after[key])
+      text = f'{before[key]} -> {after[key]}'
+      if delta is not None:
+        text += f' ({delta:+.0f}%)'
+      cells.append(f' {text:>22}')
+      if args.fail_over is None or delta is None:
+        continue
+      if key in ('p50_ms', 'p99_ms') and delta > args.fail_over:
+        regressions.append(f'{name}: {label} {delta:+.0f}%')
+      if key == 'queries_p50' and after[key] > before[key]:
+        regressions.append(f'{name}: {before[key]} -> {after[key]} queries')
+    print(f'{name:<28}' + ''.join(cells))
+
+  if regressions:
+    print('\nRegressions:')
+    for line in regressions:
+      print(f'  {line}')
+    raise SystemExit(1)
+
+
+if __name__ == '__main__':
+  main()
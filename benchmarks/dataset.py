@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Fyyur catalogs at several scales.
+
+Shows per venue and per artist follow a Zipf distribution (capped by how
+many non-overlapping slots a venue has), venues cluster in a Zipf-weighted
+set of cities, and start times mix past and upcoming shows.
+Used by bench_routes.py; run directly to write files for `flask load-catalog`.
+
+    python benchmarks/dataset.py --scale medium --output /tmp/fyyur-medium
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCALES = {
+  'tiny': dict(venues=100, artists=100, shows=2000, cities=10),
+  'small': dict(venues=1000, artists=1000, shows=25000, cities=50),
+  'medium': dict(venues=10000, artists=10000, shows=250000, cities=500),
+  'large': dict(venues=50000, artists=50000, shows=5000000, cities=2000),
+}
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'MA', 'CO', 'OR', 'GA', 'TN', 'LA']
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+          'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+          'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other']
+CHUNK = 10000
+SLOT_HOURS = 3
+MAX_ATTEMPTS = 50
+
+
+def zipf_weights(n, exponent):
+  """Cumulative weights for ranks 1..n with P(rank) proportional to rank**-exponent."""
+  return list(accumulate(1.0 / rank ** exponent for rank in range(1, n + 1)))
+
+
+class SlotMap(object):
+  """One bit per (owner, slot): whether that venue or artist is booked.
+
+  Owners are ids 1..owners.
+  """
+
+  def __init__(self, owners, slots):
+    self.slots = slots
+    self.bits = bytearray(((owners + 1) * slots + 7) // 8)
+
+  def is_taken(self, owner, slot):
+    bit = owner * self.slots + slot
+    return self.bits[bit >> 3] & (1 << (bit & 7))
+
+  def mark(self, owner, slot):
+    bit = owner * self.slots + slot
+    self.bits[bit >> 3] |= 1 << (bit & 7)
+
+  def take(self, owner, slot, other, other_owner):
+    """Book `slot` for `owner` here and `other_owner` in `other`, if both are free."""
+    if self.is_taken(owner, slot) or other.is_taken(other_owner, slot):
+      return False
+    self.mark(owner, slot)
+    other.mark(other_owner, slot)
+    return True
+
+
+class Dataset(object):
+  """A reproducible catalog: the same seed and sizes give the same records.
+
+  Venue and artist ids are 1..n in generation order, so load it into an
+  empty database; shows refer to them by id.
+  """
+
+  def __init__(self, venues, artists, shows, cities, future_fraction=0.3,
+               past_days=730, future_days=365, zipf_exponent=1.1, seed=42, now=None):
+    self.venues = venues
+    self.artists = artists
+    self.shows = shows
+    self.cities = cities
+    self.future_fraction = future_fraction
+    self.past_days = past_days
+    self.future_days = future_days
+    self.zipf_exponent = zipf_exponent
+    self.seed = seed
+    self.now = now or datetime.now().replace(microsecond=0)
+    self._venue_weights = zipf_weights(venues, zipf_exponent)
+    self._artist_weights = zipf_weights(artists, zipf_exponent)
+
+  @classmethod
+  def from_scale(cls, scale, **options):
+    return cls(**dict(SCALES[scale], **options))
+
+  def describe(self):
+    return dict(venues=self.venues, artists=self.artists, shows=self.shows, cities=self.cities,
+                future_fraction=self.future_fraction, zipf_exponent=self.zipf_exponent,
+                seed=self.seed)
+
+  def _city(self, rng, city_weights):
+    index = rng.choices(range(self.cities), cum_weights=city_weights)[0]
+    return f'City {index}', STATES[index % len(STATES)]
+
+  def _parents(self, count, salt, extra):
+    rng = random.Random(f'{self.seed}:{salt}')
+    city_weights = zipf_weights(self.cities, 1.0)
+    for index in range(count):
+      city, state = self._city(rng, city_weights)
+      record = {
+        "id": index + 1,
+        "name": f'{salt.title()} {index + 1} {rng.choice(GENRES)}',
+        "city": city,
+        "state": state,
+        "phone": f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+        "genres": rng.sample(GENRES, rng.randint(1, 3)),
+        "facebook_link": f'https://www.facebook.com/{salt}{index + 1}',
+      }
+      record.update(extra(rng, index))
+      yield record
+
+  def venue_records(self):
+    return self._parents(self.venues, 'venue', lambda rng, index: {
+      "address": f'{rng.randint(1, 9999)} Main Street',
+      "seeking_talent": rng.random() < 0.4,
+    })
+
+  def artist_records(self):
+    return self._parents(self.artists, 'artist', lambda rng, index: {
+      "seeking_venue": rng.random() < 0.4,
+    })
+
+  def show_records(self):
+    """Shows in chunks, so even the large scale never sits in memory.
+
+    Shows never double-book a venue or an artist (the database rejects
+    that): time is cut into SLOT_HOURS slots, each show fits inside one
+    slot, and a bitmap per venue and per artist records taken slots. A draw
+    that lands on a taken slot is redrawn, so the most popular venues fill
+    up and the rest of their share spills onto others.
+    """
+    rng = random.Random(f'{self.seed}:show')
+    venue_ids = range(1, self.venues + 1)
+    artist_ids = range(1, self.artists + 1)
+    slot = timedelta(hours=SLOT_HOURS)
+    first = (self.now - timedelta(days=self.past_days)).replace(hour=0, minute=0, second=0)
+    slots = (self.past_days + self.future_days) * 24 // SLOT_HOURS
+    upcoming = (self.now - first) // slot + 1
+    venue_slots = SlotMap(self.venues, slots)
+    artist_slots = SlotMap(self.artists, slots)
+    remaining = self.shows
+    while remaining:
+      size = min(CHUNK, remaining)
+      remaining -= size
+      venues = rng.choices(venue_ids, cum_weights=self._venue_weights, k=size)
+      artists = rng.choices(artist_ids, cum_weights=self._artist_weights, k=size)
+      for venue_id, artist_id in zip(venues, artists):
+        for _ in range(MAX_ATTEMPTS):
+          if rng.random() < self.future_fraction:
+            index = rng.randrange(upcoming, slots)
+          else:
+            index = rng.randrange(0, upcoming - 1)
+          if venue_slots.take(venue_id, index, artist_slots, artist_id):
+            break
+          venue_id = rng.choices(venue_ids, cum_weights=self._venue_weights)[0]
+          artist_id = rng.choices(artist_ids, cum_weights=self._artist_weights)[0]
+        else:
+          continue
+        start_time = first + index * slot + timedelta(minutes=rng.choice((0, 30, 60)))
+        end_time = start_time + timedelta(minutes=rng.choice((60, 90, 120)))
+        yield {"start_time": start_time, "end_time": end_time,
+               "venue_id": venue_id, "artist_id": artist_id}
+
+  def popular_ids(self, rng, kind, k=1):
+    """Ids drawn with the same skew as shows, so hot pages get hot traffic."""
+    if kind == 'venue':
+      return rng.choices(range(1, self.venues + 1), cum_weights=self._venue_weights, k=k)
+    return rng.choices(range(1, self.artists + 1), cum_weights=self._artist_weights, k=k)
+
+  def load(self, engine, batch_size=5000):
+    """Bulk load into `engine` and reconcile the show counters."""
+    from sqlalchemy.orm import Session
+    from loader import CatalogLoader
+    from counters import reconcile_show_counters
+
+    loader = CatalogLoader(engine, batch_size=batch_size)
+    stats = [loader.load_venues(self.venue_records()),
+             loader.load_artists(self.artist_records()),
+             loader.load_shows(self.show_records())]
+    with Session(engine) as session:
+      reconcile_show_counters(session, self.now)
+      session.commit()
+    return stats
+
+  def write(self, directory):
+    """Write venues.csv, artists.ndjson and shows.csv for `flask load-catalog`."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'venues.csv'), 'w', newline='', encoding='utf-8') as handle:
+      writer = None
+      for record in self.venue_records():
+        record['genres'] = ','.join(record['genres'])
+        if writer is None:
+          writer = csv.DictWriter(handle, fieldnames=list(record))
+          writer.writeheader()
+        writer.writerow(record)
+    with open(os.path.join(directory, 'artists.ndjson'), 'w', encoding='utf-8') as handle:
+      for record in self.artist_records():
+        handle.write(json.dumps(record) + '\n')
+    with open(os.path.join(directory, 'shows.csv'), 'w', newline='', encoding='utf-8') as handle:
+      writer = csv.writer(handle)
+      writer.writerow(['start_time', 'end_time', 'venue_id', 'artist_id'])
+      for record in self.show_records():
+        writer.writerow([record['start_time'].isoformat(), record['end_time'].isoformat(),
+                         record['venue_id'], record['artist_id']])
+
+
+def add_dataset_arguments(parser):
+  parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+  parser.add_argument('--future-fraction', type=float, default=0.3,
+                      help='Share of shows that are upcoming.')
+  parser.add_argument('--zipf', type=float, default=1.1,
+                      help='Zipf exponent for shows per venue/artist.')
+  parser.add_argument('--seed', type=int, default=42)
+
+
+def dataset_from_args(args):
+  return Dataset.from_scale(args.scale, future_fraction=args.future_fraction,
+                            zipf_exponent=args.zipf, seed=args.seed)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  add_dataset_arguments(parser)
+  parser.add_argument('--output', required=True, help='Directory to write the files to.')
+  args = parser.parse_args()
+  dataset = dataset_from_args(args)
+  dataset.write(args.output)
+  print(f"Wrote {dataset.venues} venues, {dataset.artists} artists and {dataset.shows} shows "
+        f"to {args.output}")
+  print(f"Load with: flask load-catalog --venues {args.output}/venues.csv "
+        f"--artists {args.output}/artists.ndjson --shows {args.output}/shows.csv")
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,154 @@
+from datetime import timedelta
+
+from sqlalchemy import DDL, event, select
+from sqlalchemy.exc import IntegrityError
+
+from models import Venue, Artist, Show, DEFAULT_SHOW_DURATION
+
+
+# A show books its venue and its artist for [start_time, end_time). Two
+# bookings of the same venue or the same artist may not overlap.
+#
+# book_show() checks with an overlap query that stays on the
+# (venue_id, start_time) and (artist_id, start_time) indexes: since no show
+# lasts longer than the configured maximum, any show overlapping
+# [start, end) must start within (start - max_duration, end), so only that
+# slice of the index is read. Concurrent bookings are serialized per venue
+# and per artist by locking those two rows (SELECT ... FOR UPDATE) first;
+# bookings of unrelated venues and artists proceed in parallel.
+#
+# On Postgres the exclusion constraints below back this up for writes that
+# bypass book_show(), such as bulk loads.
+
+DEFAULT_MAX_SHOW_DURATION = timedelta(hours=12)
+
+
+class BookingConflict(Exception):
+  def __init__(self, conflicts):
+    self.conflicts = conflicts
+    super().__init__('; '.join(describe_conflict(show) for show in conflicts)
+                     or 'The venue or artist is already booked at that time')
+
+
+class InvalidBooking(ValueError):
+  pass
+
+
+def describe_conflict(show):
+  who = []
+  if show.get('venue_clash'):
+    who.append(f"venue {show['venue_id']}")
+  if show.get('artist_clash'):
+    who.append(f"artist {show['artist_id']}")
+  return (f"{' and '.join(who) or 'booking'} already booked for show {show['id']} "
+          f"from {show['start_time']:%Y-%m-%d %H:%M} to {show['end_time']:%H:%M}")
+
+
+def overlaps(column, parent_id, start_time, end_time, max_duration=DEFAULT_MAX_SHOW_DURATION):
+  """WHERE clauses: shows where `column` == `parent_id` overlap [start_time, end_time).
+
+  The start_time bounds are what keep this on the (parent, start_time)
+  index; the end_time test then only filters that slice. `parent_id` may be
+  a column, e.g. Venue.id for a correlated NOT EXISTS.
+  """
+  return (
+    column == parent_id,
+    Show.start_time > start_time - max_duration,
+    Show.start_time < end_time,
+    Show.end_time > start_time,
+  )
+
+
+def overlap_query(column, parent_id, start_time, end_time, max_duration=DEFAULT_MAX_SHOW_DURATION):
+  """Shows where `column` == `parent_id` overlapping [start_time, end_time)."""
+  return (
+    select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time)
+    .where(*overlaps(column, parent_id, start_time, end_time, max_duration))
+    .order_by(Show.start_time)
+  )
+
+
+def find_conflicts(session, venue_id, artist_id, start_time, end_time,
+                   max_duration=DEFAULT_MAX_SHOW_DURATION, exclude_id=None):
+  """Shows at the venue or by the artist that overlap [start_time, end_time)."""
+  conflicts = {}
+  for column, parent_id, flag in ((Show.venue_id, venue_id, 'venue_clash'),
+                                  (Show.artist_id, artist_id, 'artist_clash')):
+    stmt = overlap_query(column, parent_id, start_time, end_time, max_duration)
+    if exclude_id is not None:
+      stmt = stmt.where(Show.id != exclude_id)
+    for row in session.execute(stmt):
+      conflicts.setdefault(row.id, row._asdict())[flag] = True
+  return sorted(conflicts.values(), key=lambda show: show['start_time'])
+
+
+def lock_parents(session, venue_id, artist_id):
+  """Lock the venue and artist rows for the rest of the transaction.
+
+  Always venue first, then artist, so two bookings cannot deadlock. SQLite
+  ignores FOR UPDATE; it serializes writers on the whole database instead.
+  Returns False if either row does not exist.
+  """
+  venue = session.execute(select(Venue.id).where(Venue.id == venue_id).with_for_update()).scalar()
+  artist = session.execute(select(Artist.id).where(Artist.id == artist_id).with_for_update()).scalar()
+  return venue is not None and artist is not None
+
+
+def book_show(session, venue_id, artist_id, start_time, duration=DEFAULT_SHOW_DURATION,
+              max_duration=DEFAULT_MAX_SHOW_DURATION):
+  """Add a Show unless it overlaps another booking of its venue or artist.
+
+  Raises InvalidBooking for unknown ids or an out-of-range duration and
+  BookingConflict listing the clashing shows. The caller commits, or
+  rolls back on any of these errors.
+  """
+  try:
+    venue_id, artist_id = int(venue_id), int(artist_id)
+  except (TypeError, ValueError):
+    raise InvalidBooking('Venue and artist ids must be numbers')
+  if start_time is None:
+    raise InvalidBooking('A start time is required')
+  if not timedelta(0) < duration <= max_duration:
+    raise InvalidBooking(f'Shows must last between 1 minute and {max_duration}')
+  if not lock_parents(session, venue_id, artist_id):
+    raise InvalidBooking(f'Unknown venue {venue_id} or artist {artist_id}')
+  end_time = start_time + duration
+  conflicts = find_conflicts(session, venue_id, artist_id, start_time, end_time, max_duration)
+  if conflicts:
+    raise BookingConflict(conflicts)
+  show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time)
+  session.add(show)
+  try:
+    session.flush()
+  except IntegrityError as error:
+    # The Postgres exclusion constraint caught an overlap the query could
+    # not see, e.g. one committed by a bulk load after our check.
+    if is_exclusion_violation(error):
+      raise BookingConflict([]) from error
+    raise
+  return show
+
+
+def is_exclusion_violation(error):
+  return getattr(error.orig, 'pgcode', None) == '23P01'
+
+
+#----------------------------------------------------------------------------#
+# Postgres exclusion constraints.
+#----------------------------------------------------------------------------#
+
+# Migrations create these for real databases; the listeners cover
+# db.create_all(). Keep both in step.
+
+def postgresql_booking_ddl():
+  return [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_venue_booking" '
+    'EXCLUDE USING gist (venue_id WITH =, tsrange(start_time, end_time) WITH &&)',
+    'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_artist_booking" '
+    'EXCLUDE USING gist (artist_id WITH =, tsrange(start_time, end_time) WITH &&)',
+  ]
+
+
+for _statement in postgresql_booking_ddl():
+  event.listen(Show.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -0,0 +1,156 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from models import Show
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# Rendered detail pages are cached under keys like 'venue:3' / 'artist:7'.
+# The write routes delete the affected keys after they commit; the TTL only
+# bounds staleness from things no route writes, such as shows moving from
+# upcoming to past as time passes.
+
+class PageCache(ABC):
+  @abstractmethod
+  def get(self, key):
+    """The cached str for `key`, or None."""
+
+  @abstractmethod
+  def set(self, key, value):
+    """Cache the str `value` under `key` for the backend's TTL."""
+
+  @abstractmethod
+  def delete_many(self, keys):
+    """Drop `keys`; missing ones are ignored."""
+
+
+class NullPageCache(PageCache):
+  """Caches nothing; every request renders."""
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value):
+    pass
+
+  def delete_many(self, keys):
+    pass
+
+
+class MemoryPageCache(PageCache):
+  """In-process LRU with a per-entry TTL.
+
+  Each worker process has its own copy, so invalidations only reach the
+  worker that handled the write; use a shared backend with several workers.
+  """
+
+  def __init__(self, max_entries=1024, ttl=300, clock=time.monotonic):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.clock = clock
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires = entry
+      if expires <= self.clock():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self._lock:
+      self._entries[key] = (value, self.clock() + self.ttl)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def delete_many(self, keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+  def __len__(self):
+    return len(self._entries)
+
+
+class RedisPageCache(PageCache):
+  """Shared cache for multi-worker deployments.
+
+  `client` is anything with the redis-py get/set/delete API, so tests can
+  pass a local stand-in such as fakeredis.FakeRedis(). Redis does its own
+  LRU eviction when configured with a maxmemory policy.
+  """
+
+  def __init__(self, client, ttl=300, prefix='fyyur:page:'):
+    self.client = client
+    self.ttl = ttl
+    self.prefix = prefix
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    return value.decode('utf-8') if value is not None else None
+
+  def set(self, key, value):
+    self.client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+
+  def delete_many(self, keys):
+    keys = [self.prefix + key for key in keys]
+    if keys:
+      self.client.delete(*keys)
+
+
+def create_page_cache(config):
+  backend = config.get('PAGE_CACHE_BACKEND', 'memory')
+  ttl = config.get('PAGE_CACHE_TTL', 300)
+  if backend == 'memory':
+    return MemoryPageCache(max_entries=config.get('PAGE_CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+  if backend == 'redis':
+    try:
+      import redis
+    except ImportError:
+      raise RuntimeError('PAGE_CACHE_BACKEND=redis requires the redis package (pip install redis)')
+    return RedisPageCache(redis.Redis.from_url(config['PAGE_CACHE_URL']), ttl=ttl)
+  if backend == 'null':
+    return NullPageCache()
+  raise ValueError(f'Unknown page cache backend: {backend!r}')
+
+
+#----------------------------------------------------------------------------#
+# Keys.
+#----------------------------------------------------------------------------#
+
+def venue_page_key(venue_id):
+  return f'venue:{venue_id}'
+
+
+def artist_page_key(artist_id):
+  return f'artist:{artist_id}'
+
+
+def venue_page_keys(session, venue_id):
+  """The venue's page plus every artist page that lists a show there."""
+  artist_ids = session.execute(
+    select(Show.artist_id).where(Show.venue_id == venue_id).distinct()
+  ).scalars()
+  return [venue_page_key(venue_id)] + [artist_page_key(artist_id) for artist_id in artist_ids]
+
+
+def artist_page_keys(session, artist_id):
+  """The artist's page plus every venue page that lists one of its shows."""
+  venue_ids = session.execute(
+    select(Show.venue_id).where(Show.artist_id == artist_id).distinct()
+  ).scalars()
+  return [artist_page_key(artist_id)] + [venue_page_key(venue_id) for venue_id in venue_ids]
@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from sqlalchemy import func, select
+
+
+# Venue, Artist and Show carry a `version` counter and an `updated_at`
+# timestamp that every UPDATE bumps (see the column onupdate hooks in
+# models.py), including the counter updates made when shows are added or
+# removed. Pages derive their validators from those columns, which are a
+# primary-key or index lookup away, so an unchanged page can be answered with
+# 304 before any show query runs.
+
+
+def template_digest(template_folder, *extra):
+  """Digest of every template (and `extra`), so a deploy that changes markup changes ETags."""
+  digest = hashlib.sha1(':'.join(str(part) for part in extra).encode())
+  for root, dirs, files in sorted(os.walk(template_folder)):
+    dirs.sort()
+    for name in sorted(files):
+      path = os.path.join(root, name)
+      digest.update(os.path.relpath(path, template_folder).encode())
+      with open(path, 'rb') as handle:
+        digest.update(handle.read())
+  return digest.hexdigest()[:12]
+
+
+def make_etag(*parts):
+  return hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def listing_validators(session, *models, count_where=None):
+  """Row count and newest updated_at of each model, in one query.
+
+  The count catches deletes, which leave no updated_at behind.
+  `count_where` maps a model to conditions limiting its count to the rows
+  the page can show, so it need not count the whole table.
+  """
+  columns = []
+  for model in models:
+    columns.append(select(func.count(model.id)).where(*(count_where or {}).get(model, ())).scalar_subquery())
+    columns.append(select(func.max(model.updated_at)).scalar_subquery())
+  return tuple(session.execute(select(*columns)).one())
@@ -11,6 +11,148 @@ DEBUG = True
 
 # TODO IMPLEMENT DATABASE URL
 
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(database_uri):
+    """SQLAlchemy create_engine() options from DB_* environment variables.
+
+    Size DB_POOL_SIZE + DB_MAX_OVERFLOW per worker so that, times the number
+    of workers, it stays under Postgres' max_connections. With DB_PGBOUNCER=1
+    PgBouncer (transaction pooling) owns the pool: SQLAlchemy opens a
+    connection per checkout and the timeouts are applied with SET LOCAL per
+    transaction (see database.py), since PgBouncer does not pass startup
+    options through.
+    """
+    lock_timeout_ms = _env_int('DB_LOCK_TIMEOUT_MS', 2000)
+    if database_uri.startswith('sqlite'):
+        # SQLite's only knob: how long a writer waits for the database lock.
+        return {"connect_args": {"timeout": lock_timeout_ms / 1000}}
+
+    options = {"pool_pre_ping": os.environ.get('DB_POOL_PRE_PING', '1') == '1'}
+    if os.environ.get('DB_PGBOUNCER') == '1':
+        from sqlalchemy.pool import NullPool
+        options['poolclass'] = NullPool
+        return options
+
+    options.update(
+        pool_size=_env_int('DB_POOL_SIZE', 5),
+        max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+        pool_timeout=_env_int('DB_POOL_TIMEOUT', 30),
+        # Below typical load balancer / server idle cut-offs.
+        pool_recycle=_env_int('DB_POOL_RECYCLE', 1800),
+    )
+    if database_uri.startswith('postgresql'):
+        settings = {
+            "statement_timeout": _env_int('DB_STATEMENT_TIMEOUT_MS', 5000),
+            "lock_timeout": lock_timeout_ms,
+        }
+        connect_args = {"application_name": os.environ.get('DB_APPLICATION_NAME', 'fyyur')}
+        startup = ' '.join(f'-c {name}={value}' for name, value in settings.items() if value)
+        if startup:
+            connect_args['options'] = startup
+        options['connect_args'] = connect_args
+    return options
+
+
 class Config(object):
-    SQLALCHEMY_DATABASE_URI = 'postgresql://localhost:5432/fyyur'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://localhost:5432/fyyur')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Read replicas, comma separated. GET/HEAD requests read from them
+    # round-robin; a replica that fails to connect sits out for
+    # REPLICA_COOLDOWN_SECONDS, and a client that just wrote reads from the
+    # primary for REPLICA_STICKY_SECONDS (keep it above the replication lag).
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',')
+                             if url.strip()]
+    SQLALCHEMY_BINDS = {
+        f'replica_{index}': dict(engine_options(url), url=url)
+        for index, url in enumerate(DATABASE_REPLICA_URLS)
+    }
+    REPLICA_STICKY_SECONDS = _env_int('REPLICA_STICKY_SECONDS', 5)
+    REPLICA_COOLDOWN_SECONDS = _env_int('REPLICA_COOLDOWN_SECONDS', 30)
+    DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER') == '1'
+    DB_STATEMENT_TIMEOUT_MS = _env_int('DB_STATEMENT_TIMEOUT_MS', 5000)
+    DB_LOCK_TIMEOUT_MS = _env_int('DB_LOCK_TIMEOUT_MS', 2000)
+
+    # Token required (X-Admin-Token header) by the /admin endpoints. Unset,
+    # they refuse every request, unless the app runs in debug mode with
+    # ADMIN_OPEN_IN_DEBUG=1 (local development only).
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    ADMIN_OPEN_IN_DEBUG = os.environ.get('ADMIN_OPEN_IN_DEBUG') == '1'
+
+    # Name search: 'trigram' (Postgres), 'fts5' (SQLite) or 'like'.
+    # Unset picks the indexed backend for the database in use.
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND')
+    SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', 50))
+
+    # Rendered venue/artist page cache: 'memory' (per process), 'redis'
+    # (shared between workers, needs PAGE_CACHE_URL) or 'null' (disabled).
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL', 'redis://localhost:6379/0')
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 300))
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 1024))
+
+    # Per-request SQL counting/timing (X-Query-Count / X-Query-Time headers).
+    # A statement repeated SQL_N_PLUS_ONE_THRESHOLD times in one request is
+    # logged as a possible N+1. Routes over their @query_budget (or the
+    # SQL_QUERY_BUDGET default) are logged, or raise in strict mode.
+    SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') == '1'
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))
+    SQL_QUERY_BUDGET = int(os.environ['SQL_QUERY_BUDGET']) if os.environ.get('SQL_QUERY_BUDGET') else None
+    SQL_STRICT_QUERY_BUDGET = os.environ.get('SQL_STRICT_QUERY_BUDGET') == '1'
+
+    # Logging goes through a queue to a background writer thread. LOG_FORMAT
+    # is 'json' (one object per line) or 'text'; DEBUG records are kept for
+    # LOG_DEBUG_SAMPLE_RATE of requests.
+    LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+    LOG_STDERR = os.environ.get('LOG_STDERR') == '1'
+
+    # Longest show that can be booked. It also bounds how far back the
+    # double-booking check looks for overlapping shows, so keep it tight.
+    SHOW_MAX_DURATION_MINUTES = _env_int('SHOW_MAX_DURATION_MINUTES', 12 * 60)
+
+    # /shows lists the shows starting in a window of this many days, from
+    # now unless ?from= / ?to= say otherwise.
+    SHOWS_WINDOW_DAYS = _env_int('SHOWS_WINDOW_DAYS', 30)
+
+    # Shows of a deleted venue or artist are deleted this many per
+    # transaction (deletes.py); deletes with more shows than that run in the
+    # background.
+    DELETE_BATCH_SIZE = _env_int('DELETE_BATCH_SIZE', 1000)
+
+    # Artist/venue recommendations are served from an in-process index that
+    # picks up edits every RECOMMENDATION_REFRESH_SECONDS and is rebuilt
+    # from scratch every RECOMMENDATION_REBUILD_SECONDS (which also drops
+    # rows deleted by other workers).
+    RECOMMENDATION_REFRESH_SECONDS = float(os.environ.get('RECOMMENDATION_REFRESH_SECONDS', 1))
+    RECOMMENDATION_REBUILD_SECONDS = _env_int('RECOMMENDATION_REBUILD_SECONDS', 3600)
+
+    # /api/suggest answers from an in-process prefix index over venue and
+    # artist names that picks up edits every SUGGEST_REFRESH_SECONDS and is
+    # rebuilt every SUGGEST_REBUILD_SECONDS.
+    SUGGEST_REFRESH_SECONDS = float(os.environ.get('SUGGEST_REFRESH_SECONDS', 1))
+    SUGGEST_REBUILD_SECONDS = _env_int('SUGGEST_REBUILD_SECONDS', 3600)
+    # Build it in the background at startup (asgi.py) or on a worker's
+    # first request, rather than in the first /api/suggest request.
+    SUGGEST_WARMUP = os.environ.get('SUGGEST_WARMUP', '1') == '1'
+
+    # CSS/JS bundles (assets.py), built by `flask build-assets` into
+    # ASSETS_FOLDER (default static/dist). ASSETS_BUNDLE=0 links the source
+    # files one by one instead, for debugging them.
+    ASSETS_FOLDER = os.environ.get('ASSETS_FOLDER')
+    ASSETS_BUNDLE = os.environ.get('ASSETS_BUNDLE', '1') == '1'
+
+    # asgi.py serves the search, listing and JSON read routes as coroutines
+    # on the asyncio engine (ASYNC_VIEWS=0 turns that off); the other routes
+    # run as WSGI on ASGI_WSGI_THREADS threads per worker.
+    ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '1') == '1'
+    ASGI_WSGI_THREADS = _env_int('ASGI_WSGI_THREADS', 8)
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, func, or_, select, update
+
+from models import Venue, Artist, Show
+
+
+# Venue and Artist carry denormalized upcoming_shows_count / past_shows_count
+# columns so listings and searches can read a column instead of counting
+# shows. The write routes keep them current with the helpers below, and
+# reconcile_show_counters (run periodically, see `flask reconcile-show-counters`)
+# moves shows from upcoming to past as time passes and repairs any drift.
+
+
+def _show_fk(model):
+  return Show.venue_id if model is Venue else Show.artist_id
+
+
+def record_show_created(session, show, now=None):
+  """Count a newly added show against its venue and artist."""
+  now = now or datetime.now()
+  column = 'upcoming_shows_count' if show.start_time > now else 'past_shows_count'
+  for model, parent_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+    counter = getattr(model, column)
+    session.execute(
+      update(model)
+      .where(model.id == parent_id)
+      .values({column: counter + 1})
+    )
+
+
+def forget_shows(session, model, show_filter, now=None):
+  """Uncount the shows matching `show_filter` from the `model` side.
+
+  Call before deleting the shows, e.g. forget_shows(session, Artist,
+  Show.venue_id == venue_id) ahead of deleting a venue and its shows.
+  """
+  now = now or datetime.now()
+  fk = _show_fk(model)
+  upcoming = func.sum(case((Show.start_time > now, 1), else_=0))
+  past = func.sum(case((Show.start_time > now, 0), else_=1))
+  rows = session.execute(
+    select(fk.label('parent_id'), upcoming.label('upcoming'), past.label('past'))
+    .where(show_filter)
+    .group_by(fk)
+  ).all()
+  if not rows:
+    return
+  session.connection().execute(
+    update(model.__table__)
+    .where(model.__table__.c.id == bindparam('parent_id'))
+    .values(
+      upcoming_shows_count=model.__table__.c.upcoming_shows_count - bindparam('upcoming'),
+      past_shows_count=model.__table__.c.past_shows_count - bindparam('past'),
+    ),
+    [row._asdict() for row in rows],
+  )
+
+
+def reconcile_show_counters(session, now=None):
+  """Recompute every counter from Show; return the number of rows changed.
+
+  Only rows whose counts actually differ are written, so a run where no
+  show has started since the last one touches nothing.
+  """
+  now = now or datetime.now()
+  changed = 0
+  for model in (Venue, Artist):
+    fk = _show_fk(model)
+    upcoming = (
+      select(func.count(Show.id))
+      .where(fk == model.id, Show.start_time > now)
+      .scalar_subquery()
+    )
+    past = (
+      select(func.count(Show.id))
+      .where(fk == model.id, Show.start_time <= now)
+      .scalar_subquery()
+    )
+    result = session.execute(
+      update(model)
+      .where(or_(model.upcoming_shows_count != upcoming, model.past_shows_count != past))
+      .values(upcoming_shows_count=upcoming, past_shows_count=past)
+      .execution_options(synchronize_session=False)
+    )
+    changed += result.rowcount
+  return changed
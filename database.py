@@ -0,0 +1,116 @@
+import threading
+
+from sqlalchemy import event
+
+
+# Pool accounting for /admin/pool-stats. The counters are per process, like
+# the pools themselves: each worker reports its own.
+
+
+class PoolCounters(object):
+  def __init__(self):
+    self.connects = 0
+    self.checkouts = 0
+    self.invalidations = 0
+    self.checked_out = 0
+    self.peak_checked_out = 0
+    # Checkouts that left no spare connection (pool and overflow all in
+    # use); a rising count means requests are about to queue for one.
+    self.saturated_checkouts = 0
+    self._lock = threading.Lock()
+
+  def as_dict(self):
+    return {key: value for key, value in vars(self).items() if not key.startswith('_')}
+
+
+def _pool_capacity(pool):
+  if hasattr(pool, 'size') and hasattr(pool, '_max_overflow'):
+    return pool.size() + max(pool._max_overflow, 0)
+  return None
+
+
+def watch_pool(engine):
+  counters = PoolCounters()
+  capacity = _pool_capacity(engine.pool)
+
+  @event.listens_for(engine, 'connect')
+  def on_connect(dbapi_connection, record):
+    with counters._lock:
+      counters.connects += 1
+
+  @event.listens_for(engine, 'checkout')
+  def on_checkout(dbapi_connection, record, proxy):
+    with counters._lock:
+      counters.checkouts += 1
+      counters.checked_out += 1
+      counters.peak_checked_out = max(counters.peak_checked_out, counters.checked_out)
+      if capacity is not None and counters.checked_out >= capacity:
+        counters.saturated_checkouts += 1
+
+  @event.listens_for(engine, 'checkin')
+  def on_checkin(dbapi_connection, record):
+    with counters._lock:
+      counters.checked_out -= 1
+
+  @event.listens_for(engine, 'invalidate')
+  def on_invalidate(dbapi_connection, record, exception):
+    with counters._lock:
+      counters.invalidations += 1
+
+  return counters
+
+
+def apply_transaction_timeouts(engine, statement_timeout_ms, lock_timeout_ms):
+  """SET LOCAL the timeouts at the start of every transaction.
+
+  For PgBouncer in transaction mode, where a session-level SET (or a libpq
+  startup option) would leak to whichever client gets the server
+  connection next.
+  """
+  settings = [(name, value) for name, value in (('statement_timeout', statement_timeout_ms),
+                                                ('lock_timeout', lock_timeout_ms)) if value]
+
+  @event.listens_for(engine, 'begin')
+  def set_local_timeouts(connection):
+    for name, value in settings:
+      connection.exec_driver_sql(f'SET LOCAL {name} = {int(value)}')
+
+
+def enforce_foreign_keys(engine):
+  """Turn on SQLite's foreign key checks (and so ON DELETE CASCADE), off by default."""
+
+  @event.listens_for(engine, 'connect')
+  def on_connect(dbapi_connection, record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys = ON')
+    cursor.close()
+
+
+def configure_engines(app, db):
+  """Attach pool counters (and PgBouncer timeouts) to every engine of `db`."""
+  counters = {}
+  with app.app_context():
+    for bind, engine in db.engines.items():
+      counters[bind] = (engine, watch_pool(engine))
+      if app.config.get('DB_PGBOUNCER') and engine.dialect.name == 'postgresql':
+        apply_transaction_timeouts(engine, app.config.get('DB_STATEMENT_TIMEOUT_MS'),
+                                   app.config.get('DB_LOCK_TIMEOUT_MS'))
+      if engine.dialect.name == 'sqlite':
+        enforce_foreign_keys(engine)
+  app.extensions['pool_counters'] = counters
+
+
+def pool_stats(app):
+  """Pool status and counters per bind (None is the default database)."""
+  stats = {}
+  for bind, (engine, counters) in app.extensions.get('pool_counters', {}).items():
+    pool = engine.pool
+    entry = {"pool": type(pool).__name__, "capacity": _pool_capacity(pool)}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+      method = getattr(pool, name, None)
+      if method is not None:
+        entry[name] = method()
+    entry.update(counters.as_dict())
+    entry['saturated'] = entry['capacity'] is not None and counters.checked_out >= entry['capacity']
+    stats[bind or 'default'] = entry
+  return stats
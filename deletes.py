@@ -0,0 +1,189 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from counters import forget_shows
+from genres import genre_links
+from models import db, Venue, Artist, Show
+
+
+# Deleting a venue or artist deletes its shows. Show's foreign keys cascade
+# (ON DELETE CASCADE), but the shows are deleted here first, in batches of
+# DELETE_BATCH_SIZE with a commit after each: a venue with years of shows
+# would otherwise be deleted by one long statement holding its locks
+# throughout, and the other side's show counters have to be decremented
+# for every show anyway. The last transaction locks the rows, as booking
+# does, and uncounts any show booked since the previous batch, so nothing
+# is left for the cascade to remove uncounted. Only deletes made outside
+# the app rely on the cascade; run `flask reconcile-show-counters` after
+# those.
+#
+# A delete that fits in one batch runs in the request, as one transaction.
+# Bigger ones, and every /admin/bulk-delete, run as a DeleteJob on this
+# worker's background thread, its progress kept in memory. A job cut short
+# (say by a restart) leaves the rows with some of their shows; deleting
+# them again finishes the job.
+
+# Finished jobs kept for status lookups, per worker.
+KEEP_FINISHED_JOBS = 100
+
+
+def _show_keys(model):
+  # (Show column pointing at `model`, the other side)
+  if model is Venue:
+    return Show.venue_id, Artist
+  return Show.artist_id, Venue
+
+
+def count_shows(session, model, entity_id):
+  parent_key, _ = _show_keys(model)
+  return session.execute(
+    select(db.func.count(Show.id)).where(parent_key == entity_id)
+  ).scalar_one()
+
+
+def delete_show_batch(session, model, ids, limit):
+  """Delete up to `limit` shows of the `model` rows `ids`, uncounting them; return how many."""
+  parent_key, other = _show_keys(model)
+  show_ids = session.execute(select(Show.id).where(parent_key.in_(ids)).limit(limit)).scalars().all()
+  if show_ids:
+    forget_shows(session, other, Show.id.in_(show_ids))
+    session.execute(delete(Show).where(Show.id.in_(show_ids)).execution_options(synchronize_session=False))
+  return len(show_ids)
+
+
+def delete_rows(session, model, ids):
+  """Delete the `model` rows `ids`, their genre links and any shows left.
+
+  Returns (shows deleted, rows deleted).
+  """
+  parent_key, other = _show_keys(model)
+  # Locked like book_show locks them, so no show is booked for the rows
+  # between the sweep below and their delete.
+  session.execute(select(model.id).where(model.id.in_(ids)).with_for_update())
+  link, link_key = genre_links(model)
+  session.execute(delete(link).where(link_key.in_(ids)))
+  forget_shows(session, other, parent_key.in_(ids))
+  shows = session.execute(
+    delete(Show).where(parent_key.in_(ids)).execution_options(synchronize_session=False)
+  ).rowcount
+  rows = session.execute(
+    delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+  ).rowcount
+  return shows, rows
+
+
+def delete_entities(session, model, ids, batch_size, progress=None):
+  """Delete the `model` rows `ids` with their shows, committing after every batch.
+
+  The rows go in the same transaction as their last batch of shows, so a
+  delete with at most `batch_size` shows is a single transaction.
+  `progress(model, shows, rows, ids)` is called after each commit, with
+  what it deleted and, once rows went, the ids they were deleted by.
+  Returns (shows deleted, rows deleted).
+  """
+  ids = list(ids)
+  shows = rows = 0
+  for start in range(0, len(ids), batch_size):
+    chunk = ids[start:start + batch_size]
+    while True:
+      deleted = delete_show_batch(session, model, chunk, batch_size)
+      shows += deleted
+      if deleted < batch_size:
+        break
+      session.commit()
+      if progress:
+        progress(model, deleted, 0, [])
+    late_shows, chunk_rows = delete_rows(session, model, chunk)
+    shows += late_shows
+    rows += chunk_rows
+    session.commit()
+    if progress:
+      progress(model, deleted + late_shows, chunk_rows, chunk)
+  return shows, rows
+
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+class DeleteJob(object):
+  def __init__(self, venue_ids=(), artist_ids=()):
+    self.id = uuid.uuid4().hex
+    self.venue_ids = list(venue_ids)
+    self.artist_ids = list(artist_ids)
+    self.state = 'queued'
+    self.deleted = {"shows": 0, "venues": 0, "artists": 0}
+    self.error = None
+    self.created_at = datetime.utcnow()
+    self.finished_at = None
+
+  def as_dict(self):
+    return {
+      "id": self.id,
+      "state": self.state,
+      "venues": len(self.venue_ids),
+      "artists": len(self.artist_ids),
+      "deleted": dict(self.deleted),
+      "error": self.error,
+      "created_at": self.created_at,
+      "finished_at": self.finished_at,
+    }
+
+
+class DeleteJobs(object):
+  """This worker's background deletes: run one at a time, in order.
+
+  `on_deleted(model, ids)` is called (in the job's thread) as rows go, to
+  drop what the worker holds for them, such as cached pages.
+  """
+
+  def __init__(self, app, batch_size=1000, on_deleted=None):
+    self.app = app
+    self.batch_size = batch_size
+    self.on_deleted = on_deleted
+    self.jobs = OrderedDict()
+    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='delete-jobs')
+    self._lock = threading.Lock()
+    app.extensions['delete_jobs'] = self
+
+  def submit(self, venue_ids=(), artist_ids=()):
+    job = DeleteJob(venue_ids, artist_ids)
+    with self._lock:
+      self.jobs[job.id] = job
+      finished = [key for key, old in self.jobs.items() if old.finished_at]
+      for key in finished[:-KEEP_FINISHED_JOBS]:
+        del self.jobs[key]
+    self._executor.submit(self._run, job)
+    return job
+
+  def get(self, job_id):
+    with self._lock:
+      return self.jobs.get(job_id)
+
+  def _run(self, job):
+    job.state = 'running'
+
+    def progress(model, shows, rows, ids):
+      job.deleted['shows'] += shows
+      job.deleted['venues' if model is Venue else 'artists'] += rows
+      if ids and self.on_deleted:
+        self.on_deleted(model, ids)
+
+    with self.app.app_context():
+      try:
+        for model, ids in ((Venue, job.venue_ids), (Artist, job.artist_ids)):
+          delete_entities(db.session, model, ids, self.batch_size, progress)
+        job.state = 'done'
+        self.app.logger.info('delete job %s done: %s', job.id, job.deleted)
+      except Exception as error:
+        db.session.rollback()
+        job.state = 'failed'
+        job.error = str(error)
+        self.app.logger.exception('delete job %s failed', job.id)
+      finally:
+        job.finished_at = datetime.utcnow()
@@ -13,6 +13,12 @@ def test():
         abort("Aborted at user request.")
 
 
+def bench(scale="small", output="bench-results.json"):
+    local(
+        "python benchmarks/bench_routes.py --scale {} --output {}".format(scale, output)
+    )
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -0,0 +1,64 @@
+from sqlalchemy import func, select
+
+from forms import GENRE_CHOICES
+from models import Genre, Venue, venue_genres, artist_genres
+
+
+GENRE_NAMES = [value for value, label in GENRE_CHOICES]
+
+
+def genre_links(model):
+  """(association table, its foreign key column to `model`)."""
+  if model is Venue:
+    return venue_genres, venue_genres.c.venue_id
+  return artist_genres, artist_genres.c.artist_id
+
+
+def get_genres(session, names):
+  """Genre rows for `names`, in the given order, creating any missing ones.
+
+  Accepts a list or the legacy comma-joined string.
+  """
+  if isinstance(names, str):
+    names = names.split(',')
+  wanted = []
+  for name in names or []:
+    name = name.strip()
+    if name and name not in wanted:
+      wanted.append(name)
+  if not wanted:
+    return []
+  existing = {
+    genre.name: genre
+    for genre in session.execute(select(Genre).where(Genre.name.in_(wanted))).scalars()
+  }
+  for name in wanted:
+    if name not in existing:
+      existing[name] = Genre(name=name)
+      session.add(existing[name])
+  return [existing[name] for name in wanted]
+
+
+def genre_filter(model, names):
+  """WHERE clause: `model` rows tagged with any of the genre `names`.
+
+  Resolves through the (genre_id, <parent>_id) index, so the filter is an
+  index lookup rather than a scan of the parent table.
+  """
+  link, fk = genre_links(model)
+  return model.id.in_(
+    select(fk)
+    .join(Genre, Genre.id == link.c.genre_id)
+    .where(Genre.name.in_(names))
+  )
+
+
+def genre_names_column(model):
+  """Correlated subquery: the row's genres as one comma-joined string."""
+  link, fk = genre_links(model)
+  return (
+    select(func.aggregate_strings(Genre.name, ','))
+    .join(link, link.c.genre_id == Genre.id)
+    .where(fk == model.id)
+    .scalar_subquery()
+  )
@@ -0,0 +1,106 @@
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+# Every statement run while handling a request is counted and timed on
+# g.query_stats. The same statement text run over and over in one request
+# (with different parameters) is the signature of an N+1: a lazy load or a
+# query inside a loop. Totals go out in X-Query-Count / X-Query-Time and, via
+# g.query_summary, in the request log line; routes can declare a budget with
+# @query_budget(n), which SQL_STRICT_QUERY_BUDGET turns into a hard failure.
+
+
+class QueryBudgetExceeded(AssertionError):
+  pass
+
+
+class QueryStats(object):
+  def __init__(self):
+    self.count = 0
+    self.duration = 0.0
+    self.statements = Counter()
+
+  def record(self, statement, duration):
+    self.count += 1
+    self.duration += duration
+    self.statements[statement] += 1
+
+  def repeated(self, threshold):
+    """(statement, times) for statements run at least `threshold` times."""
+    return [(statement, times) for statement, times in self.statements.most_common()
+            if times >= threshold]
+
+
+def query_budget(limit):
+  """Declare the most queries a view may issue per request."""
+  def decorator(view):
+    view.query_budget = limit
+    return view
+  return decorator
+
+
+def _shorten(statement, width=160):
+  statement = ' '.join(statement.split())
+  return statement if len(statement) <= width else statement[:width - 3] + '...'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info['query_started'].pop()
+  # Streamed API responses keep querying after the request context is gone.
+  if has_request_context() and 'query_stats' in g:
+    g.query_stats.record(statement, time.perf_counter() - started)
+
+
+def watch_queries(engine):
+  """Count and time `engine`'s statements into the current request's stats."""
+  event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+  event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def instrument_queries(app, db):
+  """Hook statement timing into `db`'s engines and report per request."""
+  if not app.config.get('SQL_INSTRUMENTATION', True):
+    return
+  threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+
+  with app.app_context():
+    # Every bind, replicas (see replicas.py) included: reads routed to one
+    # count towards the request like any other.
+    for engine in db.engines.values():
+      watch_queries(engine)
+
+  @app.before_request
+  def start_query_stats():
+    g.query_stats = QueryStats()
+
+  @app.after_request
+  def report_query_stats(response):
+    stats = g.pop('query_stats', None)
+    if stats is None:
+      return response
+    duration_ms = stats.duration * 1000
+    response.headers['X-Query-Count'] = str(stats.count)
+    response.headers['X-Query-Time'] = f'{duration_ms:.1f}'
+
+    repeated = stats.repeated(threshold)
+    # Picked up by the request log line (see logging_setup).
+    g.query_summary = {"queries": stats.count, "query_ms": round(duration_ms, 1),
+                       "n_plus_one": len(repeated)}
+    for statement, times in repeated:
+      app.logger.warning('possible N+1 in %s: %d x %s', request.endpoint, times, _shorten(statement))
+
+    view = app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None) or app.config.get('SQL_QUERY_BUDGET')
+    if budget is not None and stats.count > budget:
+      message = f'{request.endpoint} ran {stats.count} queries, over its budget of {budget}'
+      if app.config.get('SQL_STRICT_QUERY_BUDGET'):
+        raise QueryBudgetExceeded(message)
+      app.logger.warning(message)
+    return response
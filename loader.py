@@ -0,0 +1,310 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+import click
+from sqlalchemy import func, insert, select, text
+
+from booking import DEFAULT_MAX_SHOW_DURATION
+from models import Genre, Venue, Artist, Show, venue_genres, artist_genres, DEFAULT_SHOW_DURATION
+
+
+DEFAULT_BATCH_SIZE = 5000
+
+VENUE_FIELDS = ('name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+                'website', 'seeking_talent', 'seeking_description')
+ARTIST_FIELDS = ('name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+                 'website', 'seeking_venue', 'seeking_description')
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+# Venue columns that are NOT NULL (the /venues keyset); missing ones load as ''.
+VENUE_NOT_NULL_FIELDS = ('city', 'state')
+
+
+#----------------------------------------------------------------------------#
+# Input.
+#----------------------------------------------------------------------------#
+
+def read_records(path):
+  """Stream dicts from a .csv or .ndjson/.jsonl file, one line at a time."""
+  extension = os.path.splitext(path)[1].lower()
+  with open(path, newline='', encoding='utf-8') as handle:
+    if extension == '.csv':
+      yield from csv.DictReader(handle)
+    elif extension in ('.ndjson', '.jsonl'):
+      for line in handle:
+        if line.strip():
+          yield json.loads(line)
+    else:
+      raise click.UsageError(f'{path}: expected a .csv, .ndjson or .jsonl file')
+
+
+def batched(records, size):
+  records = iter(records)
+  while True:
+    batch = list(islice(records, size))
+    if not batch:
+      return
+    yield batch
+
+
+def clean(value):
+  if isinstance(value, str):
+    value = value.strip()
+    return value or None
+  return value
+
+
+def to_bool(value):
+  if isinstance(value, str):
+    return value.strip().lower() in ('1', 'true', 'yes', 'y', 't')
+  return bool(value)
+
+
+def to_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  value = value.strip()
+  if value.endswith('Z'):
+    value = value[:-1]
+  return datetime.fromisoformat(value)
+
+
+def split_names(value):
+  if not value:
+    return []
+  if isinstance(value, str):
+    value = value.split(',')
+  return [name.strip() for name in value if name and name.strip()]
+
+
+#----------------------------------------------------------------------------#
+# Loader.
+#----------------------------------------------------------------------------#
+
+class LoadStats(object):
+  def __init__(self, table):
+    self.table = table
+    self.loaded = 0
+    self.skipped = 0
+    self.started = time.perf_counter()
+
+  @property
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  @property
+  def rate(self):
+    return self.loaded / self.elapsed if self.elapsed else 0.0
+
+  def __str__(self):
+    return (f'{self.table}: {self.loaded} loaded, {self.skipped} skipped '
+            f'in {self.elapsed:.1f}s ({self.rate:,.0f} rows/s)')
+
+
+class CatalogLoader(object):
+  """Batch loader for venues, artists and shows.
+
+  Each batch is one transaction: a multi-row INSERT (executemany with
+  SQLAlchemy's insertmanyvalues batching), or COPY on Postgres via psycopg2.
+  Foreign keys and genres are resolved a batch at a time with IN queries,
+  never a query per row.
+
+  Shows that do not end after they start, or last longer than
+  `max_duration`, are skipped, as book_show would refuse them: the
+  double-booking check (booking.overlaps) only looks `max_duration` back,
+  so a longer show would escape it.
+  """
+
+  def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE, use_copy=True, progress=None,
+               max_duration=DEFAULT_MAX_SHOW_DURATION):
+    self.engine = engine
+    self.batch_size = batch_size
+    self.max_duration = max_duration
+    self.use_copy = use_copy and engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+    self.progress = progress or (lambda stats: None)
+    self.genre_ids = {}
+    self.venue_ids = {}
+    self.artist_ids = {}
+
+  # Writing.
+
+  def write(self, connection, table, rows, columns):
+    if not rows:
+      return
+    if self.use_copy:
+      buffer = io.StringIO()
+      writer = csv.writer(buffer)
+      for row in rows:
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+      buffer.seek(0)
+      column_list = ', '.join(f'"{column}"' for column in columns)
+      cursor = connection.connection.dbapi_connection.cursor()
+      try:
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+      finally:
+        cursor.close()
+    else:
+      connection.execute(insert(table), rows)
+
+  def allocate_ids(self, connection, table, count):
+    """Reserve `count` primary keys up front so parents and genre links
+    can be written in the same batch without RETURNING."""
+    if self.engine.dialect.name == 'postgresql':
+      sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": f'"{table.name}"'}).scalar()
+      return list(connection.execute(
+        text('SELECT nextval(:sequence) FROM generate_series(1, :count)'),
+        {"sequence": sequence, "count": count}).scalars())
+    # Batches run one at a time under SQLite's single-writer lock.
+    start = connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar() + 1
+    return list(range(start, start + count))
+
+  def resolve_genres(self, connection, names):
+    missing = [name for name in names if name not in self.genre_ids]
+    if missing:
+      found = connection.execute(
+        select(Genre.id, Genre.name).where(Genre.name.in_(missing))).all()
+      self.genre_ids.update({name: genre_id for genre_id, name in found})
+      new = sorted(set(missing) - set(self.genre_ids))
+      if new:
+        connection.execute(insert(Genre.__table__), [{"name": name} for name in new])
+        found = connection.execute(
+          select(Genre.id, Genre.name).where(Genre.name.in_(new))).all()
+        self.genre_ids.update({name: genre_id for genre_id, name in found})
+    return self.genre_ids
+
+  # Parents.
+
+  def load_parents(self, records, model, fields, link, link_fk, name_ids, not_null=()):
+    table = model.__table__
+    stats = LoadStats(table.name)
+    columns = ['id'] + list(fields) + ['version', 'updated_at']
+    for batch in batched(records, self.batch_size):
+      now = datetime.utcnow()
+      with self.engine.begin() as connection:
+        missing_ids = [record for record in batch if not clean(record.get('id'))]
+        new_ids = iter(self.allocate_ids(connection, table, len(missing_ids)) if missing_ids else [])
+        rows, links, batch_genres = [], [], set()
+        for record in batch:
+          name = clean(record.get('name'))
+          if not name:
+            stats.skipped += 1
+            continue
+          row = {field: clean(record.get(field)) for field in fields}
+          for field in BOOLEAN_FIELDS:
+            if field in row:
+              row[field] = to_bool(row[field]) if row[field] is not None else False
+          for field in not_null:
+            if row[field] is None:
+              row[field] = ''
+          row['id'] = int(record['id']) if clean(record.get('id')) else next(new_ids)
+          row['version'] = 1
+          row['updated_at'] = now
+          rows.append(row)
+          name_ids.setdefault(name, row['id'])
+          genres = split_names(record.get('genres'))
+          batch_genres.update(genres)
+          links.extend((row['id'], genre) for genre in dict.fromkeys(genres))
+        self.write(connection, table, rows, columns)
+        genre_ids = self.resolve_genres(connection, batch_genres)
+        self.write(connection, link,
+                   [{link_fk: parent_id, 'genre_id': genre_ids[genre]} for parent_id, genre in links],
+                   [link_fk, 'genre_id'])
+      stats.loaded += len(rows)
+      self.progress(stats)
+    if self.engine.dialect.name == 'postgresql':
+      # Explicit ids bypass the sequence; move it past the highest one.
+      with self.engine.begin() as connection:
+        connection.execute(text(
+          f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+          f'(SELECT coalesce(max(id), 1) FROM "{table.name}"))'))
+    return stats
+
+  def load_venues(self, records):
+    return self.load_parents(records, Venue, VENUE_FIELDS, venue_genres, 'venue_id', self.venue_ids,
+                             not_null=VENUE_NOT_NULL_FIELDS)
+
+  def load_artists(self, records):
+    return self.load_parents(records, Artist, ARTIST_FIELDS, artist_genres, 'artist_id', self.artist_ids)
+
+  # Shows.
+
+  def resolve_parents(self, connection, model, records, id_key, name_key, name_ids):
+    """Map each record to a parent id: by explicit id (checked to exist) or
+    by name (first match wins), with one IN query per batch for each."""
+    ids = {int(record[id_key]) for record in records if clean(record.get(id_key))}
+    existing = set()
+    if ids:
+      existing = set(connection.execute(select(model.id).where(model.id.in_(ids))).scalars())
+    names = {clean(record.get(name_key)) for record in records
+             if not clean(record.get(id_key)) and clean(record.get(name_key))}
+    names -= set(name_ids)
+    if names:
+      for parent_id, name in connection.execute(
+          select(model.id, model.name).where(model.name.in_(names)).order_by(model.id)):
+        name_ids.setdefault(name, parent_id)
+    resolved = []
+    for record in records:
+      if clean(record.get(id_key)):
+        parent_id = int(record[id_key])
+        resolved.append(parent_id if parent_id in existing else None)
+      else:
+        resolved.append(name_ids.get(clean(record.get(name_key))))
+    return resolved
+
+  def load_shows(self, records):
+    table = Show.__table__
+    stats = LoadStats(table.name)
+    columns = ['start_time', 'end_time', 'venue_id', 'artist_id', 'version', 'updated_at']
+    for batch in batched(records, self.batch_size):
+      now = datetime.utcnow()
+      with self.engine.begin() as connection:
+        venue_ids = self.resolve_parents(connection, Venue, batch, 'venue_id', 'venue', self.venue_ids)
+        artist_ids = self.resolve_parents(connection, Artist, batch, 'artist_id', 'artist', self.artist_ids)
+        rows = []
+        for record, venue_id, artist_id in zip(batch, venue_ids, artist_ids):
+          start_time = clean(record.get('start_time'))
+          if venue_id is None or artist_id is None or not start_time:
+            stats.skipped += 1
+            continue
+          start_time = to_datetime(start_time)
+          end_time = show_end_time(record, start_time)
+          if not timedelta(0) < end_time - start_time <= self.max_duration:
+            stats.skipped += 1
+            continue
+          rows.append({
+            "start_time": start_time,
+            "end_time": end_time,
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "version": 1,
+            "updated_at": now,
+          })
+        self.write(connection, table, rows, columns)
+      stats.loaded += len(rows)
+      self.progress(stats)
+    return stats
+
+
+def show_end_time(record, start_time):
+  """end_time from the record, else start_time plus its duration_minutes."""
+  end_time = clean(record.get('end_time'))
+  if end_time:
+    return to_datetime(end_time)
+  minutes = clean(record.get('duration_minutes'))
+  duration = timedelta(minutes=int(minutes)) if minutes else DEFAULT_SHOW_DURATION
+  return start_time + duration
+
+
+def _copy_value(value):
+  if value is None:
+    return ''
+  if isinstance(value, bool):
+    return 't' if value else 'f'
+  if isinstance(value, datetime):
+    return value.isoformat()
+  return value
@@ -0,0 +1,152 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+
+# Request threads only put records on an in-memory queue; a background
+# listener thread formats them and does the file I/O. When the queue is full
+# records are dropped (and counted) rather than blocking the request.
+
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class RequestContextFilter(logging.Filter):
+  """Stamp records with the request they were logged from.
+
+  Runs on the request thread, since the listener thread has no request
+  context to read from.
+  """
+
+  def filter(self, record):
+    if has_request_context():
+      record.request_id = g.get('request_id')
+      record.method = request.method
+      record.path = request.path
+      record.endpoint = request.endpoint
+    return True
+
+
+class DebugSampler(logging.Filter):
+  """Keep every record at INFO and above, and DEBUG for a sample of requests.
+
+  Sampling is by request id, so a sampled request keeps all of its debug
+  lines and the rest keep none.
+  """
+
+  def __init__(self, rate):
+    super().__init__()
+    self.threshold = int(rate * 0xFFFFFFFF)
+
+  def filter(self, record):
+    if record.levelno > logging.DEBUG:
+      return True
+    key = getattr(record, 'request_id', None) or record.getMessage()
+    return zlib.crc32(key.encode()) <= self.threshold
+
+
+class NonBlockingQueueHandler(QueueHandler):
+  def __init__(self, log_queue):
+    super().__init__(log_queue)
+    self.dropped = 0
+
+  def prepare(self, record):
+    # Resolve args and the traceback now, while they can still be read
+    # safely, but keep the traceback separate so formatters can place it.
+    record = copy.copy(record)
+    record.msg = record.getMessage()
+    record.args = None
+    if record.exc_info:
+      record.exc_text = logging.Formatter().formatException(record.exc_info)
+      record.exc_info = None
+    return record
+
+  def enqueue(self, record):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+  """One JSON object per line; extra= attributes become top-level fields."""
+
+  def format(self, record):
+    entry = {
+      "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage(),
+    }
+    for key, value in vars(record).items():
+      if key not in STANDARD_ATTRIBUTES and value is not None:
+        entry[key] = value
+    if record.exc_text:
+      entry['exception'] = record.exc_text
+    entry['source'] = f'{record.pathname}:{record.lineno}'
+    return json.dumps(entry, default=str)
+
+
+def configure_logging(app):
+  """Route app.logger through a queue to a rotating file (and stderr in debug).
+
+  Call before any other extension registers an after_request hook: Flask
+  runs those hooks in reverse order, so this module's access-log hook then
+  runs last and sees everything the others left on `g`.
+  """
+  config = app.config
+  if config.get('LOG_FORMAT', 'json') == 'json':
+    formatter = JsonFormatter()
+  else:
+    formatter = logging.Formatter('%(asctime)s %(levelname)s [%(request_id)s]: %(message)s '
+                                  '[in %(pathname)s:%(lineno)d]', defaults={"request_id": '-'})
+
+  handlers = []
+  if config.get('LOG_FILE'):
+    file_handler = RotatingFileHandler(config['LOG_FILE'], maxBytes=config.get('LOG_MAX_BYTES', 10485760),
+                                       backupCount=config.get('LOG_BACKUP_COUNT', 5), delay=True)
+    file_handler.setFormatter(formatter)
+    handlers.append(file_handler)
+  if app.debug or config.get('LOG_STDERR'):
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+    handlers.append(stream_handler)
+
+  queue_handler = NonBlockingQueueHandler(queue.Queue(config.get('LOG_QUEUE_SIZE', 10000)))
+  queue_handler.addFilter(RequestContextFilter())
+  queue_handler.addFilter(DebugSampler(config.get('LOG_DEBUG_SAMPLE_RATE', 0.01)))
+  listener = QueueListener(queue_handler.queue, *handlers)
+  listener.start()
+  atexit.register(listener.stop)
+
+  app.logger.removeHandler(default_handler)
+  app.logger.addHandler(queue_handler)
+  app.logger.setLevel(config.get('LOG_LEVEL', 'INFO'))
+  app.extensions['logging'] = queue_handler
+
+  @app.before_request
+  def start_request_log():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+  @app.after_request
+  def log_request(response):
+    response.headers['X-Request-ID'] = g.request_id
+    duration_ms = (time.perf_counter() - g.request_started) * 1000
+    app.logger.info('%s %s %s %.1fms', request.method, request.full_path.rstrip('?'),
+                    response.status_code, duration_ms,
+                    extra=dict(g.get('query_summary', {}), status=response.status_code,
+                               duration_ms=round(duration_ms, 1)))
+    return response
+
+  return listener
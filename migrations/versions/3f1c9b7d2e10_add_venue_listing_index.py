@@ -0,0 +1,23 @@
+"""Add venue listing index
+
+Revision ID: 3f1c9b7d2e10
+Revises: a0813e586ac0
+Create Date: 2026-10-18 11:02:14.318204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9b7d2e10'
+down_revision = 'a0813e586ac0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_state_city_id', 'Venue', ['state', 'city', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city_id', table_name='Venue')
@@ -0,0 +1,43 @@
+"""Add show counters to Venue and Artist
+
+Revision ID: 5d9a1f3c7e24
+Revises: c47e2a9d5b18
+Create Date: 2026-10-18 13:05:39.120664
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9a1f3c7e24'
+down_revision = 'c47e2a9d5b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for tablename in ('Venue', 'Artist'):
+        op.add_column(tablename, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(tablename, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from the existing shows.
+    now = datetime.now()
+    for tablename, fk in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.get_bind().execute(
+            sa.text(
+                f'UPDATE "{tablename}" SET '
+                f'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{tablename}".id AND "Show".start_time > :now), '
+                f'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{fk} = "{tablename}".id AND "Show".start_time <= :now)'
+            ),
+            {"now": now},
+        )
+
+
+def downgrade():
+    # Plain ALTERs (not batch mode) so SQLite keeps the search triggers.
+    for tablename in ('Artist', 'Venue'):
+        op.drop_column(tablename, 'past_shows_count')
+        op.drop_column(tablename, 'upcoming_shows_count')
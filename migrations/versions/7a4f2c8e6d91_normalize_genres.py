@@ -0,0 +1,102 @@
+"""Normalize genres into Genre and association tables
+
+Revision ID: 7a4f2c8e6d91
+Revises: e81b3c5a9f46
+Create Date: 2026-10-18 15:03:27.481920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4f2c8e6d91'
+down_revision = 'e81b3c5a9f46'
+branch_labels = None
+depends_on = None
+
+
+# The genre choices offered by forms.py when this revision was written.
+SEED_GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+    'Other',
+]
+
+# (parent table, association table, foreign key column)
+LINKS = (
+    ('Venue', 'venue_genres', 'venue_id'),
+    ('Artist', 'artist_genres', 'artist_id'),
+)
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for parent, link, fk in LINKS:
+        op.create_table(link,
+        sa.Column(fk, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint([fk], [f'{parent}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(fk, 'genre_id')
+        )
+        op.create_index(f'ix_{link}_genre_id_{fk}', link, ['genre_id', fk], unique=False)
+
+    # Move the comma-joined strings into the new tables. Values outside the
+    # form choices (e.g. hand-loaded data) become genres of their own.
+    connection = op.get_bind()
+    genre_ids = {}
+
+    def genre_id(name):
+        if name not in genre_ids:
+            connection.execute(genre.insert().values(name=name))
+            genre_ids[name] = connection.execute(
+                sa.select(genre.c.id).where(genre.c.name == name)).scalar_one()
+        return genre_ids[name]
+
+    for name in SEED_GENRES:
+        genre_id(name)
+
+    for parent, link, fk in LINKS:
+        link_table = sa.table(link, sa.column(fk), sa.column('genre_id'))
+        rows = connection.execute(sa.text(f'SELECT id, genres FROM "{parent}" WHERE genres IS NOT NULL')).all()
+        links = []
+        for parent_id, genres in rows:
+            names = []
+            for name in genres.split(','):
+                name = name.strip()
+                if name and name not in names:
+                    names.append(name)
+            links.extend({fk: parent_id, 'genre_id': genre_id(name)} for name in names)
+        if links:
+            connection.execute(link_table.insert(), links)
+
+    # Plain ALTERs (not batch mode) so SQLite keeps the search triggers.
+    for parent, link, fk in LINKS:
+        op.drop_column(parent, 'genres')
+
+
+def downgrade():
+    connection = op.get_bind()
+    for parent, link, fk in LINKS:
+        op.add_column(parent, sa.Column('genres', sa.String(length=120), nullable=True))
+        rows = connection.execute(sa.text(
+            f'SELECT l.{fk}, g.name FROM {link} l JOIN "Genre" g ON g.id = l.genre_id ORDER BY l.{fk}, g.name'
+        )).all()
+        genres = {}
+        for parent_id, name in rows:
+            genres.setdefault(parent_id, []).append(name)
+        for parent_id, names in genres.items():
+            connection.execute(
+                sa.text(f'UPDATE "{parent}" SET genres = :genres WHERE id = :id'),
+                {"genres": ','.join(names), "id": parent_id},
+            )
+        op.drop_index(f'ix_{link}_genre_id_{fk}', table_name=link)
+        op.drop_table(link)
+    op.drop_table('Genre')
@@ -0,0 +1,52 @@
+"""Add Show.end_time and booking exclusion constraints
+
+Revision ID: b5e3d8a1c7f2
+Revises: 7a4f2c8e6d91
+Create Date: 2026-10-18 16:42:10.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e3d8a1c7f2'
+down_revision = '7a4f2c8e6d91'
+branch_labels = None
+depends_on = None
+
+
+# Shows booked before this revision get the default two hours.
+DEFAULT_MINUTES = 120
+
+CONSTRAINTS = (
+    ('ex_Show_venue_booking', 'venue_id'),
+    ('ex_Show_artist_booking', 'artist_id'),
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if dialect == 'postgresql':
+        op.execute(f"""UPDATE "Show" SET end_time = start_time + interval '{DEFAULT_MINUTES} minutes'""")
+        op.alter_column('Show', 'end_time', nullable=False)
+        # Fails, naming the clashing rows, if existing shows already
+        # double-book a venue or artist; resolve those first.
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for name, column in CONSTRAINTS:
+            op.execute(f'ALTER TABLE "Show" ADD CONSTRAINT "{name}" '
+                       f'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)')
+    else:
+        # SQLite cannot add NOT NULL to an existing column without a table
+        # rebuild, which is not worth it here: the model always sets
+        # end_time. Datetimes are compared as text here, so write them
+        # in SQLAlchemy's format, microseconds included.
+        op.execute(f"""UPDATE "Show" SET end_time = datetime(start_time, '+{DEFAULT_MINUTES} minutes') || '.000000'""")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, column in CONSTRAINTS:
+            op.execute(f'ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS "{name}"')
+    op.drop_column('Show', 'end_time')
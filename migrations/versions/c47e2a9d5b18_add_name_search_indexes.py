@@ -0,0 +1,52 @@
+"""Add name search indexes
+
+Revision ID: c47e2a9d5b18
+Revises: 8b2d4e6f1a37
+Create Date: 2026-10-18 12:21:07.551936
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c47e2a9d5b18'
+down_revision = '8b2d4e6f1a37'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for tablename in TABLES:
+            op.execute(f'CREATE INDEX "ix_{tablename}_name_trgm" ON "{tablename}" USING gin (name gin_trgm_ops)')
+    elif dialect == 'sqlite':
+        for tablename in TABLES:
+            index = f'{tablename.lower()}_search'
+            op.execute(f"CREATE VIRTUAL TABLE {index} USING fts5(name, content='{tablename}', content_rowid='id', tokenize='trigram')")
+            op.execute(f'CREATE TRIGGER {index}_ai AFTER INSERT ON "{tablename}" BEGIN '
+                       f"INSERT INTO {index}(rowid, name) VALUES (new.id, new.name); END")
+            op.execute(f'CREATE TRIGGER {index}_ad AFTER DELETE ON "{tablename}" BEGIN '
+                       f"INSERT INTO {index}({index}, rowid, name) VALUES ('delete', old.id, old.name); END")
+            op.execute(f'CREATE TRIGGER {index}_au AFTER UPDATE OF name ON "{tablename}" BEGIN '
+                       f"INSERT INTO {index}({index}, rowid, name) VALUES ('delete', old.id, old.name); "
+                       f"INSERT INTO {index}(rowid, name) VALUES (new.id, new.name); END")
+            # Index the rows that already exist.
+            op.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for tablename in TABLES:
+            op.execute(f'DROP INDEX IF EXISTS "ix_{tablename}_name_trgm"')
+    elif dialect == 'sqlite':
+        for tablename in TABLES:
+            index = f'{tablename.lower()}_search'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {index}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {index}')
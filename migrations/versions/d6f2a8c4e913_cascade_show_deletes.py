@@ -0,0 +1,53 @@
+"""Cascade deletes from Venue and Artist to Show
+
+Revision ID: d6f2a8c4e913
+Revises: b5e3d8a1c7f2
+Create Date: 2026-10-18 18:05:37.214660
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6f2a8c4e913'
+down_revision = 'b5e3d8a1c7f2'
+branch_labels = None
+depends_on = None
+
+
+# (foreign key column, referenced table)
+FOREIGN_KEYS = (
+    ('venue_id', 'Venue'),
+    ('artist_id', 'Artist'),
+)
+
+# Names for SQLite's unnamed constraints, so batch mode can find them.
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _replace_foreign_keys(ondelete):
+    if op.get_bind().dialect.name == 'postgresql':
+        for column, parent in FOREIGN_KEYS:
+            name = f'Show_{column}_fkey'
+            op.execute(f'ALTER TABLE "Show" DROP CONSTRAINT "{name}"')
+            # NOT VALID then VALIDATE: the check of existing rows runs
+            # without blocking writes to Show.
+            op.execute(f'ALTER TABLE "Show" ADD CONSTRAINT "{name}" FOREIGN KEY ({column}) '
+                       f'REFERENCES "{parent}" (id){" ON DELETE " + ondelete if ondelete else ""} NOT VALID')
+            op.execute(f'ALTER TABLE "Show" VALIDATE CONSTRAINT "{name}"')
+    else:
+        # SQLite cannot alter a constraint; batch mode rebuilds Show (it has
+        # no triggers to lose, unlike Venue and Artist).
+        with op.batch_alter_table('Show', recreate='always', naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, parent in FOREIGN_KEYS:
+                name = f'fk_Show_{column}_{parent}'
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, parent, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,39 @@
+"""Add row versioning to Venue, Artist and Show
+
+Revision ID: e81b3c5a9f46
+Revises: 5d9a1f3c7e24
+Create Date: 2026-10-18 14:12:48.663310
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e81b3c5a9f46'
+down_revision = '5d9a1f3c7e24'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    now = datetime.utcnow()
+    for tablename in TABLES:
+        op.add_column(tablename, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        # SQLite cannot add a column with a non-constant default, so
+        # updated_at is added empty and backfilled.
+        op.add_column(tablename, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.get_bind().execute(sa.text(f'UPDATE "{tablename}" SET updated_at = :now'), {"now": now})
+        op.create_index(f'ix_{tablename}_updated_at', tablename, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for tablename in reversed(TABLES):
+        op.drop_index(f'ix_{tablename}_updated_at', table_name=tablename)
+        op.drop_column(tablename, 'updated_at')
+        op.drop_column(tablename, 'version')
@@ -0,0 +1,36 @@
+"""Make Venue.state and Venue.city NOT NULL
+
+Revision ID: f3a7c2d9b5e1
+Revises: d6f2a8c4e913
+Create Date: 2026-10-18 20:14:03.511927
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2d9b5e1'
+down_revision = 'd6f2a8c4e913'
+branch_labels = None
+depends_on = None
+
+
+# (state, city, id) is the /venues keyset; a row-value comparison with a
+# NULL in it is never true, so such venues would drop out of the pages.
+COLUMNS = ('state', 'city')
+
+
+def upgrade():
+    for column in COLUMNS:
+        op.execute(f"""UPDATE "Venue" SET {column} = '' WHERE {column} IS NULL""")
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in COLUMNS:
+            op.alter_column('Venue', column, nullable=False)
+    # SQLite cannot add NOT NULL without rebuilding Venue, which would drop
+    # its full-text search triggers; the model never writes NULL.
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for column in COLUMNS:
+            op.alter_column('Venue', column, nullable=True)
@@ -0,0 +1,132 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+#----------------------------------------------------------------------------#
+# Cursors.
+#----------------------------------------------------------------------------#
+
+# A cursor is the sort key of the row at the edge of a page, serialized as
+# url-safe base64 JSON. Datetimes are tagged so they round-trip as datetimes.
+
+def encode_cursor(values):
+  payload = []
+  for value in values:
+    if isinstance(value, datetime):
+      payload.append({"dt": value.isoformat()})
+    else:
+      payload.append(value)
+  raw = json.dumps(payload, separators=(',', ':')).encode()
+  return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, size=None):
+  """The sort key in a cursor; ValueError for anything encode_cursor would not produce."""
+  try:
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    payload = json.loads(raw)
+    if not isinstance(payload, list) or (size is not None and len(payload) != size):
+      raise ValueError('not a list of the sort key size')
+    return tuple(_decode_value(value) for value in payload)
+  except (ValueError, TypeError):
+    raise ValueError(f'Invalid cursor: {token!r}')
+
+
+def _decode_value(value):
+  if isinstance(value, dict):
+    if set(value) != {'dt'} or not isinstance(value["dt"], str):
+      raise ValueError('not a tagged datetime')
+    return datetime.fromisoformat(value["dt"])
+  # Key columns are never NULL (see queries.VENUE_AREA_KEYS), so neither
+  # are cursor values.
+  if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+    raise ValueError('not a scalar')
+  return value
+
+
+def page_size(value):
+  # Clamp a requested page size into [1, MAX_PAGE_SIZE].
+  if value is None:
+    return DEFAULT_PAGE_SIZE
+  return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+class Page(object):
+  def __init__(self, items, limit, next_cursor=None, prev_cursor=None):
+    self.items = items
+    self.limit = limit
+    self.next_cursor = next_cursor
+    self.prev_cursor = prev_cursor
+
+  def links(self, endpoint, **params):
+    # next/prev URLs for the page, preserving the current query parameters
+    # (filters, format) other than the cursors themselves.
+    for name, values in request.args.lists():
+      if name not in ('after', 'before', 'limit'):
+        params.setdefault(name, values)
+    params['limit'] = self.limit
+    return {
+      "next": url_for(endpoint, after=self.next_cursor, **params) if self.next_cursor else None,
+      "prev": url_for(endpoint, before=self.prev_cursor, **params) if self.prev_cursor else None,
+    }
+
+
+def keyset_paginate(session, stmt, keys, after=None, before=None, limit=None):
+  """Run `stmt` one page at a time, ordered by `keys` (all ascending).
+
+  `keys` must uniquely order the rows (end with a primary key) and should be
+  backed by an index so that every page is a range scan, however deep.
+  `after`/`before` are cursors returned by a previous page.
+  """
+  limit = page_size(limit)
+  key_tuple = tuple_(*keys)
+  stmt = stmt.order_by(None)
+  if before:
+    stmt = stmt.where(key_tuple < decode_cursor(before, len(keys)))
+    stmt = stmt.order_by(*[key.desc() for key in keys])
+  else:
+    if after:
+      stmt = stmt.where(key_tuple > decode_cursor(after, len(keys)))
+    stmt = stmt.order_by(*keys)
+
+  # One extra row tells us whether there is another page in this direction.
+  result = session.execute(stmt.limit(limit + 1))
+  if _selects_entity(stmt):
+    rows = result.scalars().all()
+  else:
+    rows = result.all()
+  has_more = len(rows) > limit
+  rows = rows[:limit]
+  if before:
+    rows.reverse()
+
+  def cursor_for(row):
+    return encode_cursor([getattr(row, key.key) for key in keys])
+
+  next_cursor = prev_cursor = None
+  if rows:
+    if before:
+      next_cursor = cursor_for(rows[-1])
+      prev_cursor = cursor_for(rows[0]) if has_more else None
+    else:
+      next_cursor = cursor_for(rows[-1]) if has_more else None
+      prev_cursor = cursor_for(rows[0]) if after else None
+  return Page(rows, limit, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def _selects_entity(stmt):
+  # select(Model) pages yield model instances; column selects yield rows.
+  descriptions = stmt.column_descriptions
+  return len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity']
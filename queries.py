@@ -0,0 +1,190 @@
+from collections import namedtuple
+from itertools import groupby
+
+from sqlalchemy import func, select
+
+from genres import genre_names_column
+from models import Venue, Artist, Show
+
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+# Sort key for the /venues listing; backed by ix_Venue_state_city_id so each
+# keyset page is an index range scan. Row-value comparison skips NULLs, so
+# state and city are NOT NULL (an unknown one is stored as '').
+VENUE_AREA_KEYS = (Venue.state, Venue.city, Venue.id)
+
+
+def venue_areas_query(filters=()):
+  # One row per venue, already sorted by area so the rows can be grouped in a
+  # single pass. Upcoming show counts come from the maintained counter column.
+  return (
+    select(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.upcoming_shows_count.label('num_upcoming_shows'),
+    )
+    .where(*filters)
+    .order_by(*VENUE_AREA_KEYS)
+  )
+
+
+def group_venue_areas(rows):
+  # rows must be ordered by (state, city), as venue_areas_query returns them.
+  areas = []
+  for (state, city), area_rows in groupby(rows, key=lambda row: (row.state, row.city)):
+    areas.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": row.id,
+        "name": row.name,
+        "num_upcoming_shows": row.num_upcoming_shows,
+      } for row in area_rows],
+    })
+  return areas
+
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+# Sort key for /shows; a range of ix_Show_start_time, so a page costs the
+# same however much history the table holds.
+SHOW_KEYS = (Show.start_time, Show.id)
+
+
+def show_window(start, end):
+  """Conditions for shows starting in [start, end)."""
+  return [Show.start_time >= start, Show.start_time < end]
+
+
+def shows_query(start, end):
+  # Just the columns a show tile displays, with its artist and venue.
+  return (
+    select(
+      Show.id,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'),
+    )
+    .join(Artist, Artist.id == Show.artist_id)
+    .join(Venue, Venue.id == Show.venue_id)
+    .where(*show_window(start, end))
+    .order_by(*SHOW_KEYS)
+  )
+
+
+#----------------------------------------------------------------------------#
+# Detail pages.
+#----------------------------------------------------------------------------#
+
+# show_venue and show_artist are served by two column projections: the row
+# with its genres and past/upcoming show counts, then its shows with the
+# other side's name and image. No ORM objects are built, so nothing is lazy
+# loaded per show, and both the counts and the past/upcoming split come
+# from SQL. The counts and the shows are range scans of
+# ix_Show_venue_id_start_time / ix_Show_artist_id_start_time.
+
+DETAIL_COLUMNS = {
+  Venue: ('id', 'name', 'address', 'city', 'state', 'phone', 'website', 'facebook_link',
+          'seeking_talent', 'seeking_description', 'image_link'),
+  Artist: ('id', 'name', 'city', 'state', 'phone', 'website', 'facebook_link',
+           'seeking_venue', 'seeking_description', 'image_link'),
+}
+
+
+DetailValidators = namedtuple('DetailValidators', 'version updated_at')
+
+
+def _show_keys(model):
+  # (Show column pointing at `model`, the other side, Show column pointing at it)
+  if model is Venue:
+    return Show.venue_id, Artist, Show.artist_id
+  return Show.artist_id, Venue, Show.venue_id
+
+
+def detail_query(model, entity_id, now):
+  """The row's DETAIL_COLUMNS, genres and show counts either side of `now`."""
+  parent_key = _show_keys(model)[0]
+
+  def count(*where):
+    return select(func.count(Show.id)).where(parent_key == model.id, *where).scalar_subquery()
+
+  return (
+    select(
+      *(getattr(model, name) for name in DETAIL_COLUMNS[model]),
+      genre_names_column(model).label('genres'),
+      # Split as counters.py splits the denormalized counts: a show
+      # starting exactly at `now` is past.
+      count(Show.start_time <= now).label('past_shows_count'),
+      count(Show.start_time > now).label('upcoming_shows_count'),
+    )
+    .where(model.id == entity_id)
+  )
+
+
+def detail_shows_query(model, entity_id, now):
+  """The row's shows in start_time order, flagged upcoming, with the other side's name and image."""
+  parent_key, other, other_key = _show_keys(model)
+  prefix = other.__name__.lower()
+  return (
+    select(
+      other.id.label(f'{prefix}_id'),
+      other.name.label(f'{prefix}_name'),
+      other.image_link.label(f'{prefix}_image_link'),
+      Show.start_time,
+      (Show.start_time > now).label('upcoming'),
+    )
+    .join(other, other.id == other_key)
+    .where(parent_key == entity_id)
+    .order_by(Show.start_time, Show.id)
+  )
+
+
+def detail_validators(session, model, entity_id):
+  """(version, updated_at) of the venue or artist page, or None if there is no such row.
+
+  The page shows the other side's names and images, so an edit to any of
+  the rows its shows link to must change them too: the version is the
+  row's own plus the sum of the linked rows' versions, and updated_at the
+  newest of them all.
+  """
+  parent_key, other, other_key = _show_keys(model)
+
+  def linked(column):
+    return (select(column).select_from(Show).join(other, other.id == other_key)
+            .where(parent_key == model.id).scalar_subquery())
+
+  row = session.execute(
+    select(model.version, model.updated_at,
+           linked(func.coalesce(func.sum(other.version), 0)), linked(func.max(other.updated_at)))
+    .where(model.id == entity_id)
+  ).first()
+  if row is None:
+    return None
+  version, updated_at, linked_version, linked_updated_at = row
+  return DetailValidators(f'{version}.{linked_version}',
+                          max((value for value in (updated_at, linked_updated_at) if value), default=None))
+
+
+def detail_page(session, model, entity_id, now):
+  """Template data for the venue or artist page, or None if there is no such row."""
+  row = session.execute(detail_query(model, entity_id, now)).first()
+  if row is None:
+    return None
+  data = row._asdict()
+  data['genres'] = sorted(data['genres'].split(',')) if data['genres'] else []
+  data['past_shows'], data['upcoming_shows'] = [], []
+  for show in session.execute(detail_shows_query(model, entity_id, now)):
+    show = show._asdict()
+    key = 'upcoming_shows' if show.pop('upcoming') else 'past_shows'
+    data[key].append(show)
+  return data
@@ -0,0 +1,106 @@
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_DURATION
+from queries import venue_areas_query, detail_query, detail_shows_query, shows_query
+from genres import genre_filter
+from booking import overlap_query
+from availability import available_venues_query
+
+
+# Tables that must never be read with a full sequential scan by a hot query.
+GUARDED_TABLES = ('Show', 'venue_genres', 'artist_genres')
+
+
+#----------------------------------------------------------------------------#
+# Hot queries.
+#----------------------------------------------------------------------------#
+
+# The statements behind the busiest pages, with representative parameters.
+# Keep these in step with the routes in app.py.
+
+def hot_queries():
+  now = datetime.now()
+  return {
+    "venues listing": venue_areas_query().limit(50),
+    "venues by genre and state": (
+      venue_areas_query([Venue.state == 'CA', genre_filter(Venue, ['Jazz'])]).limit(50)
+    ),
+    "artists by genre": (
+      select(Artist.id, Artist.name)
+      .where(genre_filter(Artist, ['Jazz']))
+      .order_by(Artist.id)
+      .limit(50)
+    ),
+    "venue detail": detail_query(Venue, 1, now),
+    "venue detail shows": detail_shows_query(Venue, 1, now),
+    "artist detail": detail_query(Artist, 1, now),
+    "artist detail shows": detail_shows_query(Artist, 1, now),
+    "shows listing": shows_query(now, now + timedelta(days=30)).limit(50),
+    "venue booking overlap": overlap_query(Show.venue_id, 1, now, now + DEFAULT_SHOW_DURATION),
+    "artist booking overlap": overlap_query(Show.artist_id, 1, now, now + DEFAULT_SHOW_DURATION),
+    "venue availability": (
+      available_venues_query(now, now + DEFAULT_SHOW_DURATION, genres=['Jazz'], state='CA').limit(50)
+    ),
+  }
+
+
+#----------------------------------------------------------------------------#
+# EXPLAIN.
+#----------------------------------------------------------------------------#
+
+def explain(connection, stmt):
+  """Return (plan lines, sequentially scanned tables) for `stmt`."""
+  dialect = connection.dialect
+  compiled = stmt.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+  if dialect.name == 'postgresql':
+    # Tiny tables make seq scans the cheapest plan even when an index exists,
+    # so disable them: if one still shows up, no usable index exists.
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    rows = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params).all()
+    plan = rows[0][0][0]['Plan']
+    lines, scanned = [], []
+    _walk_postgres_plan(plan, lines, scanned)
+    return lines, scanned
+  if dialect.name == 'sqlite':
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    lines = [row[3] for row in rows]
+    scanned = []
+    for line in lines:
+      # "SCAN Show" is a table scan; "SCAN Show USING INDEX ..." is an
+      # ordered index walk, which is what a LIMITed listing wants. An
+      # AUTOMATIC index is one SQLite builds per query by scanning the table.
+      match = (re.match(r'SCAN (\w+)(?: AS \w+)?$', line)
+               or re.match(r'SEARCH (\w+) USING AUTOMATIC', line))
+      if match:
+        scanned.append(match.group(1))
+    return lines, scanned
+  raise NotImplementedError(f'No query plan support for {dialect.name}')
+
+
+def _walk_postgres_plan(node, lines, scanned, depth=0):
+  relation = node.get('Relation Name')
+  lines.append('  ' * depth + node['Node Type'] + (f' on {relation}' if relation else ''))
+  if node['Node Type'] == 'Seq Scan':
+    scanned.append(relation)
+  for child in node.get('Plans', []):
+    _walk_postgres_plan(child, lines, scanned, depth + 1)
+
+
+def check_query_plans(engine=None):
+  """EXPLAIN every hot query; return {name: (plan lines, offending tables)}."""
+  engine = engine or db.engine
+  results = {}
+  with engine.connect() as connection:
+    for name, stmt in hot_queries().items():
+      transaction = connection.begin()
+      try:
+        lines, scanned = explain(connection, stmt)
+      finally:
+        transaction.rollback()
+      offending = [table for table in scanned if table in GUARDED_TABLES]
+      results[name] = (lines, offending)
+  return results
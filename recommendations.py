@@ -0,0 +1,288 @@
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, select
+
+from genres import genre_names_column
+from models import Venue, Artist, Show
+
+
+# Artists looking for venues (seeking_venue) and venues looking for talent
+# (seeking_talent) are matched from an in-memory index rather than by
+# querying per request:
+#
+# - each venue and artist is a Profile whose genres are an int bitmask, so
+#   genre overlap is one AND and a popcount;
+# - inverted indexes (genre bit, state, city -> seeking ids) and the show
+#   history narrow the candidates to the ones that can score above zero,
+#   and genre overlap for all of them is counted in one pass per genre;
+# - the index is built on first use and then kept current incrementally:
+#   at most every RECOMMENDATION_REFRESH_SECONDS it re-reads only the rows
+#   whose updated_at moved (edits, genre changes and new shows all bump
+#   it), and the venue/artist pairs of recently changed shows. Deletions
+#   are dropped when a recommended id no longer exists, and the periodic
+#   full rebuild catches anything else.
+
+GENRE_WEIGHT = 3.0
+SAME_CITY_WEIGHT = 2.0
+SAME_STATE_WEIGHT = 1.0
+HISTORY_WEIGHT = 1.5
+# Shows together beyond this add nothing more to the history score.
+HISTORY_CAP = 4
+# Rows committed by slower transactions can carry an updated_at a little
+# older than the last refresh; re-read that far back to catch them.
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+Profile = namedtuple('Profile', 'genres state city seeking')
+Recommendation = namedtuple('Recommendation', 'id score shared_genres same_city same_state shows_together')
+
+
+class Side(object):
+  """Profiles of one kind (venues or artists) plus indexes over the seeking ones."""
+
+  def __init__(self):
+    self.profiles = {}
+    self.seeking = set()
+    self.by_genre = defaultdict(set)
+    self.by_state = defaultdict(set)
+    self.by_city = defaultdict(set)
+
+  def put(self, entity_id, profile):
+    self.remove(entity_id)
+    self.profiles[entity_id] = profile
+    if not profile.seeking:
+      return
+    self.seeking.add(entity_id)
+    for bit in bits(profile.genres):
+      self.by_genre[bit].add(entity_id)
+    if profile.state:
+      self.by_state[profile.state].add(entity_id)
+      self.by_city[(profile.state, profile.city)].add(entity_id)
+
+  def remove(self, entity_id):
+    profile = self.profiles.pop(entity_id, None)
+    if profile is None or not profile.seeking:
+      return
+    self.seeking.discard(entity_id)
+    for bit in bits(profile.genres):
+      self.by_genre[bit].discard(entity_id)
+    self.by_state.get(profile.state, set()).discard(entity_id)
+    self.by_city.get((profile.state, profile.city), set()).discard(entity_id)
+
+
+def bits(mask):
+  """Indexes of the set bits in `mask`."""
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
+
+
+class RecommendationIndex(object):
+  """Scores seeking artists for a venue and seeking venues for an artist."""
+
+  def __init__(self, refresh_seconds=1.0, rebuild_seconds=3600, clock=time.monotonic):
+    self.refresh_seconds = refresh_seconds
+    self.rebuild_seconds = rebuild_seconds
+    self.clock = clock
+    self.genre_bits = {}
+    self.venues = Side()
+    self.artists = Side()
+    # venue id -> Counter(artist id -> shows together), and the reverse.
+    self.venue_history = defaultdict(Counter)
+    self.artist_history = defaultdict(Counter)
+    self.watermark = None
+    self._built_at = 0
+    self._refreshed_at = 0
+    self._lock = threading.RLock()
+
+  #--------------------------------------------------------------------------#
+  # Profiles.
+  #--------------------------------------------------------------------------#
+
+  def genre_mask(self, names):
+    mask = 0
+    for name in names:
+      bit = self.genre_bits.setdefault(name, len(self.genre_bits))
+      mask |= 1 << bit
+    return mask
+
+  def genre_names(self, mask):
+    with self._lock:
+      names = {bit: name for name, bit in self.genre_bits.items()}
+    return [names[bit] for bit in bits(mask)]
+
+  def put_venue(self, venue_id, genres, state, city, seeking):
+    with self._lock:
+      self.venues.put(venue_id, Profile(self.genre_mask(genres), state, city, bool(seeking)))
+
+  def put_artist(self, artist_id, genres, state, city, seeking):
+    with self._lock:
+      self.artists.put(artist_id, Profile(self.genre_mask(genres), state, city, bool(seeking)))
+
+  def set_shows_together(self, venue_id, artist_id, count):
+    with self._lock:
+      if count:
+        self.venue_history[venue_id][artist_id] = count
+        self.artist_history[artist_id][venue_id] = count
+      else:
+        self.venue_history[venue_id].pop(artist_id, None)
+        self.artist_history[artist_id].pop(venue_id, None)
+
+  def forget(self, venue_ids=(), artist_ids=()):
+    with self._lock:
+      for venue_id in venue_ids:
+        self.venues.remove(venue_id)
+      for artist_id in artist_ids:
+        self.artists.remove(artist_id)
+
+  #--------------------------------------------------------------------------#
+  # Loading.
+  #--------------------------------------------------------------------------#
+
+  def refresh(self, session, force=False):
+    """Build the index, or apply what changed since the last refresh.
+
+    Cheap when nothing is due: no queries run until refresh_seconds have
+    passed since the last one. The queries run without the lock held and
+    the results are swapped in under it, so requests keep being served from
+    the current index meanwhile; with the asyncio engine (aio.py) the
+    queries yield to other requests on the same thread, which the lock
+    could not keep out.
+    """
+    now = self.clock()
+    with self._lock:
+      rebuild = self.watermark is None or now - self._built_at >= self.rebuild_seconds
+      if not rebuild and not force and now - self._refreshed_at < self.refresh_seconds:
+        return
+      # Claim the refresh so concurrent requests carry on with the index
+      # as it is (a first build cannot be shared: they all need it).
+      if self.watermark is not None:
+        self._refreshed_at = now
+        if rebuild:
+          self._built_at = now
+      since = None if rebuild else self.watermark - REFRESH_OVERLAP
+
+    started = datetime.utcnow()
+    venues = self._read_profiles(session, Venue, since)
+    artists = self._read_profiles(session, Artist, since)
+    pairs = self._read_pairs(session, since)
+
+    with self._lock:
+      if rebuild:
+        self.venues, self.artists = Side(), Side()
+        self.venue_history.clear()
+        self.artist_history.clear()
+      for venue_id, genres, state, city, seeking in venues:
+        self.put_venue(venue_id, genres, state, city, seeking)
+      for artist_id, genres, state, city, seeking in artists:
+        self.put_artist(artist_id, genres, state, city, seeking)
+      for venue_id, artist_id, count in pairs:
+        self.set_shows_together(venue_id, artist_id, count)
+      self.watermark = max(started, self.watermark or started)
+      self._refreshed_at = now
+      if rebuild:
+        self._built_at = now
+
+  def _read_profiles(self, session, model, since=None):
+    seeking = Venue.seeking_talent if model is Venue else Artist.seeking_venue
+    stmt = select(model.id, genre_names_column(model).label('genres'), model.state, model.city, seeking)
+    if since is not None:
+      stmt = stmt.where(model.updated_at > since)
+    return [(entity_id, genres.split(',') if genres else [], state, city, is_seeking)
+            for entity_id, genres, state, city, is_seeking in session.execute(stmt)]
+
+  def _read_pairs(self, session, since=None):
+    """(venue id, artist id, shows together) for every pair, or those with shows changed since."""
+    if since is None:
+      return session.execute(
+        select(Show.venue_id, Show.artist_id, func.count())
+        .group_by(Show.venue_id, Show.artist_id)
+      ).all()
+    # Recount every pair with a recently changed show.
+    changed = (
+      select(Show.venue_id, Show.artist_id)
+      .where(Show.updated_at > since)
+      .distinct()
+      .subquery()
+    )
+    return session.execute(
+      select(changed.c.venue_id, changed.c.artist_id, func.count(Show.id))
+      .outerjoin(Show, and_(Show.venue_id == changed.c.venue_id, Show.artist_id == changed.c.artist_id))
+      .group_by(changed.c.venue_id, changed.c.artist_id)
+    ).all()
+
+  #--------------------------------------------------------------------------#
+  # Scoring.
+  #--------------------------------------------------------------------------#
+
+  def venues_for_artist(self, artist_id, limit=10):
+    """Best seeking venues for the artist, or None if the artist is unknown."""
+    with self._lock:
+      return self._recommend(self.artists.profiles.get(artist_id), self.venues,
+                             self.artist_history.get(artist_id, {}), limit)
+
+  def artists_for_venue(self, venue_id, limit=10):
+    """Best seeking artists for the venue, or None if the venue is unknown."""
+    with self._lock:
+      return self._recommend(self.venues.profiles.get(venue_id), self.artists,
+                             self.venue_history.get(venue_id, {}), limit)
+
+  def _recommend(self, subject, side, history, limit):
+    if subject is None:
+      return None
+    # Count genre hits per candidate with Counter.update, which loops in C;
+    # every indexed id is seeking, the history needs filtering.
+    genre_hits = Counter()
+    for bit in bits(subject.genres):
+      genre_hits.update(side.by_genre.get(bit, ()))
+    in_state = side.by_state.get(subject.state, set())
+    in_city = side.by_city.get((subject.state, subject.city), set())
+    history = {candidate_id: count for candidate_id, count in history.items()
+               if candidate_id in side.seeking}
+    genre_count = subject.genres.bit_count()
+
+    def rank(candidate_id):
+      location = 'city' if candidate_id in in_city else 'state' if candidate_id in in_state else None
+      return (total_score(genre_hits[candidate_id], genre_count, location, history.get(candidate_id, 0)),
+              -candidate_id)
+
+    best = heapq.nlargest(limit, genre_hits.keys() | in_state | history.keys(), key=rank)
+    return [self.score(subject, candidate_id, side.profiles[candidate_id], history)
+            for candidate_id in best]
+
+  def score(self, subject, candidate_id, candidate, history):
+    """The Recommendation of `candidate` for `subject`, or None if it is not seeking."""
+    if candidate is None or not candidate.seeking:
+      return None
+    shared = subject.genres & candidate.genres
+    same_state = bool(subject.state) and subject.state == candidate.state
+    same_city = same_state and bool(subject.city) and subject.city == candidate.city
+    location = 'city' if same_city else 'state' if same_state else None
+    shows_together = history.get(candidate_id, 0)
+    score = total_score(shared.bit_count(), subject.genres.bit_count(), location, shows_together)
+    return Recommendation(candidate_id, score, shared, same_city, same_state, shows_together)
+
+
+def total_score(shared_genres, genre_count, location, shows_together):
+  score = GENRE_WEIGHT * shared_genres / genre_count if genre_count else 0.0
+  if location == 'city':
+    score += SAME_CITY_WEIGHT
+  elif location == 'state':
+    score += SAME_STATE_WEIGHT
+  score += HISTORY_WEIGHT * min(shows_together, HISTORY_CAP) / HISTORY_CAP
+  return round(score, 3)
+
+
+def recommendation_index(app):
+  """The app's index, created on first use."""
+  index = app.extensions.get('recommendations')
+  if index is None:
+    index = app.extensions.setdefault('recommendations', RecommendationIndex(
+      refresh_seconds=app.config.get('RECOMMENDATION_REFRESH_SECONDS', 1),
+      rebuild_seconds=app.config.get('RECOMMENDATION_REBUILD_SECONDS', 3600),
+    ))
+  return index
@@ -0,0 +1,138 @@
+import itertools
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import Select
+
+
+# Read-only requests (GET/HEAD) run their SELECTs on a replica, chosen
+# round-robin among the healthy ones; everything else, and any request from
+# a client that wrote within the last REPLICA_STICKY_SECONDS, uses the
+# primary. Replicas are configured as SQLALCHEMY_BINDS named replica_0,
+# replica_1, ... (see DATABASE_REPLICA_URLS in config.py).
+
+REPLICA_BIND_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaSet(object):
+  """Round-robin over replica engines, skipping ones that recently failed."""
+
+  def __init__(self, engines, cooldown=30, clock=time.monotonic):
+    self.engines = list(engines)
+    self.cooldown = cooldown
+    self.clock = clock
+    self._down_until = {}
+    self._cycle = itertools.cycle(self.engines)
+    self._lock = threading.Lock()
+
+  def choose(self):
+    """A healthy replica engine, or None to fall back to the primary."""
+    with self._lock:
+      now = self.clock()
+      for _ in range(len(self.engines)):
+        engine = next(self._cycle)
+        if self._down_until.get(engine, 0) <= now:
+          return engine
+    return None
+
+  def mark_down(self, engine):
+    with self._lock:
+      self._down_until[engine] = self.clock() + self.cooldown
+
+  def is_down(self, engine):
+    with self._lock:
+      return self._down_until.get(engine, 0) > self.clock()
+
+
+class RoutingSession(Session):
+  """Flask-SQLAlchemy session that sends read-only statements to a replica.
+
+  The replica is picked once per session, so a page's queries all see the
+  same snapshot of one replica. Flushes, INSERT/UPDATE/DELETE and SELECT
+  ... FOR UPDATE always go to the primary.
+  """
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and not self._flushing and self._reads_from_replica(clause):
+      engine = self.info.get('replica')
+      if engine is None:
+        engine = self.info['replica'] = choose_replica() or False
+      if engine:
+        return engine
+    return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+  @staticmethod
+  def _reads_from_replica(clause):
+    if not (has_request_context() and g.get('use_replica')):
+      return False
+    if clause is None:
+      return True
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+def choose_replica():
+  """A replica that accepts a connection, or None if none is healthy.
+
+  Checking out a connection first (pre-pinged, if the pool does that) moves
+  a dead replica out of rotation before a request is routed to it.
+  """
+  replicas = current_app.extensions.get('replicas')
+  while replicas:
+    engine = replicas.choose()
+    if engine is None:
+      return None
+    try:
+      engine.connect().close()
+      return engine
+    except DBAPIError:
+      replicas.mark_down(engine)
+  return None
+
+
+def read_engine(db):
+  """Engine for a read outside the session (e.g. streamed API responses)."""
+  if has_request_context() and g.get('use_replica'):
+    engine = choose_replica()
+    if engine is not None:
+      return engine
+  return db.engine
+
+
+def configure_replicas(app, db):
+  with app.app_context():
+    engines = [engine for bind, engine in sorted(db.engines.items(), key=lambda item: str(item[0]))
+               if bind and bind.startswith(REPLICA_BIND_PREFIX)]
+  if not engines:
+    return
+  replicas = ReplicaSet(engines, cooldown=app.config.get('REPLICA_COOLDOWN_SECONDS', 30))
+  app.extensions['replicas'] = replicas
+  sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+  for engine in engines:
+    @event.listens_for(engine, 'handle_error')
+    def replica_failed(context, engine=engine):
+      # Connection failures, not SQL errors, take a replica out of rotation;
+      # this catches replicas that go away in the middle of a request.
+      if context.is_disconnect or context.connection is None:
+        replicas.mark_down(engine)
+        app.logger.warning('replica %s marked down for %ss: %s', engine.url, replicas.cooldown,
+                           context.original_exception)
+
+  @app.before_request
+  def route_reads():
+    # Read-your-writes: after a write this client reads from the primary
+    # until replicas have had time to catch up.
+    g.use_replica = (request.method in SAFE_METHODS
+                     and session.get('_primary_until', 0) <= time.time())
+
+  @app.after_request
+  def stick_to_primary(response):
+    if request.method not in SAFE_METHODS and response.status_code < 500:
+      session['_primary_until'] = time.time() + sticky_seconds
+    response.headers['X-Database-Role'] = 'replica' if g.get('use_replica') else 'primary'
+    return response
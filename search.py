@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+
+from sqlalchemy import DDL, column, event, func, literal_column, select, table
+
+from models import Venue, Artist
+
+
+DEFAULT_RESULT_LIMIT = 50
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+# A backend turns a search term into a subquery of matching (id, rank) pairs,
+# best match first (lowest rank). SearchBackend.search joins that subquery
+# back to the model for the name and upcoming show counter, so a search is
+# one round trip whichever backend is in use.
+
+class SearchBackend(ABC):
+  name = None
+
+  def __init__(self, limit=DEFAULT_RESULT_LIMIT):
+    self.limit = limit
+
+  @abstractmethod
+  def matches(self, model, term, limit, filters=()):
+    """Select (id, rank) of the `model` rows matching `term`, best first."""
+
+  def search(self, session, model, term, limit=None, filters=()):
+    # `filters` are extra WHERE clauses on `model` (genre, state...), applied
+    # before the limit so they narrow rather than truncate the results.
+    limit = limit or self.limit
+    matches = self.matches(model, term.strip(), limit, filters).subquery()
+    stmt = (
+      select(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+      )
+      .join(matches, matches.c.id == model.id)
+      .order_by(matches.c.rank, model.id)
+    )
+    return session.execute(stmt).all()
+
+
+class LikeSearchBackend(SearchBackend):
+  """Portable case-insensitive substring match; scans the table."""
+  name = 'like'
+
+  def matches(self, model, term, limit, filters=()):
+    return (
+      select(model.id.label('id'), model.name.label('rank'))
+      .where(model.name.ilike(like_pattern(term), escape='\\'), *filters)
+      .order_by(model.name)
+      .limit(limit)
+    )
+
+
+class TrigramSearchBackend(SearchBackend):
+  """Postgres pg_trgm: ILIKE served by a GIN trigram index, ranked by similarity."""
+  name = 'trigram'
+
+  def matches(self, model, term, limit, filters=()):
+    rank = -func.similarity(model.name, term)
+    return (
+      select(model.id.label('id'), rank.label('rank'))
+      .where(model.name.ilike(like_pattern(term), escape='\\'), *filters)
+      .order_by(rank)
+      .limit(limit)
+    )
+
+
+class Fts5SearchBackend(SearchBackend):
+  """SQLite FTS5 trigram index, ranked by bm25.
+
+  The trigram tokenizer can only match terms of three or more characters,
+  so shorter terms fall back to a LIKE scan.
+  """
+  name = 'fts5'
+  min_term_length = 3
+
+  def __init__(self, limit=DEFAULT_RESULT_LIMIT):
+    super().__init__(limit)
+    self.fallback = LikeSearchBackend(limit)
+
+  def matches(self, model, term, limit, filters=()):
+    if len(term) < self.min_term_length:
+      return self.fallback.matches(model, term, limit, filters)
+    index = search_table(model)
+    phrase = '"' + term.replace('"', '""') + '"'
+    stmt = select(index.c.rowid.label('id'), index.c.rank.label('rank'))
+    if filters:
+      stmt = stmt.join(model, model.id == index.c.rowid).where(*filters)
+    return (
+      stmt
+      .where(literal_column(index.name).op('MATCH')(phrase))
+      .order_by(index.c.rank)
+      .limit(limit)
+    )
+
+
+BACKENDS = {
+  backend.name: backend
+  for backend in (LikeSearchBackend, TrigramSearchBackend, Fts5SearchBackend)
+}
+
+DIALECT_BACKENDS = {
+  'postgresql': 'trigram',
+  'sqlite': 'fts5',
+}
+
+
+def get_search_backend(engine, name=None, limit=DEFAULT_RESULT_LIMIT):
+  # An explicit name wins; otherwise pick the indexed backend for the dialect.
+  name = name or DIALECT_BACKENDS.get(engine.dialect.name, 'like')
+  if name not in BACKENDS:
+    raise ValueError(f'Unknown search backend: {name!r}')
+  return BACKENDS[name](limit)
+
+
+def like_pattern(term):
+  escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+  return f'%{escaped}%'
+
+
+#----------------------------------------------------------------------------#
+# Schema.
+#----------------------------------------------------------------------------#
+
+# The indexes live outside the ORM models because they are dialect specific.
+# Migrations create them for real databases; these listeners cover
+# db.create_all() (local SQLite files, benchmarks). Keep both in step.
+
+def search_table(model):
+  return table(f'{model.__tablename__.lower()}_search', column('rowid'), column('rank'))
+
+
+def sqlite_search_ddl(tablename):
+  index = f'{tablename.lower()}_search'
+  return [
+    f"CREATE VIRTUAL TABLE {index} USING fts5(name, content='{tablename}', content_rowid='id', tokenize='trigram')",
+    f'CREATE TRIGGER {index}_ai AFTER INSERT ON "{tablename}" BEGIN '
+    f"INSERT INTO {index}(rowid, name) VALUES (new.id, new.name); END",
+    f'CREATE TRIGGER {index}_ad AFTER DELETE ON "{tablename}" BEGIN '
+    f"INSERT INTO {index}({index}, rowid, name) VALUES ('delete', old.id, old.name); END",
+    f'CREATE TRIGGER {index}_au AFTER UPDATE OF name ON "{tablename}" BEGIN '
+    f"INSERT INTO {index}({index}, rowid, name) VALUES ('delete', old.id, old.name); "
+    f"INSERT INTO {index}(rowid, name) VALUES (new.id, new.name); END",
+  ]
+
+
+def postgresql_search_ddl(tablename):
+  return [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX "ix_{tablename}_name_trgm" ON "{tablename}" USING gin (name gin_trgm_ops)',
+  ]
+
+
+for _model in (Venue, Artist):
+  for _statement in sqlite_search_ddl(_model.__tablename__):
+    event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+  for _statement in postgresql_search_ddl(_model.__tablename__):
+    event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
@@ -2,3 +2,35 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Typeahead for the navbar search boxes: fills each box's <datalist> from
+// /api/suggest as the user types.
+document.querySelectorAll('input[data-suggest]').forEach(function (input) {
+  var list = document.getElementById(input.getAttribute('list'));
+  var timer = null;
+  var requested = '';
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var term = input.value.trim();
+      if (!term || term === requested) {
+        return;
+      }
+      requested = term;
+      fetch('/api/suggest?limit=8&type=' + input.dataset.suggest + '&q=' + encodeURIComponent(term))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          // A slower, older response must not replace newer suggestions.
+          if (input.value.trim() !== term) {
+            return;
+          }
+          list.innerHTML = '';
+          data.suggestions.forEach(function (suggestion) {
+            var option = document.createElement('option');
+            option.value = suggestion.name;
+            list.appendChild(option);
+          });
+        });
+    }, 100);
+  });
+});
@@ -0,0 +1,302 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models import Venue, Artist
+
+
+# Typeahead for venue and artist names (/api/suggest), answered from memory
+# instead of a LIKE scan per keystroke:
+#
+# - names are normalized (accents stripped, case folded, punctuation turned
+#   into spaces) and kept as a sorted array of (key, id) per kind. A prefix
+#   is a bisect to its first key, and its matches are the run that follows.
+#   Each name is indexed from its start and from each of its next few
+#   words, so "hop" finds "The Musical Hop";
+# - matches are ranked by upcoming show count. A short prefix can match
+#   most of the table, so prefixes matching more than SCAN_LIMIT keys keep
+#   their best MAX_SUGGESTIONS, adjusted in place as names and counts change;
+# - memory is bounded per name, however long: at most MAX_WORDS keys of at
+#   most MAX_KEY_LENGTH characters. Ranked lists are only kept for prefixes
+#   covering more than SCAN_LIMIT keys, of which there are few.
+#
+# The write routes update their own worker's index as they commit. Every
+# worker also picks up rows whose updated_at moved (edits, counter changes
+# from other workers or bulk loads) at most every SUGGEST_REFRESH_SECONDS,
+# and drops deleted rows when its row counts stop matching the tables.
+
+MAX_SUGGESTIONS = 20
+MAX_KEY_LENGTH = 32
+MAX_WORDS = 4
+SCAN_LIMIT = 256
+# Prefixes up to this long are ranked when the index is built, so the
+# first keystrokes never pay for a scan.
+WARM_PREFIX_LENGTH = 3
+# Same allowance as the recommendation index for slow transactions.
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+Entry = namedtuple('Entry', 'name upcoming keys rank')
+Suggestion = namedtuple('Suggestion', 'model id name upcoming')
+
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+  """Lower case, accents stripped, runs of anything but letters and digits as one space."""
+  text = text or ''
+  if not text.isascii():
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+  return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+def name_keys(name):
+  """The keys `name` is found under: from its start and from each of its next words."""
+  return _keys(normalize(name))
+
+
+def _keys(normalized):
+  words = normalized.split(' ')
+  keys = []
+  for start in range(min(len(words), MAX_WORDS)):
+    key = ' '.join(words[start:])[:MAX_KEY_LENGTH]
+    if key and key not in keys:
+      keys.append(key)
+  return tuple(keys)
+
+
+def _prefixes(keys):
+  return {key[:length] for key in keys for length in range(1, len(key) + 1)}
+
+
+class PrefixIndex(object):
+  """Names of one kind, found by prefix and ranked by upcoming show count."""
+
+  def __init__(self):
+    self.entries = {}
+    self.keys = []
+    # prefix -> ranks of its best MAX_SUGGESTIONS, for prefixes matching
+    # more than SCAN_LIMIT keys.
+    self.top = {}
+
+  def __len__(self):
+    return len(self.entries)
+
+  @classmethod
+  def build(cls, rows):
+    """An index of (id, name, upcoming) rows, sorted once rather than insert by insert."""
+    index = cls()
+    for entity_id, name, upcoming in rows:
+      index.entries[entity_id] = entry = _entry(entity_id, name, upcoming)
+      index.keys.extend((key, entity_id) for key in entry.keys)
+    index.keys.sort()
+    for prefix in {key[:length] for key, _ in index.keys for length in range(1, WARM_PREFIX_LENGTH + 1)}:
+      index.search(prefix, MAX_SUGGESTIONS)
+    return index
+
+  def put(self, entity_id, name, upcoming):
+    old = self.entries.get(entity_id)
+    if old is not None and old.name == name and old.upcoming == upcoming:
+      # Refreshes re-read recently updated rows; most have not changed.
+      return
+    new = _entry(entity_id, name, upcoming)
+    if old is None or old.keys != new.keys:
+      if old is not None:
+        self._remove_keys(entity_id, old.keys)
+      for key in new.keys:
+        bisect.insort(self.keys, (key, entity_id))
+    self.entries[entity_id] = new
+    self._rerank(old, new)
+
+  def adjust(self, entity_id, delta):
+    entry = self.entries.get(entity_id)
+    if entry is not None:
+      self.put(entity_id, entry.name, max(0, entry.upcoming + delta))
+
+  def remove(self, entity_id):
+    old = self.entries.pop(entity_id, None)
+    if old is not None:
+      self._remove_keys(entity_id, old.keys)
+      self._rerank(old, None)
+
+  def _remove_keys(self, entity_id, keys):
+    for key in keys:
+      position = bisect.bisect_left(self.keys, (key, entity_id))
+      del self.keys[position]
+
+  def _rerank(self, old, new):
+    # Patch the ranked lists of the prefixes the change touches. A list
+    # that loses an entry it cannot refill is dropped and recomputed on
+    # its next use.
+    for prefix in _prefixes(old.keys if old else ()) | _prefixes(new.keys if new else ()):
+      top = self.top.get(prefix)
+      if top is None:
+        continue
+      matches = new is not None and any(key.startswith(prefix) for key in new.keys)
+      if old is not None and old.rank in top:
+        last = top[-1]
+        top.remove(old.rank)
+        if matches and new.rank <= last:
+          bisect.insort(top, new.rank)
+        else:
+          del self.top[prefix]
+      elif matches and (len(top) < MAX_SUGGESTIONS or new.rank < top[-1]):
+        bisect.insort(top, new.rank)
+        del top[MAX_SUGGESTIONS:]
+
+  def search(self, prefix, limit):
+    """[(id, Entry)] of the best `limit` names with a key starting with `prefix`."""
+    start = bisect.bisect_left(self.keys, (prefix,))
+    end = bisect.bisect_left(self.keys, (prefix + '\U0010ffff',))
+    if end - start > SCAN_LIMIT:
+      top = self.top.get(prefix)
+      if top is None:
+        top = self.top[prefix] = self._best(start, end, MAX_SUGGESTIONS)
+      ranks = top[:limit]
+    else:
+      ranks = self._best(start, end, limit)
+    return [(rank[-1], self.entries[rank[-1]]) for rank in ranks]
+
+  def _best(self, start, end, limit):
+    ids = {entity_id for _, entity_id in self.keys[start:end]}
+    return heapq.nsmallest(limit, (self.entries[entity_id].rank for entity_id in ids))
+
+
+def _entry(entity_id, name, upcoming):
+  # Most upcoming shows first, then alphabetical.
+  normalized = normalize(name)
+  return Entry(name, upcoming, _keys(normalized), (-upcoming, normalized, entity_id))
+
+
+class SuggestIndex(object):
+  """Prefix indexes over venue and artist names, kept current from the database."""
+
+  def __init__(self, refresh_seconds=1.0, rebuild_seconds=3600, clock=time.monotonic):
+    self.refresh_seconds = refresh_seconds
+    self.rebuild_seconds = rebuild_seconds
+    self.clock = clock
+    self.indexes = {Venue: PrefixIndex(), Artist: PrefixIndex()}
+    self.watermark = None
+    self._built_at = 0
+    self._refreshed_at = 0
+    self._lock = threading.Lock()
+    self._first_build = threading.Lock()
+
+  #--------------------------------------------------------------------------#
+  # Updates.
+  #--------------------------------------------------------------------------#
+
+  def put(self, model, entity_id, name, upcoming):
+    with self._lock:
+      self.indexes[model].put(entity_id, name, upcoming)
+
+  def adjust(self, model, entity_id, delta):
+    """Add `delta` to an indexed entity's upcoming show count."""
+    with self._lock:
+      self.indexes[model].adjust(entity_id, delta)
+
+  def forget(self, model, entity_id):
+    with self._lock:
+      self.indexes[model].remove(entity_id)
+
+  #--------------------------------------------------------------------------#
+  # Loading.
+  #--------------------------------------------------------------------------#
+
+  def refresh(self, session, force=False):
+    """Build the indexes, or apply what changed since the last refresh.
+
+    Like RecommendationIndex.refresh: no queries until refresh_seconds have
+    passed, and reads happen outside the lock, so searches carry on
+    meanwhile. The first build happens once: callers arriving while it
+    runs (say, during the warmup) wait for it instead of building their own.
+    """
+    if self.watermark is None:
+      with self._first_build:
+        if self.watermark is None:
+          return self._refresh(session, force)
+    return self._refresh(session, force)
+
+  def _refresh(self, session, force):
+    now = self.clock()
+    with self._lock:
+      rebuild = self.watermark is None or now - self._built_at >= self.rebuild_seconds
+      if not rebuild and not force and now - self._refreshed_at < self.refresh_seconds:
+        return
+      if self.watermark is not None:
+        self._refreshed_at = now
+        if rebuild:
+          self._built_at = now
+      since = None if rebuild else self.watermark - REFRESH_OVERLAP
+
+    started = datetime.utcnow()
+    rows = {model: self._read_names(session, model, since) for model in self.indexes}
+    counts = None if rebuild else dict(zip(self.indexes, session.execute(
+      select(*(select(func.count(model.id)).scalar_subquery() for model in self.indexes))
+    ).one()))
+
+    if rebuild:
+      indexes = {model: PrefixIndex.build(model_rows) for model, model_rows in rows.items()}
+    with self._lock:
+      if rebuild:
+        self.indexes = indexes
+      else:
+        for model, model_rows in rows.items():
+          for entity_id, name, upcoming in model_rows:
+            self.indexes[model].put(entity_id, name, upcoming)
+      self.watermark = max(started, self.watermark or started)
+      self._refreshed_at = now
+      if rebuild:
+        self._built_at = now
+      # Deleted rows leave nothing behind to read; a count mismatch means
+      # some went away.
+      stale = [model for model, count in (counts or {}).items() if len(self.indexes[model]) != count]
+
+    for model in stale:
+      ids = set(session.execute(select(model.id)).scalars())
+      with self._lock:
+        index = self.indexes[model]
+        for entity_id in [entity_id for entity_id in index.entries if entity_id not in ids]:
+          index.remove(entity_id)
+
+  def _read_names(self, session, model, since=None):
+    stmt = select(model.id, model.name, model.upcoming_shows_count)
+    if since is not None:
+      stmt = stmt.where(model.updated_at > since)
+    return session.execute(stmt).all()
+
+  #--------------------------------------------------------------------------#
+  # Lookup.
+  #--------------------------------------------------------------------------#
+
+  def suggest(self, term, limit=10, models=(Venue, Artist)):
+    """The best `limit` Suggestions among `models` for the typed `term`."""
+    prefix = normalize(term)
+    if not prefix:
+      return []
+    limit = max(1, min(limit, MAX_SUGGESTIONS))
+    with self._lock:
+      found = [(entry.rank, Suggestion(model, entity_id, entry.name, entry.upcoming))
+               for model in models
+               for entity_id, entry in self.indexes[model].search(prefix, limit)]
+    if len(models) > 1:
+      found = heapq.nsmallest(limit, found, key=lambda item: item[0])
+    return [suggestion for _, suggestion in found]
+
+
+def suggest_index(app):
+  """The app's index, created on first use."""
+  index = app.extensions.get('suggest')
+  if index is None:
+    index = app.extensions.setdefault('suggest', SuggestIndex(
+      refresh_seconds=app.config.get('SUGGEST_REFRESH_SECONDS', 1),
+      rebuild_seconds=app.config.get('SUGGEST_REBUILD_SECONDS', 3600),
+    ))
+  return index
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py configures itself from the environment when first imported, so the
+# test settings go in before any test module imports it.
+TEST_DIR = tempfile.mkdtemp(prefix='fyyur-tests-')
+APP_DATABASE = os.path.join(TEST_DIR, 'app.db')
+os.environ.update({
+  "DATABASE_URL": 'sqlite:///' + APP_DATABASE,
+  "LOG_FILE": os.path.join(TEST_DIR, 'app.log'),
+  "PAGE_CACHE_BACKEND": 'null',
+  "SUGGEST_WARMUP": '0',
+  "ADMIN_TOKEN": 'test',
+})
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+  """The app's schema, search indexes included, in a throwaway SQLite file."""
+  from sqlalchemy import create_engine
+  import search  # noqa: F401 (registers the search index DDL)
+  from database import enforce_foreign_keys
+  from models import db
+
+  engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+  enforce_foreign_keys(engine)
+  db.metadata.create_all(engine)
+  yield engine
+  engine.dispose()
+
+
+@pytest.fixture
+def app():
+  """The Flask app on an empty database of its own."""
+  from app import app, db
+
+  with app.app_context():
+    db.engine.dispose()
+    if os.path.exists(APP_DATABASE):
+      os.remove(APP_DATABASE)
+    db.create_all()
+  # Indexes built from the previous test's rows.
+  for name in ('suggest', 'recommendations'):
+    app.extensions.pop(name, None)
+  yield app
+  with app.app_context():
+    db.session.remove()
@@ -0,0 +1,119 @@
+import pytest
+
+from cache import MemoryPageCache, NullPageCache, PageCache, RedisPageCache, create_page_cache
+
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class FakeRedis(object):
+  """The part of the redis-py client RedisPageCache uses, expiring keys on a fake clock."""
+
+  def __init__(self, clock):
+    self.clock = clock
+    self.values = {}
+
+  def get(self, key):
+    value, expires = self.values.get(key, (None, None))
+    if expires is not None and expires <= self.clock():
+      del self.values[key]
+      return None
+    return value
+
+  def set(self, key, value, ex=None):
+    assert isinstance(value, bytes)
+    self.values[key] = (value, self.clock() + ex if ex else None)
+    return True
+
+  def delete(self, *keys):
+    return sum(self.values.pop(key, None) is not None for key in keys)
+
+
+@pytest.fixture
+def clock():
+  return FakeClock()
+
+
+@pytest.fixture
+def redis(clock):
+  return FakeRedis(clock)
+
+
+def test_page_cache_is_abstract():
+  with pytest.raises(TypeError):
+    PageCache()
+
+
+def test_create_page_cache():
+  assert isinstance(create_page_cache({"PAGE_CACHE_BACKEND": 'memory'}), MemoryPageCache)
+  assert isinstance(create_page_cache({"PAGE_CACHE_BACKEND": 'null'}), NullPageCache)
+  with pytest.raises(ValueError):
+    create_page_cache({"PAGE_CACHE_BACKEND": 'simple'})
+
+
+def test_memory_cache_evicts_least_recently_used(clock):
+  cache = MemoryPageCache(max_entries=2, ttl=60, clock=clock)
+  cache.set('venue:1', 'one')
+  cache.set('venue:2', 'two')
+  assert cache.get('venue:1') == 'one'
+  cache.set('venue:3', 'three')
+  assert len(cache) == 2
+  assert cache.get('venue:2') is None
+  assert cache.get('venue:1') == 'one'
+  assert cache.get('venue:3') == 'three'
+
+
+def test_memory_cache_expires_entries(clock):
+  cache = MemoryPageCache(ttl=60, clock=clock)
+  cache.set('venue:1', 'one')
+  clock.now += 59
+  assert cache.get('venue:1') == 'one'
+  clock.now += 1
+  assert cache.get('venue:1') is None
+  assert len(cache) == 0
+
+
+def test_redis_cache_round_trips_text(redis):
+  cache = RedisPageCache(redis)
+  assert cache.get('venue:1') is None
+  cache.set('venue:1', '<h1>Café</h1>')
+  assert cache.get('venue:1') == '<h1>Café</h1>'
+  assert redis.values['fyyur:page:venue:1'][0] == '<h1>Café</h1>'.encode('utf-8')
+
+
+def test_redis_cache_sets_the_ttl(redis, clock):
+  cache = RedisPageCache(redis, ttl=30)
+  cache.set('artist:7', 'page')
+  clock.now += 29
+  assert cache.get('artist:7') == 'page'
+  clock.now += 1
+  assert cache.get('artist:7') is None
+
+
+def test_redis_cache_deletes_under_its_prefix(redis):
+  cache = RedisPageCache(redis, prefix='a:')
+  other = RedisPageCache(redis, prefix='b:')
+  cache.set('venue:1', 'mine')
+  other.set('venue:1', 'theirs')
+  cache.delete_many(['venue:1', 'venue:2'])
+  cache.delete_many([])
+  assert cache.get('venue:1') is None
+  assert other.get('venue:1') == 'theirs'
+
+
+def test_pages_from_another_version_are_ignored(app, redis, monkeypatch):
+  import app as views
+
+  monkeypatch.setattr(views, 'page_cache', RedisPageCache(redis))
+  with app.test_request_context('/venues/1'):
+    assert views.cached_page('venue:1', '3.0') is None
+    views.cache_page('venue:1', '<html>3</html>')
+    assert redis.values['fyyur:page:venue:1'][0] == b'3.0\n<html>3</html>'
+    assert views.cached_page('venue:1', '3.0') == '<html>3</html>'
+    # The row (or a linked one) changed since: render again.
+    assert views.cached_page('venue:1', '4.0') is None
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from counters import reconcile_show_counters
+from instrumentation import QueryBudgetExceeded
+from models import db, Genre, Venue, Artist, Show
+
+
+@pytest.fixture
+def strict_app(app, monkeypatch):
+  monkeypatch.setitem(app.config, 'SQL_STRICT_QUERY_BUDGET', True)
+  # Let QueryBudgetExceeded reach the test instead of becoming a 500.
+  monkeypatch.setitem(app.config, 'TESTING', True)
+  with app.app_context():
+    jazz, rock = Genre(name='Jazz'), Genre(name='Rock')
+    venues = [Venue(name=f'Venue {i}', city='San Francisco', state='CA', address=f'{i} Main St',
+                    seeking_talent=True, genres=[jazz, rock][:i % 2 + 1]) for i in range(1, 4)]
+    artists = [Artist(name=f'Artist {i}', city='San Francisco', state='CA',
+                      seeking_venue=True, genres=[rock, jazz][:i % 2 + 1]) for i in range(1, 4)]
+    db.session.add_all(venues + artists)
+    db.session.flush()
+    now = datetime.now()
+    for i in range(12):
+      db.session.add(Show(venue_id=venues[i % 3].id, artist_id=artists[i % 3].id,
+                          start_time=now + timedelta(days=i - 6, hours=i)))
+    reconcile_show_counters(db.session)
+    db.session.commit()
+  return app
+
+
+def window():
+  start = (datetime.now() + timedelta(days=30)).replace(microsecond=0)
+  return f'from={start.isoformat()}&to={(start + timedelta(hours=3)).isoformat()}'
+
+
+# (endpoint, method, path, form data)
+BUDGETED_REQUESTS = [
+  ('venues', 'GET', '/venues', None),
+  ('venues', 'GET', '/venues?state=CA&genre=Jazz', None),
+  ('search_venues', 'POST', '/venues/search', {"search_term": 'Venue'}),
+  ('show_venue', 'GET', '/venues/1', None),
+  ('artists', 'GET', '/artists', None),
+  ('artists', 'GET', '/artists?genre=Rock', None),
+  ('search_artists', 'POST', '/artists/search', {"search_term": 'art'}),
+  ('show_artist', 'GET', '/artists/1', None),
+  ('shows', 'GET', '/shows', None),
+  ('api.available_venues', 'GET', f'/api/venues/available?{window()}&genre=Jazz', None),
+  ('api.recommended_venues', 'GET', '/api/artists/1/recommended-venues', None),
+  ('api.recommended_artists', 'GET', '/api/venues/1/recommended-artists', None),
+  ('api.suggest', 'GET', '/api/suggest?q=ve', None),
+]
+
+
+def test_every_budgeted_route_is_covered(app):
+  budgeted = {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+  assert budgeted == {endpoint for endpoint, _, _, _ in BUDGETED_REQUESTS}
+
+
+@pytest.mark.parametrize('endpoint, method, path, data', BUDGETED_REQUESTS,
+                         ids=[path for _, _, path, _ in BUDGETED_REQUESTS])
+def test_route_stays_within_its_budget(strict_app, endpoint, method, path, data):
+  assert strict_app.url_map.bind('localhost').match(path.split('?')[0], method=method)[0] == endpoint
+  response = strict_app.test_client().open(path, method=method, data=data)
+  assert response.status_code == 200
+  budget = strict_app.view_functions[endpoint].query_budget
+  assert 0 < int(response.headers['X-Query-Count']) <= budget
+
+
+def test_strict_mode_raises_over_budget(strict_app, monkeypatch):
+  view = strict_app.view_functions['show_venue']
+  monkeypatch.setattr(view, 'query_budget', 1)
+  with pytest.raises(QueryBudgetExceeded, match='show_venue ran 3 queries, over its budget of 1'):
+    strict_app.test_client().get('/venues/1')
+
+
+def test_over_budget_is_not_an_error_outside_strict_mode(strict_app, monkeypatch):
+  monkeypatch.setitem(strict_app.config, 'SQL_STRICT_QUERY_BUDGET', False)
+  monkeypatch.setattr(strict_app.view_functions['show_venue'], 'query_budget', 1)
+  response = strict_app.test_client().get('/venues/1')
+  assert response.status_code == 200
+  assert response.headers['X-Query-Count'] == '3'
@@ -0,0 +1,45 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from models import db, Show
+from query_plans import GUARDED_TABLES, check_query_plans, explain
+
+
+# Postgres plans are checked too when a throwaway server is configured.
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def postgres_engine():
+  if not POSTGRES_URL:
+    pytest.skip('TEST_POSTGRES_URL is not set')
+  engine = create_engine(POSTGRES_URL)
+  db.metadata.drop_all(engine)
+  db.metadata.create_all(engine)
+  yield engine
+  db.metadata.drop_all(engine)
+  engine.dispose()
+
+
+def assert_no_sequential_scans(engine):
+  results = check_query_plans(engine)
+  offenders = {name: (offending, lines) for name, (lines, offending) in results.items() if offending}
+  assert not offenders, f'hot queries scanning {GUARDED_TABLES}: {offenders}'
+
+
+def test_hot_queries_use_indexes_on_sqlite(sqlite_engine):
+  assert_no_sequential_scans(sqlite_engine)
+
+
+def test_hot_queries_use_indexes_on_postgres(postgres_engine):
+  assert_no_sequential_scans(postgres_engine)
+
+
+def test_unindexed_filter_is_reported(sqlite_engine):
+  # end_time has no index of its own, so this has to scan Show.
+  with sqlite_engine.connect() as connection:
+    _, scanned = explain(connection, select(Show.id).where(Show.end_time > datetime(2026, 1, 1)))
+  assert scanned == ['Show']
@@ -0,0 +1,167 @@
+import pytest
+from flask import Flask, jsonify, request
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import Column, Integer, MetaData, String, Table, event, insert, select
+
+import replicas
+from replicas import ReplicaSet, RoutingSession, configure_replicas
+
+
+metadata = MetaData()
+items = Table('item', metadata, Column('id', Integer, primary_key=True), Column('name', String))
+
+
+class FakeTime(object):
+  def __init__(self, now=1000.0):
+    self.now = now
+
+  def time(self):
+    return self.now
+
+  def monotonic(self):
+    return self.now
+
+
+class Routed(object):
+  """A Flask app wired like app.py: RoutingSession plus configure_replicas.
+
+  The primary and the replica are separate SQLite files holding one row
+  each, named after the file, so every read shows where it went; every
+  statement is also logged with the engine that ran it.
+  """
+
+  def __init__(self, tmp_path, replica_url=None):
+    app = Flask(__name__)
+    app.config.update(
+      SECRET_KEY='test',
+      SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+      SQLALCHEMY_BINDS={"replica_0": replica_url or f"sqlite:///{tmp_path / 'replica.db'}"},
+      REPLICA_STICKY_SECONDS=5,
+      REPLICA_COOLDOWN_SECONDS=30,
+    )
+    db = SQLAlchemy(app, session_options={"class_": RoutingSession})
+    self.app, self.db = app, db
+    self.statements = []
+    with app.app_context():
+      self.primary, self.replica = db.engines[None], db.engines['replica_0']
+      if replica_url is None:
+        self._seed(self.replica, 'replica')
+      self._seed(self.primary, 'primary')
+      for role, engine in (('primary', self.primary), ('replica', self.replica)):
+        event.listen(engine, 'before_cursor_execute', self._logger(role))
+    configure_replicas(app, db)
+
+    @app.route('/item', methods=['GET', 'POST'])
+    def item():
+      if request.method == 'POST':
+        db.session.execute(insert(items).values(name='written'))
+        db.session.commit()
+      return jsonify(name=db.session.execute(select(items.c.name).order_by(items.c.id)).scalars().first())
+
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+      db.session.remove()
+
+  def _logger(self, role):
+    def log(conn, cursor, statement, parameters, context, executemany):
+      self.statements.append((role, statement.split()[0]))
+    return log
+
+  def _seed(self, engine, name):
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+      connection.execute(insert(items).values(name=name))
+
+  def roles(self, verb):
+    return [role for role, statement in self.statements if statement == verb]
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+  clock = FakeTime()
+  monkeypatch.setattr(replicas, 'time', clock)
+  return clock
+
+
+@pytest.fixture
+def routed(tmp_path, fake_time):
+  return Routed(tmp_path)
+
+
+def test_reads_go_to_the_replica(routed):
+  response = routed.app.test_client().get('/item')
+  assert response.json == {"name": 'replica'}
+  assert response.headers['X-Database-Role'] == 'replica'
+  assert routed.roles('SELECT') == ['replica']
+
+
+def test_writes_and_their_reads_go_to_the_primary(routed):
+  response = routed.app.test_client().post('/item')
+  assert response.json == {"name": 'primary'}
+  assert response.headers['X-Database-Role'] == 'primary'
+  assert routed.roles('INSERT') == ['primary']
+  assert routed.roles('SELECT') == ['primary']
+
+
+def test_statement_binds_within_a_read_request(routed):
+  app, db = routed.app, routed.db
+  with app.test_request_context('/item'):
+    app.preprocess_request()
+    assert db.session.get_bind(clause=select(items)) is routed.replica
+    # Locking reads and writes need the primary, even in a GET.
+    assert db.session.get_bind(clause=select(items).with_for_update()) is routed.primary
+    assert db.session.get_bind(clause=insert(items)) is routed.primary
+  with app.test_request_context('/item', method='POST'):
+    app.preprocess_request()
+    assert db.session.get_bind(clause=select(items)) is routed.primary
+
+
+def test_outside_a_request_everything_uses_the_primary(routed):
+  with routed.app.app_context():
+    assert routed.db.session.get_bind(clause=select(items)) is routed.primary
+
+
+def test_client_reads_from_the_primary_after_writing(routed, fake_time):
+  client = routed.app.test_client()
+  client.post('/item')
+  response = client.get('/item')
+  assert response.json == {"name": 'primary'}
+  assert response.headers['X-Database-Role'] == 'primary'
+
+  fake_time.now += 5
+  response = client.get('/item')
+  assert response.json == {"name": 'replica'}
+  # Other clients were never pinned.
+  assert routed.app.test_client().get('/item').json == {"name": 'replica'}
+
+
+def test_failed_replica_sits_out_its_cooldown(tmp_path, fake_time):
+  # A replica file in a missing directory cannot be opened.
+  routed = Routed(tmp_path, replica_url=f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+  replica_set = routed.app.extensions['replicas']
+  replica_set.clock = fake_time.monotonic
+  client = routed.app.test_client()
+
+  assert client.get('/item').json == {"name": 'primary'}
+  assert replica_set.is_down(routed.replica)
+  assert replica_set.choose() is None
+
+  fake_time.now += 29
+  assert replica_set.choose() is None
+  fake_time.now += 1
+  assert replica_set.choose() is routed.replica
+
+
+def test_replica_set_skips_replicas_that_are_down():
+  clock = FakeTime()
+  first, second = object(), object()
+  replica_set = ReplicaSet([first, second], cooldown=10, clock=clock.monotonic)
+  assert [replica_set.choose() for _ in range(4)] == [first, second, first, second]
+
+  replica_set.mark_down(first)
+  assert [replica_set.choose() for _ in range(3)] == [second, second, second]
+  replica_set.mark_down(second)
+  assert replica_set.choose() is None
+
+  clock.now += 10
+  assert {replica_set.choose(), replica_set.choose()} == {first, second}
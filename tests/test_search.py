@@ -0,0 +1,84 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from models import Venue
+from search import (Fts5SearchBackend, LikeSearchBackend, SearchBackend, TrigramSearchBackend,
+                    get_search_backend)
+
+
+NAMES = ['The Musical Hop', 'Park Square Live Music & Coffee', 'The Dueling Pianos Bar', '100%_Club']
+
+
+@pytest.fixture
+def session(sqlite_engine):
+  with Session(sqlite_engine) as session:
+    session.add_all([Venue(name=name, city='San Francisco', state='NY' if name.startswith('Park') else 'CA')
+                     for name in NAMES])
+    session.commit()
+    yield session
+
+
+def names(rows):
+  return [row.name for row in rows]
+
+
+def test_backend_must_implement_matches():
+  with pytest.raises(TypeError):
+    SearchBackend()
+
+
+def test_sqlite_defaults_to_fts5(sqlite_engine):
+  assert isinstance(get_search_backend(sqlite_engine), Fts5SearchBackend)
+  assert isinstance(get_search_backend(sqlite_engine, 'like'), LikeSearchBackend)
+  with pytest.raises(ValueError):
+    get_search_backend(sqlite_engine, 'nope')
+
+
+def test_like_is_case_insensitive_substring(session):
+  backend = LikeSearchBackend()
+  assert sorted(names(backend.search(session, Venue, 'music'))) == [
+    'Park Square Live Music & Coffee', 'The Musical Hop']
+  assert names(backend.search(session, Venue, 'Hop')) == ['The Musical Hop']
+
+
+def test_like_escapes_wildcards(session):
+  backend = LikeSearchBackend()
+  assert names(backend.search(session, Venue, '%')) == ['100%_Club']
+  assert names(backend.search(session, Venue, '_')) == ['100%_Club']
+
+
+def test_fts5_matches_through_the_index(session):
+  backend = Fts5SearchBackend()
+  sql = str(backend.matches(Venue, 'music', 10).compile())
+  assert 'MATCH' in sql
+  assert sorted(names(backend.search(session, Venue, 'MUSIC'))) == [
+    'Park Square Live Music & Coffee', 'The Musical Hop']
+
+
+def test_fts5_applies_filters_before_the_limit(session):
+  backend = Fts5SearchBackend()
+  assert names(backend.search(session, Venue, 'music', limit=1, filters=[Venue.state == 'NY'])) == [
+    'Park Square Live Music & Coffee']
+
+
+def test_fts5_falls_back_to_like_for_short_terms(session):
+  backend = Fts5SearchBackend()
+  sql = str(backend.matches(Venue, 'Mu', 10).compile())
+  assert 'MATCH' not in sql and 'LIKE' in sql.upper()
+  assert sorted(names(backend.search(session, Venue, 'Mu'))) == [
+    'Park Square Live Music & Coffee', 'The Musical Hop']
+  assert names(backend.search(session, Venue, ' op ')) == ['The Musical Hop']
+
+
+def test_trigram_sql():
+  stmt = TrigramSearchBackend().matches(Venue, '50%', 10, [Venue.state == 'CA'])
+  compiled = stmt.compile(dialect=postgresql.dialect())
+  sql = str(compiled)
+  assert 'similarity("Venue".name, %(similarity_1)s)' in sql
+  assert '"Venue".name ILIKE %(name_1)s' in sql
+  assert 'ORDER BY -similarity' in sql
+  assert compiled.params['name_1'] == '%50\\%%'
+  assert compiled.params['similarity_1'] == '50%'
+  assert compiled.params['state_1'] == 'CA'
+  assert compiled.params['param_1'] == 10